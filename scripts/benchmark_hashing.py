@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Micro-benchmark of the hashing engine used by the hash_enricher, run from the scripts folder:
+#   python benchmark_hashing.py --size-mb 512 --chunksizes 1,4,16,64
+# use the fastest chunk size as hash_enricher.chunksize (in bytes)
+
+import argparse
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.auto_archiver.core.hashing import DigestCache
+
+
+def time_hashing(filename, algorithms, chunksize, repeat):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        DigestCache._compute(filename, algorithms, chunksize)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="times single and multi-algorithm hashing for several chunk sizes")
+    parser.add_argument("--file", help="file to hash, a random one is created if not given")
+    parser.add_argument("--size-mb", type=int, default=256, help="size of the random file")
+    parser.add_argument("--chunksizes", default="1,4,16,64", help="CSV of chunk sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="best of how many runs")
+    args = parser.parse_args()
+
+    filename = args.file
+    if not filename:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+            filename = f.name
+    size_mb = os.path.getsize(filename) / (1024 * 1024)
+
+    runs = [[a] for a in DigestCache.ALGORITHMS] + [list(DigestCache.ALGORITHMS)]
+    print(f"hashing {filename} ({size_mb:.0f} MB), best of {args.repeat}")
+    print(f"{'algorithms':<28}{'chunk MB':>10}{'seconds':>10}{'MB/s':>10}")
+    try:
+        for chunk_mb in [float(c) for c in args.chunksizes.split(",")]:
+            for algorithms in runs:
+                elapsed = time_hashing(filename, algorithms, int(chunk_mb * 1024 * 1024), args.repeat)
+                print(f"{'+'.join(algorithms):<28}{chunk_mb:>10g}{elapsed:>10.3f}{size_mb / elapsed:>10.0f}")
+    finally:
+        if not args.file: os.remove(filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark of the thumbnail_enricher modes, run from the scripts folder (needs ffmpeg):
+#   python benchmark_thumbnails.py --duration 600 --thumbnails 16
+#   python benchmark_thumbnails.py --file some_long_video.mp4 --thumbnails 32
+# a test video is generated if no file is given, use the fastest mode whose thumbnails are good enough as thumbnail_enricher.mode
+# "diff vs seek" is the mean absolute pixel difference (0-255) to the exact thumbnails of the seek mode
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.auto_archiver.core import Metadata, Media, ItemContext, ArchivingContext
+from src.auto_archiver.enrichers import ThumbnailEnricher
+
+
+def create_video(filename, duration, gop):
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc=duration={duration}:size=1280x720:rate=30",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-g", str(gop), filename], check=True)
+
+
+def run_mode(filename, duration, thumbnails, mode, processes):
+    ArchivingContext.set("enricher_processes", processes, keep_on_reset=True)
+    enricher = ThumbnailEnricher({ThumbnailEnricher.name: {"thumbnails_per_minute": 60 * thumbnails, "max_thumbnails": thumbnails, "mode": mode}})
+    with ItemContext().activate() as context:
+        context.tmp_dir = tempfile.mkdtemp()
+        item = Metadata().set_url("https://example.com")
+        item.add_media(Media(filename).set("duration", duration))
+        start = perf_counter()
+        enricher.enrich(item)
+        elapsed = perf_counter() - start
+    return elapsed, item.media[0].get("thumbnails", []), context.tmp_dir
+
+
+def mean_difference(thumbnails, reference):
+    diffs = []
+    for a, b in zip(thumbnails, reference):
+        with Image.open(a.filename) as img_a, Image.open(b.filename) as img_b:
+            diffs.append(np.abs(np.asarray(img_a.convert("L"), dtype=np.int16) - np.asarray(img_b.convert("L").resize(img_a.size), dtype=np.int16)).mean())
+    return sum(diffs) / len(diffs) if diffs else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="times the thumbnail_enricher modes on a long video")
+    parser.add_argument("--file", help="video to use, a test video is generated if not given")
+    parser.add_argument("--duration", type=int, default=600, help="seconds of the generated video, or of --file (ffprobe is not needed)")
+    parser.add_argument("--gop", type=int, default=120, help="frames between keyframes of the generated video")
+    parser.add_argument("--thumbnails", type=int, default=16, help="thumbnails per video")
+    parser.add_argument("--modes", default=",".join(ThumbnailEnricher.MODES), help="CSV of modes to compare, the first one is the reference")
+    parser.add_argument("--processes", type=int, default=1, help="enricher_processes, 1 runs the seek mode one ffmpeg after the other")
+    parser.add_argument("--repeat", type=int, default=1, help="best of how many runs")
+    args = parser.parse_args()
+    logger.remove()
+
+    filename = args.file
+    if not filename:
+        filename = os.path.join(tempfile.mkdtemp(), "video.mp4")
+        print(f"generating a {args.duration}s test video, keyframe every {args.gop} frames")
+        create_video(filename, args.duration, args.gop)
+
+    print(f"{args.thumbnails} thumbnails of {filename} ({os.path.getsize(filename) / 1e6:.0f} MB, {args.duration}s), {args.processes} process(es), best of {args.repeat}")
+    print(f"{'mode':<14}{'seconds':>10}{'thumbnails':>12}{'diff vs seek':>14}")
+    reference, tmp_dirs = None, []
+    try:
+        for mode in args.modes.split(","):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, thumbnails, tmp_dir = run_mode(filename, args.duration, args.thumbnails, mode, args.processes)
+                tmp_dirs.append(tmp_dir)
+                best = elapsed if best is None else min(best, elapsed)
+            reference = reference or thumbnails
+            print(f"{mode:<14}{best:>10.2f}{len(thumbnails):>12}{mean_difference(thumbnails, reference):>14.1f}")
+    finally:
+        for tmp_dir in tmp_dirs: shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not args.file: shutil.rmtree(os.path.dirname(filename), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark of the youtubedl_archiver download settings against a local HTTP server serving an HLS video, run from the scripts folder:
+#   python benchmark_ytdlp.py --segments 60 --segment-kb 512 --latency-ms 50 --kbps 4096 --concurrency 1,4,8,16
+# the server adds latency and a per-connection bandwidth limit to every fragment like a real CDN would,
+# use the fastest setting as youtubedl_archiver.concurrent_fragment_downloads
+
+import argparse
+import contextlib
+import functools
+import http.server
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from time import perf_counter
+
+from loguru import logger
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.auto_archiver.archivers import YoutubeDLArchiver
+from src.auto_archiver.core import Metadata, ItemContext
+
+
+def create_hls_fixture(folder, segments, segment_kb):
+    # the segments are random bytes, yt-dlp's native HLS downloader only concatenates them
+    with open(os.path.join(folder, "video.m3u8"), "w") as f:
+        f.write("#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n")
+        for i in range(segments):
+            with open(os.path.join(folder, f"segment_{i}.ts"), "wb") as segment:
+                segment.write(os.urandom(segment_kb * 1024))
+            f.write(f"#EXTINF:2.0,\nsegment_{i}.ts\n")
+        f.write("#EXT-X-ENDLIST\n")
+    return segments * segment_kb * 1024
+
+
+class SlowHandler(http.server.SimpleHTTPRequestHandler):
+    latency = 0  # seconds before each response
+    bytes_per_second = 0  # per connection, 0 means no limit
+
+    def log_message(self, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        time.sleep(self.latency)
+        if not self.bytes_per_second: return super().copyfile(source, outputfile)
+        chunk = max(1024, self.bytes_per_second // 20)
+        while (data := source.read(chunk)):
+            outputfile.write(data)
+            time.sleep(len(data) / self.bytes_per_second)
+
+
+def serve(folder, latency_ms, kbps):
+    handler = type("Handler", (SlowHandler,), {"latency": latency_ms / 1000, "bytes_per_second": kbps * 1024})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_download(url, cookies_file, options, repeat):
+    config = {k: v["default"] for k, v in YoutubeDLArchiver.configs().items()}
+    config.update({"netscape_cookies": cookies_file, "subtitles": False, "playlist_progress_file": "", **options})
+    archiver = YoutubeDLArchiver({YoutubeDLArchiver.name: config})
+    best = None
+    for _ in range(repeat):
+        with ItemContext().activate() as context:
+            context.tmp_dir = tempfile.mkdtemp()
+            try:
+                start = perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):  # yt-dlp progress
+                    result = archiver.download(Metadata().set_url(url))
+                elapsed = perf_counter() - start
+                assert result and len(result.media), f"nothing downloaded with {options}"
+            finally:
+                shutil.rmtree(context.tmp_dir, ignore_errors=True)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="times youtubedl_archiver downloads of a local HLS video for several settings")
+    parser.add_argument("--segments", type=int, default=40, help="number of HLS fragments")
+    parser.add_argument("--segment-kb", type=int, default=256, help="size of each fragment in KB")
+    parser.add_argument("--latency-ms", type=int, default=50, help="delay before each response")
+    parser.add_argument("--kbps", type=int, default=2048, help="bandwidth of each connection in KB/s, 0 means no limit")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="CSV of concurrent_fragment_downloads values")
+    parser.add_argument("--external-downloader", default="", help="also time this external_downloader, eg: aria2c")
+    parser.add_argument("--external-downloader-args", default="", help="arguments for the external downloader")
+    parser.add_argument("--repeat", type=int, default=1, help="best of how many runs")
+    args = parser.parse_args()
+    logger.remove()
+
+    folder = tempfile.mkdtemp()
+    try:
+        total = create_hls_fixture(folder, args.segments, args.segment_kb)
+        cookies_file = os.path.join(folder, "cookies.txt")
+        with open(cookies_file, "w") as f: f.write("# Netscape HTTP Cookie File\n")
+        server = serve(folder, args.latency_ms, args.kbps)
+        url = f"http://127.0.0.1:{server.server_port}/video.m3u8"
+
+        runs = [(f"concurrent_fragment_downloads={c}", {"concurrent_fragment_downloads": int(c)}) for c in args.concurrency.split(",")]
+        if args.external_downloader:
+            runs.append((f"external_downloader={args.external_downloader}", {"external_downloader": args.external_downloader, "external_downloader_args": args.external_downloader_args}))
+
+        size_mb = total / (1024 * 1024)
+        print(f"downloading {args.segments} fragments ({size_mb:.1f} MB), {args.latency_ms}ms latency, {args.kbps or 'unlimited'} KB/s per connection, best of {args.repeat}")
+        print(f"{'settings':<40}{'seconds':>10}{'MB/s':>10}{'speedup':>10}")
+        baseline = None
+        for name, options in runs:
+            elapsed = time_download(url, cookies_file, options, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{name:<40}{elapsed:>10.2f}{size_mb / elapsed:>10.2f}{baseline / elapsed:>9.1f}x")
+        server.shutdown()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
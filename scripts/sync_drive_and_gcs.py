@@ -20,11 +20,14 @@ from gspread.exceptions import APIError
 import random
 import string
 import ffmpeg
-import hashlib
 from time import sleep
 import yaml
 import requests
 import shutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.auto_archiver.core.hashing import DigestCache
 
 RETRY_POLICY = retry.Retry(deadline=1200)
 SCOPES = ['https://www.googleapis.com/auth/drive']
@@ -67,7 +70,7 @@ def list_files_in_drive_folder(service, folder_id, is_shared_drive=True):
             } for file in files
             }
 
-def get_media_duration_and_sha3_512(uar, file_data, content_type, get_hash=True):
+def get_media_duration_and_sha3_512(uar, file_data, content_type, get_hash=True, expected_md5=None):
     temp_filename = f"""{uar}.{content_type[content_type.find("/")+1:]}"""
     with open(temp_filename, 'wb') as temp_file:
         temp_file.write(file_data.read())
@@ -81,17 +84,18 @@ def get_media_duration_and_sha3_512(uar, file_data, content_type, get_hash=True)
         print("ERROR", e)
         duration = ''
     
+    sha3_512_checksum = None
     try:
-        if get_hash:
-            sha3_512_hash = hashlib.sha3_512()
-            with open(temp_filename, 'rb') as f:
-                while chunk := f.read(8192):
-                    sha3_512_hash.update(chunk)
-            sha3_512_checksum = f"""SHA3-512:{sha3_512_hash.hexdigest()}"""
-        else:
-            sha3_512_checksum = None
-    except Exception:
-        sha3_512_checksum = None
+        # SHA3-512 for the sheet and MD5 to verify the download against Drive's md5Checksum, in a single read
+        algorithms = (["SHA3-512"] if get_hash else []) + (["MD5"] if expected_md5 else [])
+        if algorithms:
+            digests = DigestCache.get_many(temp_filename, algorithms)
+            if get_hash:
+                sha3_512_checksum = f"""SHA3-512:{digests["SHA3-512"]}"""
+            if expected_md5 and digests["MD5"] != expected_md5:
+                print("WARNING", f"{temp_filename} md5 {digests['MD5']} does not match the Google Drive md5Checksum {expected_md5}")
+    except Exception as e:
+        print("ERROR", e)
     
     return duration, sha3_512_checksum, temp_filename
 
@@ -208,7 +212,7 @@ def rsync_gdrive_and_other_storages(service_account_path, top_level_drive_folder
 
             updated_file = service.files().update(**query_params).execute()
             file_gdrive_link = f"""https://drive.google.com/file/d/{file_id}/view?usp=sharing"""
-            duration, sha3_512_checksum, temp_filename = get_media_duration_and_sha3_512(uar, file_data, files_to_transfer[file_name]['mimeType'])
+            duration, sha3_512_checksum, temp_filename = get_media_duration_and_sha3_512(uar, file_data, files_to_transfer[file_name]['mimeType'], expected_md5=files_to_transfer[file_name]['checksum'])
 
             thumbnail_link = files_to_transfer[file_name]['thumbnailLink']
             if thumbnail_link is None:
@@ -242,7 +246,7 @@ def rsync_gdrive_and_other_storages(service_account_path, top_level_drive_folder
             })
 
         else:
-            duration, _, temp_filename = get_media_duration_and_sha3_512(os.path.splitext(file_name)[0], file_data, files_to_transfer[file_name]['mimeType'], get_hash=False)
+            duration, _, temp_filename = get_media_duration_and_sha3_512(os.path.splitext(file_name)[0], file_data, files_to_transfer[file_name]['mimeType'], get_hash=False, expected_md5=files_to_transfer[file_name]['checksum'])
 
         
         ranges_and_values.append({"range": f"""{gspread.utils.rowcol_to_a1(row+1, headers.index("Duration (HH:MM:SS.mmmmmm)")+1)}""", 
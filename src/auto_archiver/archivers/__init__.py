@@ -1,4 +1,5 @@
 from .archiver import Archiver
+from .router import ArchiverRouter
 from .telethon_archiver import TelethonArchiver
 from .twitter_archiver import TwitterArchiver
 from .twitter_api_archiver import TwitterApiArchiver
@@ -1,17 +1,21 @@
 from __future__ import annotations
 from abc import abstractmethod
 from dataclasses import dataclass
-import os
+from typing import ClassVar, List, Union
+import os, re
 import mimetypes, requests
 from loguru import logger
 from retrying import retry
 
-from ..core import Metadata, Step, ArchivingContext
+from ..core import Metadata, Step, ArchivingContext, ItemContext
 
 
 @dataclass
 class Archiver(Step):
     name = "archiver"
+    # the URLs this archiver can handle, see ArchiverRouter, leave both empty for generic archivers that try every URL
+    domains: ClassVar[List[str]] = []  # eg: ["instagram.com"] also matches subdomains like www.instagram.com
+    url_patterns: ClassVar[List[Union[str, re.Pattern]]] = []  # regexes searched in the URL
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
@@ -29,6 +33,16 @@ class Archiver(Step):
         # called when archivers are done, or upon errors, cleanup any resources
         pass
 
+    def suitable(self, url: str) -> bool:
+        # extra check on URLs that match the domains/url_patterns, the archiver is skipped if False
+        return True
+
+    @staticmethod
+    def is_cancelled() -> bool:
+        # long downloads should check this and stop, eg: another archiver already succeeded when racing them
+        cancelled = ItemContext.current().get("archiver_cancelled")
+        return cancelled is not None and cancelled.is_set()
+
     def sanitize_url(self, url: str) -> str:
         # used to clean unnecessary URL parameters OR unfurl redirect links
         return url
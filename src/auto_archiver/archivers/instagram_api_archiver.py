@@ -15,6 +15,7 @@ class InstagramAPIArchiver(Archiver):
     # TODO: improvement collect aggregates of locations[0].location and mentions for all posts
     """
     name = "instagram_api_archiver"
+    domains = ["instagram.com", "instagr.am", "instagr.com"]
 
     global_pattern = re.compile(r"(?:(?:http|https):\/\/)?(?:www.)?(?:instagram.com)\/(stories(?:\/highlights)?|p|reel)?\/?([^\/\?]*)\/?(\d+)?")
 
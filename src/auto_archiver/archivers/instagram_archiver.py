@@ -11,6 +11,7 @@ class InstagramArchiver(Archiver):
     Uses Instaloader to download either a post (inc images, videos, text) or as much as possible from a profile (posts, stories, highlights, ...)
     """
     name = "instagram_archiver"
+    domains = ["instagram.com", "instagr.am", "instagr.com"]
 
     # NB: post regex should be tested before profile
     # https://regex101.com/r/MGPquX/1
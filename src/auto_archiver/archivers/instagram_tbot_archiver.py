@@ -17,6 +17,7 @@ class InstagramTbotArchiver(Archiver):
     https://t.me/instagram_load_bot
     """
     name = "instagram_tbot_archiver"
+    domains = ["instagram.com"]
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
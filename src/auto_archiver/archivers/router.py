@@ -0,0 +1,53 @@
+from __future__ import annotations
+import re
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from .archiver import Archiver
+
+
+class ArchiverRouter:
+    """
+    Precompiled index of which archivers can handle a URL, built from their Archiver.domains and Archiver.url_patterns:
+        router = ArchiverRouter(archivers)
+        router.route("https://www.instagram.com/p/abc/") -> [InstagramArchiver, ..., YoutubeDLArchiver]
+    - domains go into a trie of reversed hostname labels, so "instagram.com" also matches "www.instagram.com"
+    - url_patterns are regexes searched in the full URL, for what a domain cannot express
+    - archivers that declare neither are generic and get every URL
+    - Archiver.suitable can still reject a routed URL, for checks that need more than the URL
+    archivers are always returned in their original (configured) order
+    """
+    INDEXES = "\0"  # trie key holding the archivers whose domain ends at that node
+
+    def __init__(self, archivers: List[Archiver]) -> None:
+        self.archivers = list(archivers)
+        self.generic = set()
+        self.trie: Dict[str, dict] = {}
+        self.patterns: List[tuple[int, re.Pattern]] = []
+        for i, a in enumerate(self.archivers):
+            if not a.domains and not a.url_patterns:
+                self.generic.add(i)
+            for domain in a.domains:
+                node = self.trie
+                for label in reversed(domain.lower().strip(".").split(".")):
+                    node = node.setdefault(label, {})
+                node.setdefault(self.INDEXES, set()).add(i)
+            for pattern in a.url_patterns:
+                self.patterns.append((i, re.compile(pattern) if isinstance(pattern, str) else pattern))
+
+    def route(self, url: str) -> List[Archiver]:
+        """returns the archivers that may be able to archive @url"""
+        matches = set(self.generic)
+        node = self.trie
+        for label in reversed(self.hostname(url).split(".")):
+            if (node := node.get(label)) is None: break
+            matches.update(node.get(self.INDEXES, ()))
+        matches.update(i for i, pattern in self.patterns if i not in matches and pattern.search(url))
+        return [a for a in (self.archivers[i] for i in sorted(matches)) if a.suitable(url)]
+
+    @staticmethod
+    def hostname(url: str) -> str:
+        # urls without a scheme, eg: "t.me/channel/1", are parsed as a path
+        if "//" not in url: url = f"//{url}"
+        try: return (urlparse(url).hostname or "").lower()
+        except ValueError: return ""
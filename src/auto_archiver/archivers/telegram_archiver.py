@@ -11,6 +11,7 @@ class TelegramArchiver(Archiver):
     Archiver for telegram that does not require login, but the telethon_archiver is much more advised, will only return if at least one image or one video is found
     """
     name = "telegram_archiver"
+    domains = ["t.me"]
 
     link_pattern = re.compile(r"https:\/\/t\.me(\/c){0,1}\/(.+)\/(\d+)")
 
@@ -16,6 +16,7 @@ DEFAULT_SESSION_FILE = "secrets/anon-telethon"
 
 class TelethonArchiver(Archiver):
     name = "telethon_archiver"
+    domains = ["t.me"]
     link_pattern = re.compile(r"https:\/\/t\.me(\/c){0,1}\/(.+)\/(\d+)")
     invite_pattern = re.compile(r"t.me(\/joinchat){0,1}\/\+?(.+)")
 
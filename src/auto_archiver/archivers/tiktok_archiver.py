@@ -12,6 +12,7 @@ import re
 
 class TiktokArchiver(Archiver):
     name = "tiktok_archiver"
+    domains = ["tiktok.com"]
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
@@ -18,9 +18,11 @@ class TwitterArchiver(Archiver):
     """
 
     name = "twitter_archiver"
+    domains = ["twitter.com", "x.com", "t.co"]
     link_pattern = re.compile(r"(?:twitter|x).com\/(?:\#!\/)?(\w+)\/status(?:es)?\/(\d+)")
     # link_clean_pattern = re.compile(r"(.+(?:twitter|x)\.com\/.+\/\d+)(\?)*.*")
     link_clean_pattern = re.compile(r"(.+(?:twitter|x)\.com\/.+\/[a-zA-Z0-9]+)(\?)*.*")
+    url_patterns = [link_pattern]  # mirrors like fxtwitter.com
 
 
     def __init__(self, config: dict) -> None:
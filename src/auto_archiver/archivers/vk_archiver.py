@@ -12,6 +12,7 @@ class VkArchiver(Archiver):
     Currently only works for /wall posts
     """
     name = "vk_archiver"
+    domains = ["vk.com"]
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
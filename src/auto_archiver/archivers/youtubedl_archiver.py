@@ -1,12 +1,63 @@
-import datetime, os, yt_dlp, pysubs2
+import datetime, os, pickle, shlex, shutil, threading, yt_dlp, pysubs2
+from collections import OrderedDict
 from loguru import logger
 
 from . import Archiver
-from ..core import Metadata, Media, ArchivingContext
+from ..core import Metadata, Media, ArchivingContext, ItemContext
+
+
+class PlaylistProgress:
+    """
+    the playlist entries already stored, per (URL, worksheet, row), kept in a pickle file (media included) so interrupted
+    playlists resume, the row is part of the key since it names the stored files and is where the media are written
+    """
+
+    def __init__(self, filename: str = None) -> None:
+        self.filename = filename
+        self.playlists = {}
+        self.lock = threading.Lock()
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "rb") as f: self.playlists = pickle.load(f)
+            except Exception as e:
+                logger.warning(f"could not load playlist progress from {filename}: {e}")
+
+    @staticmethod
+    def key(url: str) -> tuple:
+        # the destination of the current item
+        gsheet = ItemContext.current().gsheet or {}
+        worksheet = getattr(gsheet.get("worksheet"), "wks", None)
+        return (url, getattr(worksheet, "title", None), gsheet.get("row"))
+
+    def has(self, url: str) -> bool:
+        with self.lock:
+            return any(key[0] == url for key in self.playlists)
+
+    def get(self, key: tuple, default: dict = None) -> dict:
+        with self.lock:
+            return self.playlists.get(key, default)
+
+    def set(self, key: tuple, progress: dict) -> None:
+        with self.lock:
+            self.playlists[key] = progress
+            self._save()
+
+    def remove(self, key: tuple) -> None:
+        with self.lock:
+            if self.playlists.pop(key, None) is not None: self._save()
+
+    def _save(self) -> None:
+        if not self.filename: return
+        tmp_file = f"{self.filename}.tmp"
+        with open(tmp_file, "wb") as f: pickle.dump(self.playlists, f)
+        os.replace(tmp_file, self.filename)
 
 
 class YoutubeDLArchiver(Archiver):
     name = "youtubedl_archiver"
+    INFO_CACHE_SIZE = 64  # URLs whose extracted info is kept, so credit string lookups and retries do not extract again
+    # keys added when yt-dlp processes an info dict for download, they must not leak into the next processing of the same info
+    PROCESSED_KEYS = {"requested_downloads", "requested_formats", "requested_subtitles", "requested_entries", "filepath", "_filename", "filename"}
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
@@ -18,6 +69,15 @@ class YoutubeDLArchiver(Archiver):
         self.allow_playlist = bool(self.allow_playlist)
         self.max_downloads = self.max_downloads
         self.assert_valid_string("netscape_cookies")
+        self._info_cache = OrderedDict()
+        self._info_cache_lock = threading.Lock()
+        self.stream_playlist = bool(self.stream_playlist)
+        self.playlist_progress = PlaylistProgress(ArchivingContext.state_file(self.playlist_progress_file))
+        self.concurrent_fragment_downloads = int(self.concurrent_fragment_downloads)
+        assert self.concurrent_fragment_downloads >= 1, f"concurrent_fragment_downloads must be at least 1, got {self.concurrent_fragment_downloads}"
+        self.http_chunk_size = self.parse_bytes("http_chunk_size")
+        self.throttled_rate = self.parse_bytes("throttled_rate")
+        assert not self.external_downloader or shutil.which(self.external_downloader), f"external_downloader {self.external_downloader} not found, is it installed?"
 
     @staticmethod
     def configs() -> dict:
@@ -33,8 +93,61 @@ class YoutubeDLArchiver(Archiver):
             "end_means_success": {"default": True, "help": "if True, any archived content will mean a 'success', if False this archiver will not return a 'success' stage; this is useful for cases when the yt-dlp will archive a video but ignore other types of content like images or text only pages that the subsequent archivers can retrieve."},
             'allow_playlist': {"default": True, "help": "If True will also download playlists, set to False if the expectation is to download a single video."},
             "max_downloads": {"default": "inf", "help": "Use to limit the number of videos to download when a channel or long page is being extracted. 'inf' means no limit."},
+            "concurrent_fragment_downloads": {"default": 4, "help": "how many fragments of HLS/DASH videos to download at the same time"},
+            "http_chunk_size": {"default": "10M", "help": "download videos served over plain http in requests of this size (eg: 10M), avoids the throttling of big requests on sites like YouTube, empty to disable"},
+            "throttled_rate": {"default": "", "help": "restart downloads whose speed falls below this rate in bytes per second (eg: 100K), which is often a sign of throttling, empty to disable"},
+            "external_downloader": {"default": "", "help": "download with this program instead of yt-dlp's own downloader, eg: aria2c (it must be installed)"},
+            "external_downloader_args": {"default": "", "help": "arguments for the external_downloader, eg: '-x 16 -s 16 -k 1M' for aria2c"},
+            "stream_playlist": {"default": False, "help": "if True, each playlist entry is downloaded, enriched, stored and deleted before the next one starts, so only one is on disk at a time"},
+            "playlist_progress_file": {"default": "playlist_progress.pickle", "help": "keeps which entries of a streamed playlist were stored, so an interrupted playlist resumes from the missing ones, relative to the orchestrator's state_dir, empty to disable"},
         }
 
+    def parse_bytes(self, prop: str) -> int:
+        # sizes like 10M or 100K, None when empty
+        value = getattr(self, prop)
+        if value in [None, ""]: return None
+        parsed = yt_dlp.utils.parse_bytes(str(value))
+        assert parsed, f"invalid {prop} value '{value}', it should be a number of bytes like 1048576 or 1M"
+        return parsed
+
+    def download_options(self) -> dict:
+        # yt-dlp options to speed up downloads, see configs and scripts/benchmark_ytdlp.py
+        options = {"concurrent_fragment_downloads": self.concurrent_fragment_downloads}
+        if self.http_chunk_size: options["http_chunk_size"] = self.http_chunk_size
+        if self.throttled_rate: options["throttledratelimit"] = self.throttled_rate
+        if self.external_downloader:
+            options["external_downloader"] = {"default": self.external_downloader}
+            if self.external_downloader_args: options["external_downloader_args"] = {"default": shlex.split(self.external_downloader_args)}
+        return options
+
+    def stop_if_cancelled(self, _progress: dict) -> None:
+        if self.is_cancelled(): raise yt_dlp.utils.DownloadCancelled("cancelled, another archiver succeeded")
+
+    def get_cached_info(self, url: str) -> dict:
+        with self._info_cache_lock:
+            if (info := self._info_cache.get(url)) is None: return None
+            self._info_cache.move_to_end(url)
+        return self.reusable_info(info)
+
+    def cache_info(self, url: str, info: dict) -> None:
+        info = self.reusable_info(info)
+        with self._info_cache_lock:
+            self._info_cache[url] = info
+            self._info_cache.move_to_end(url)
+            while len(self._info_cache) > self.INFO_CACHE_SIZE: self._info_cache.popitem(last=False)
+
+    @staticmethod
+    def reusable_info(info):
+        """
+        copy of an extracted info dict that another YoutubeDL can process again (eg: with another format) without extracting it,
+        see YoutubeDL.sanitize_info which does the same for --load-info-json but also drops the playlist entries
+        """
+        if isinstance(info, dict):
+            return {k: YoutubeDLArchiver.reusable_info(v) for k, v in info.items() if not k.startswith("__") and k not in YoutubeDLArchiver.PROCESSED_KEYS}
+        if isinstance(info, (list, tuple, yt_dlp.utils.LazyList)):
+            return [YoutubeDLArchiver.reusable_info(v) for v in info]
+        return info
+
     def download(self, item: Metadata, only_credit_string=False) -> Metadata:
         url = item.get_url()
 
@@ -53,13 +166,24 @@ class YoutubeDLArchiver(Archiver):
                         "live_from_start": self.live_from_start, "proxy": self.proxy, 
                         "max_downloads": self.max_downloads, "playlistend": self.max_downloads,
                         'cookiefile': self.netscape_cookies,
-                        'format': self.format
+                        'format': self.format,
+                        'progress_hooks': [self.stop_if_cancelled],
+                        "getcomments": self.comments,
+                        **self.download_options(),
                        }
+        # streamed playlists only list their entries here, each one is extracted when its turn comes,
+        # without a stream_media callback (eg: process workers) the playlist is downloaded whole
+        stream_media = ItemContext.current().get("stream_media") if self.stream_playlist else None
+        if stream_media: ydl_options["extract_flat"] = "in_playlist"
         ydl = yt_dlp.YoutubeDL(ydl_options) # allsubtitles and subtitleslangs not working as expected, so default lang is always "en"
 
         try:
             # don't download since it can be a live stream
-            info = ydl.extract_info(url, download=False)
+            if (info := self.get_cached_info(url)) is None:
+                info = ydl.extract_info(url, download=False)
+                self.cache_info(url, info)
+            if only_credit_string:
+                return Metadata().set("credit_string", self.get_credit_string(url, info))
             if info.get('is_live', False) and not self.livestreams:
                 logger.warning("Livestream detected, skipping due to 'livestreams' configuration setting")
                 return False
@@ -96,48 +220,33 @@ class YoutubeDLArchiver(Archiver):
             logger.debug(f'ytdlp exception which is normal for example a facebook page with images only will cause a IndexError: list index out of range. Exception is: \n  {e}')
             return False
 
-        # this time download
-        ydl = yt_dlp.YoutubeDL({**ydl_options, "getcomments": self.comments})
-        #TODO: for playlist or long lists of videos, how to download one at a time so they can be stored before the next one is downloaded?
-        info = ydl.extract_info(url, download=(not only_credit_string))
+        result = Metadata()
+        if "entries" in info and stream_media:
+            # each entry is downloaded, enriched and stored before the next one starts
+            if not self.download_playlist(url, info, ydl_options, result, stream_media): return False
+        else:
+            # this time download, processing the info extracted above again (the format may have changed) instead of extracting it again
+            ydl = yt_dlp.YoutubeDL(ydl_options)
+            info = ydl.process_ie_result(self.reusable_info(info), download=True)
 
-        if "entries" in info:
-            entries = info.get("entries", [])
-            if not len(entries):
-                logger.warning('YoutubeDLArchiver could not find any video')
-                return False
-        else: entries = [info]
+            if "entries" in info:
+                entries = info.get("entries", [])
+                if not len(entries):
+                    logger.warning('YoutubeDLArchiver could not find any video')
+                    return False
+            else: entries = [info]
 
-        result = Metadata()
-        if not only_credit_string: result.set_title(info.get("title"))
-        if "description" in info and not only_credit_string: result.set_content(info["description"])
-        for entry in entries:
-            try:
-                filename = ydl.prepare_filename(entry)
-                if "audio_format" in ydl_options and ydl_options["extract_audio"]:
-                    filename = os.path.splitext(filename)[0] + f""".{ydl_options["audio_format"]}"""
-                if not os.path.exists(filename):
-                    filename = filename.split('.')[0] + '.mkv'
-
-                new_media = Media(filename)
-                for x in ["duration", "original_url", "fulltitle", "description", "upload_date"]:
-                    if x in entry and not only_credit_string: new_media.set(x, entry[x])
-
-                # read text from subtitles if enabled
-                if self.subtitles:
-                    for lang, val in (info.get('requested_subtitles') or {}).items():
-                        try:    
-                            subs = pysubs2.load(val.get('filepath'), encoding="utf-8")
-                            text = " ".join([line.text for line in subs])
-                            if not only_credit_string: new_media.set(f"subtitles_{lang}", text)
-                        except Exception as e:
-                            logger.error(f"Error loading subtitle file {val.get('filepath')}: {e}")
-                result.add_media(new_media)
-            except Exception as e:
-                logger.error(f"Error processing entry {entry}: {e}")
+            for entry in entries:
+                try:
+                    result.add_media(self.get_media(ydl, ydl_options, info, entry))
+                except Exception as e:
+                    logger.error(f"Error processing entry {entry}: {e}")
+
+        result.set_title(info.get("title"))
+        if info.get("description"): result.set_content(info["description"])
 
         # extract comments if enabled
-        if self.comments and not only_credit_string:
+        if self.comments:
             result.set("comments", [{
                 "text": c["text"],
                 "author": c["author"], 
@@ -147,11 +256,18 @@ class YoutubeDLArchiver(Archiver):
         if (timestamp := info.get("timestamp")):
             #TODO: fix deprecated timestamp, 
             timestamp = datetime.datetime.fromtimestamp(timestamp, tz = datetime.timezone.utc).isoformat()
-            if not only_credit_string: result.set_timestamp(timestamp)
+            result.set_timestamp(timestamp)
         if (upload_date := info.get("upload_date")):
             upload_date = datetime.datetime.strptime(upload_date, '%Y%m%d').replace(tzinfo=datetime.timezone.utc)
-            if not only_credit_string: result.set("upload_date", upload_date)
+            result.set("upload_date", upload_date)
 
+        result.set("credit_string", self.get_credit_string(url, info))
+
+        if self.end_means_success: result.success("yt-dlp")
+        else: result.status = "yt-dlp"
+        return result
+
+    def get_credit_string(self, url: str, info: dict) -> str:
         uploader = info.get("uploader", "<Uploader Name>")
         uploader_id = info.get("uploader_id", "<@Uploader Handle>")
 
@@ -178,9 +294,86 @@ class YoutubeDLArchiver(Archiver):
             credit_string = f"""{website_name}"""
         else:
             credit_string = f"""{uploader} ({"@" if "@" not in uploader_id else ""}{uploader_id}) via {website_name}"""
+        return credit_string
 
-        result.set("credit_string", credit_string)
+    def get_media(self, ydl: yt_dlp.YoutubeDL, ydl_options: dict, info: dict, entry: dict) -> Media:
+        filename = ydl.prepare_filename(entry)
+        if "audio_format" in ydl_options and ydl_options["extract_audio"]:
+            filename = os.path.splitext(filename)[0] + f""".{ydl_options["audio_format"]}"""
+        if not os.path.exists(filename):
+            filename = filename.split('.')[0] + '.mkv'
+
+        new_media = Media(filename)
+        for x in ["duration", "original_url", "fulltitle", "description", "upload_date"]:
+            if x in entry: new_media.set(x, entry[x])
+
+        # read text from subtitles if enabled
+        if self.subtitles:
+            for lang, val in (info.get('requested_subtitles') or {}).items():
+                try:    
+                    subs = pysubs2.load(val.get('filepath'), encoding="utf-8")
+                    text = " ".join([line.text for line in subs])
+                    new_media.set(f"subtitles_{lang}", text)
+                except Exception as e:
+                    logger.error(f"Error loading subtitle file {val.get('filepath')}: {e}")
+        return new_media
+
+    def download_playlist(self, url: str, info: dict, ydl_options: dict, result: Metadata, stream_media) -> bool:
+        """
+        downloads the (flat) playlist entries one at a time, handing each media to @stream_media (it enriches, stores
+        and deletes it) before the next one starts. stored entries are kept in playlist_progress_file so an
+        interrupted playlist resumes from the ones that are missing. returns False if nothing was archived,
+        when cancelled the entries stored so far are returned
+        """
+        entries = list(info.get("entries") or [])
+        if not len(entries):
+            logger.warning('YoutubeDLArchiver could not find any video')
+            return False
+
+        if self.playlist_progress.has(url) and (rows_final := ItemContext.current().get("rows_final")):
+            # when archiving concurrently the row, part of the key, is known once the items before this one are acquired
+            rows_final.wait()
+        progress_key = PlaylistProgress.key(url)
+        progress = self.playlist_progress.get(progress_key, {"done": [], "media": []})
+        if len(progress["done"]):
+            logger.info(f"resuming playlist {url}, {len(progress['done'])}/{len(entries)} entries were already stored")
+            ItemContext.current().setdefault("streamed_media", []).extend(progress["media"])
+            for m in progress["media"]: result.add_media(m)
+
+        ydl = yt_dlp.YoutubeDL({k: v for k, v in ydl_options.items() if k != "extract_flat"})
+        playlist = Metadata().set_title(info.get("title"))
+        failed, cancelled = 0, False
+        for i, entry in enumerate(entries):
+            index = entry.get("playlist_index") or i + 1
+            if index in progress["done"]: continue
+            if self.is_cancelled():
+                cancelled = True
+                break
+            try:
+                entry_info = ydl.process_ie_result(self.reusable_info(entry), download=True)
+                media = self.get_media(ydl, ydl_options, entry_info, entry_info)
+                for val in (entry_info.get('requested_subtitles') or {}).values():
+                    if val.get('filepath') and os.path.isfile(val['filepath']): os.remove(val['filepath'])
+            except yt_dlp.utils.MaxDownloadsReached:
+                break
+            except Exception as e:
+                logger.error(f"Error downloading playlist entry {index} of {url}: {e}")
+                failed += 1
+                continue
+            try:
+                stream_media(media, playlist)
+            except Exception as e:
+                # it stays in the tmp dir and the result, to be stored with the rest of the item
+                logger.error(f"Error storing playlist entry {index} of {url}: {e}")
+                failed += 1
+            result.add_media(media)
+            if media.get("streamed"):
+                progress["done"].append(index)
+                progress["media"].append(media)
+                self.playlist_progress.set(progress_key, progress)
+            logger.debug(f"playlist {url}: entry {index}/{len(entries)} done")
+
+        # a complete playlist does not need to resume
+        if not failed and not cancelled: self.playlist_progress.remove(progress_key)
+        return len(result.media) > 0
 
-        if self.end_means_success: result.success("yt-dlp")
-        else: result.status = "yt-dlp"
-        return result
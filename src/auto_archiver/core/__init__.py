@@ -1,7 +1,9 @@
 from .metadata import Metadata
 from .media import Media
+from .hashing import DigestCache
+from .probe import Probe, ProbeCache
 from .step import Step
-from .context import ArchivingContext
+from .context import ArchivingContext, ItemContext
 from .project_details import ProjectDetail
 
 # cannot import ArchivingOrchestrator/Config to avoid circular dep
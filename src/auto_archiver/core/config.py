@@ -12,7 +12,8 @@ from ..databases import Database
 from ..formatters import Formatter
 from ..storages import Storage
 from ..enrichers import Enricher
-from . import Step, ProjectDetail
+from . import Step, ProjectDetail, ArchivingContext
+from .orchestrator import ArchivingOrchestrator
 from ..utils import update_nested_dict
 
 
@@ -60,25 +61,26 @@ class Config:
 
             parser.add_argument('--config', action='store', dest='config', help='the filename of the YAML configuration file (defaults to \'config.yaml\')', default='orchestration.yaml')
 
-        for configurable in self.configurable_parents:
-            child: Step
-            for child in configurable.__subclasses__():
-                assert child.configs() is not None and type(child.configs()) == dict, f"class '{child.name}' should have a configs method returning a dict."
-                for config, details in child.configs().items():
-                    assert "." not in child.name, f"class prop name cannot contain dots('.'): {child.name}"
-                    assert "." not in config, f"config property cannot contain dots('.'): {config}"
-                    config_path = f"{child.name}.{config}"
-
-                    if use_cli:
-                        try:
-                            parser.add_argument(f'--{config_path}', action='store', dest=config_path, help=f"{details['help']} (defaults to {details['default']})", choices=details.get("choices", None))
-                        except argparse.ArgumentError:
-                            # captures cases when a Step is used in 2 flows, eg: wayback enricher vs wayback archiver
-                            pass
-
-                    self.defaults[config_path] = details["default"]
-                    if "cli_set" in details:
-                        self.cli_ops[config_path] = details["cli_set"]
+        # the orchestrator is not a Step but is configured in the same way, under `configurations.orchestrator`
+        configurables = [child for configurable in self.configurable_parents for child in configurable.__subclasses__()] + [ArchivingOrchestrator]
+        child: Step
+        for child in configurables:
+            assert child.configs() is not None and type(child.configs()) == dict, f"class '{child.name}' should have a configs method returning a dict."
+            for config, details in child.configs().items():
+                assert "." not in child.name, f"class prop name cannot contain dots('.'): {child.name}"
+                assert "." not in config, f"config property cannot contain dots('.'): {config}"
+                config_path = f"{child.name}.{config}"
+
+                if use_cli:
+                    try:
+                        parser.add_argument(f'--{config_path}', action='store', dest=config_path, help=f"{details['help']} (defaults to {details['default']})", choices=details.get("choices", None))
+                    except argparse.ArgumentError:
+                        # captures cases when a Step is used in 2 flows, eg: wayback enricher vs wayback archiver
+                        pass
+
+                self.defaults[config_path] = details["default"]
+                if "cli_set" in details:
+                    self.cli_ops[config_path] = details["cli_set"]
 
         if use_cli:
             args = parser.parse_args()
@@ -100,6 +102,8 @@ class Config:
                 val = self.yaml_config.get("configurations", {}).get(child, {}).get(config, default)
             self.config[child][config] = val
         self.config = dict(self.config)
+        # steps resolve the files they keep between runs when initialized below
+        ArchivingContext.set("state_dir", self.config[ArchivingOrchestrator.name]["state_dir"], keep_on_reset=True)
 
         # 4. STEPS: read steps and validate they exist
         steps = self.yaml_config.get("steps", {})
@@ -131,6 +135,7 @@ class Config:
         logger.info(f"SCREENSHOT_STORAGES: {[x.name for x in self.screenshot_storages]}")
         logger.info(f"FORMATTER: {self.formatter.name}")
         logger.info(f"PROJECT_DETAILS: {[x.name for x in self.project_details]}")
+        logger.info(f"ORCHESTRATOR: {self.config.get(ArchivingOrchestrator.name, {})}")
 
     def read_yaml(self, yaml_filename: str) -> dict:
         with open(yaml_filename, "r", encoding="utf-8") as inf:
@@ -1,13 +1,22 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Generator
+import os, pickle
+
+
 class ArchivingContext:
     """
     Singleton context class.
     ArchivingContext._get_instance() to retrieve it if needed
-    otherwise just 
+    otherwise just
     ArchivingContext.set(key, value)
-    and 
+    and
     ArchivingContext.get(key, default)
 
-    When reset is called, all values are cleared EXCEPT if they were .set(keep_on_reset=True)
+    Values .set(keep_on_reset=True) are shared by the whole process (eg: storages, project details),
+    all other values belong to the item being archived and live in its ItemContext (eg: tmp_dir, gsheet, folder).
+    When reset is called, the values of the current item are cleared
         reset(full_reset=True) will recreate everything including the keep_on_reset status
     """
     _instance = None
@@ -24,26 +33,120 @@ class ArchivingContext:
 
     @staticmethod
     def set(key, value, keep_on_reset: bool = False):
-        ac = ArchivingContext.get_instance()
-        ac.configs[key] = value
-        if keep_on_reset: ac.keep_on_reset.add(key)
+        if keep_on_reset:
+            ac = ArchivingContext.get_instance()
+            ac.configs[key] = value
+            ac.keep_on_reset.add(key)
+        else:
+            ItemContext.current().set(key, value)
 
     @staticmethod
     def get(key: str, default=None):
-        return ArchivingContext.get_instance().configs.get(key, default)
+        return ItemContext.current().get(key, default)
 
     @staticmethod
     def reset(full_reset: bool = False):
-        ac = ArchivingContext.get_instance()
-        if full_reset: ac.keep_on_reset = set()
-        ac.configs = {k: v for k, v in ac.configs.items() if k in ac.keep_on_reset}
+        ItemContext.current().values = {}
+        if full_reset:
+            ac = ArchivingContext.get_instance()
+            ac.keep_on_reset = set()
+            ac.configs = {}
 
     # ---- custom getters/setters for widely used context values
 
     @staticmethod
     def set_tmp_dir(tmp_dir: str):
-        ArchivingContext.get_instance().configs["tmp_dir"] = tmp_dir
+        ItemContext.current().tmp_dir = tmp_dir
 
     @staticmethod
     def get_tmp_dir() -> str:
-        return ArchivingContext.get_instance().configs.get("tmp_dir")
+        return ItemContext.current().tmp_dir
+
+    @staticmethod
+    def state_file(filename: str) -> str:
+        """
+        path of a file kept between runs (caches, resume progress): relative filenames go in the orchestrator's
+        state_dir, which is created if needed. empty filenames stay empty
+        """
+        if not filename or os.path.isabs(filename): return filename
+        state_dir = ArchivingContext.get("state_dir") or "state"
+        os.makedirs(state_dir, exist_ok=True)
+        return os.path.join(state_dir, filename)
+
+
+class ItemContext:
+    """
+    The values that belong to a single item (URL) being archived, the one in use is ItemContext.current().
+    Backed by contextvars so each thread/asyncio task archiving an item sees its own:
+        with ItemContext().activate() as context:
+            context.tmp_dir = "..."
+    Values missing from the item fall back to the process-wide ArchivingContext ones (eg: storages).
+    """
+    _current: ContextVar[ItemContext] = ContextVar("archiving_item_context", default=None)
+
+    def __init__(self, values: dict = None) -> None:
+        self.values = dict(values or {})
+
+    @staticmethod
+    def current() -> ItemContext:
+        if (context := ItemContext._current.get()) is None:
+            context = ItemContext()
+            ItemContext._current.set(context)
+        return context
+
+    @contextmanager
+    def activate(self) -> Generator[ItemContext, None, None]:
+        """makes this the current ItemContext until the with block exits"""
+        token = ItemContext._current.set(self)
+        try:
+            yield self
+        finally:
+            ItemContext._current.reset(token)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.values: return self.values[key]
+        return ArchivingContext.get_instance().configs.get(key, default)
+
+    def set(self, key: str, value: Any) -> ItemContext:
+        self.values[key] = value
+        return self
+
+    def setdefault(self, key: str, value: Any) -> Any:
+        # returns the existing value or sets and returns @value, eg: a random path shared by all the item's media
+        return self.values.setdefault(key, value)
+
+    def picklable(self) -> ItemContext:
+        """
+        returns a copy without the values (or dict entries) that cannot be sent to another process,
+        that process falls back to the process-wide values it inherited
+        """
+        def can_pickle(value) -> bool:
+            try:
+                pickle.dumps(value)
+                return True
+            except Exception: return False
+
+        values = {}
+        for k, v in self.values.items():
+            if can_pickle(v): values[k] = v
+            elif type(v) == dict: values[k] = {dk: dv for dk, dv in v.items() if can_pickle(dv)}
+        return ItemContext(values)
+
+    # ---- widely used item values
+
+    @property
+    def tmp_dir(self) -> str:
+        return self.values.get("tmp_dir")
+
+    @tmp_dir.setter
+    def tmp_dir(self, tmp_dir: str) -> None:
+        self.values["tmp_dir"] = tmp_dir
+
+    @property
+    def gsheet(self) -> dict:
+        # set by the gsheet_feeder: {"name_prefix": str, "row": int, "worksheet": GWorksheet}
+        return self.values.get("gsheet")
+
+    @property
+    def folder(self) -> str:
+        return self.values.get("folder", "")
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Tuple
+import hashlib
+import mmap
+import os
+import threading
+
+
+class DigestCache:
+    """
+    Process-wide cache of file digests so each file is read from disk once, no matter how many steps need its hash:
+        DigestCache.get(filename, "SHA-256")
+    Entries are keyed on the file identity (path, size, mtime, inode) and algorithm, so a modified file is hashed again.
+    On a miss every algorithm that was requested before (see DigestCache.register) is computed in the same read pass:
+    the file is memory-mapped and each chunk is fed to all the algorithms at once from a thread pool, hashlib releases
+    the GIL so SHA-256, SHA3-512 and MD5 together take about as long as the slowest of them.
+    """
+    ALGORITHMS = {
+        "SHA-256": hashlib.sha256,
+        "SHA3-512": hashlib.sha3_512,
+        # not for evidence, only to compare with the md5 checksums reported by GCS/Google Drive
+        "MD5": hashlib.md5,
+    }
+    DEFAULT_ALGORITHM = "SHA-256"
+    DEFAULT_CHUNKSIZE = int(1.6e7)
+    MAX_ENTRIES = 4096
+    MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+    _digests: OrderedDict[Tuple, str] = OrderedDict()
+    _registered = set()
+    _lock = threading.Lock()
+    _file_locks: Dict[Tuple, threading.Lock] = {}
+    _executor: ThreadPoolExecutor = None
+    _executor_pid: int = None
+
+    @staticmethod
+    def register(*algorithms: str) -> None:
+        """algorithms that will be computed alongside any other, eg: the hash_enricher's"""
+        for algorithm in algorithms:
+            assert algorithm in DigestCache.ALGORITHMS, f"Invalid hash algorithm {algorithm}, must be one of {list(DigestCache.ALGORITHMS)}"
+        with DigestCache._lock:
+            DigestCache._registered.update(algorithms)
+
+    @staticmethod
+    def get(filename: str, algorithm: str = None, chunksize: int = None) -> str:
+        """returns the hex digest of filename using algorithm (defaults to SHA-256)"""
+        algorithm = algorithm or DigestCache.DEFAULT_ALGORITHM
+        return DigestCache.get_many(filename, [algorithm], chunksize)[algorithm]
+
+    @staticmethod
+    def get_many(filename: str, algorithms: Iterable[str], chunksize: int = None) -> Dict[str, str]:
+        """returns {algorithm: hex digest} for all the algorithms, reading the file at most once"""
+        algorithms = list(algorithms)
+        for algorithm in algorithms:
+            assert algorithm in DigestCache.ALGORITHMS, f"Invalid hash algorithm {algorithm}, must be one of {list(DigestCache.ALGORITHMS)}"
+        file_key = DigestCache._file_key(filename)
+
+        # a lock per file so concurrent requests for the same file wait for a single read
+        with DigestCache._lock:
+            file_lock = DigestCache._file_locks.setdefault(file_key, threading.Lock())
+        try:
+            with file_lock:
+                if (digests := DigestCache._lookup(file_key, algorithms)) is not None:
+                    return digests
+                with DigestCache._lock:
+                    to_compute = set(algorithms) | DigestCache._registered
+                computed = DigestCache._compute(filename, to_compute, int(chunksize or DigestCache.DEFAULT_CHUNKSIZE))
+                with DigestCache._lock:
+                    for algorithm, digest in computed.items():
+                        DigestCache._digests[(*file_key, algorithm)] = digest
+                    while len(DigestCache._digests) > DigestCache.MAX_ENTRIES:
+                        DigestCache._digests.popitem(last=False)
+        finally:
+            # also when the read failed, waiters already hold the lock and later requests find the digests cached
+            with DigestCache._lock:
+                if DigestCache._file_locks.get(file_key) is file_lock: DigestCache._file_locks.pop(file_key)
+        return {algorithm: computed[algorithm] for algorithm in algorithms}
+
+    @staticmethod
+    def clear() -> None:
+        with DigestCache._lock:
+            DigestCache._digests.clear()
+
+    @staticmethod
+    def _file_key(filename: str) -> Tuple:
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    @staticmethod
+    def _lookup(file_key: Tuple, algorithms: Iterable[str]) -> Dict[str, str]:
+        with DigestCache._lock:
+            digests = {}
+            for algorithm in algorithms:
+                if (digest := DigestCache._digests.get((*file_key, algorithm))) is None: return None
+                DigestCache._digests.move_to_end((*file_key, algorithm))
+                digests[algorithm] = digest
+            return digests
+
+    @staticmethod
+    def get_executor() -> ThreadPoolExecutor:
+        """the thread pool used for hashing, shared by the process (recreated after a fork)"""
+        with DigestCache._lock:
+            if DigestCache._executor is None or DigestCache._executor_pid != os.getpid():
+                DigestCache._executor = ThreadPoolExecutor(max_workers=DigestCache.MAX_WORKERS, thread_name_prefix="hashing")
+                DigestCache._executor_pid = os.getpid()
+            return DigestCache._executor
+
+    @staticmethod
+    def _compute(filename: str, algorithms: Iterable[str], chunksize: int) -> Dict[str, str]:
+        hashes = [(algorithm, DigestCache.ALGORITHMS[algorithm]()) for algorithm in algorithms]
+        with open(filename, "rb") as f:
+            # empty files cannot be memory-mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                return {algorithm: h.hexdigest() for algorithm, h in hashes}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                for start in range(0, len(view), chunksize):
+                    with view[start:start + chunksize] as chunk:
+                        if len(hashes) == 1:
+                            hashes[0][1].update(chunk)
+                            continue
+                        # chunks are hashed in lockstep so the file is only paged in once
+                        futures = [DigestCache.get_executor().submit(h.update, chunk) for _, h in hashes]
+                        wait(futures)
+                        for future in futures: future.result()
+        return {algorithm: h.hexdigest() for algorithm, h in hashes}
@@ -2,15 +2,15 @@
 from __future__ import annotations
 import os
 import traceback
+import contextvars
 from typing import Any, List
 from dataclasses import dataclass, field
 from dataclasses_json import dataclass_json, config
 import mimetypes
 
-import ffmpeg
-from ffmpeg._run import Error
-
-from .context import ArchivingContext
+from .context import ItemContext
+from .hashing import DigestCache
+from .probe import Probe, ProbeCache
 
 from loguru import logger
 
@@ -55,15 +55,18 @@ class Media:
         # into the provided/available storages [Storage] repeats the process for
         # its properties, in case they have inner media themselves for now it
         # only goes down 1 level but it's easy to make it recursive if needed.
-        storages = override_storages or ArchivingContext.get("storages")
-        thumbnail_storages = ArchivingContext.get("thumbnail_storages")
-        html_metadata_storages = ArchivingContext.get("html_metadata_storages")
-        screenshot_storages = ArchivingContext.get("screenshot_storages")
+        context = ItemContext.current()
+        storages = override_storages or context.get("storages")
+        thumbnail_storages = context.get("thumbnail_storages")
+        html_metadata_storages = context.get("html_metadata_storages")
+        screenshot_storages = context.get("screenshot_storages")
 
         if not len(storages):
             logger.warning(f"No storages found in local context or provided directly for {self.filename}.")
             return
 
+        # (storage, media) pairs, each media only goes to the storages of its kind
+        uploads = []
         for s in storages:
             for any_media in self.all_inner_media(include_self=True):
                 # if its not a thumbnail and its not a metadata file
@@ -71,25 +74,65 @@ class Media:
                     and "html_metadata" not in any_media.get("id")
                     and "screenshot" not in any_media.get("id")
                 ):
-                    s.store(any_media, url, metadata=metadata)
+                    uploads.append((s, any_media))
 
         for s in thumbnail_storages:
             for any_media in self.all_inner_media(include_self=True):
                 # if it is a thumbnail
                 if any_media.get("id") is not None and "thumbnail" in any_media.get("id"):
-                    s.store(any_media, url, metadata=metadata)
+                    uploads.append((s, any_media))
 
         for s in html_metadata_storages:
             for any_media in self.all_inner_media(include_self=True):
                 # if it is a metadata file
                 if any_media.get("id") is not None and "html_metadata" in any_media.get("id"):
-                    s.store(any_media, url, metadata=metadata)
+                    uploads.append((s, any_media))
 
         for s in screenshot_storages:
             for any_media in self.all_inner_media(include_self=True):
                 # if it is a metadata file
                 if any_media.get("id") is not None and "screenshot" in any_media.get("id"):
-                    s.store(any_media, url, metadata=metadata)
+                    uploads.append((s, any_media))
+
+        Media.store_in_parallel(uploads, url, metadata)
+
+    @staticmethod
+    def store_in_parallel(uploads: list, url: str, metadata: Any = None) -> None:
+        """
+        uploads each (storage, media) pair in the thread pool of its storage, so different storages upload at the same time
+        urls are added in the same order as the pairs and failures are reported all together once every upload finished
+        media a storage already has (same SHA-256, see the sqlite_db "media_index") are not uploaded again
+        """
+        media_index = ItemContext.current().get("media_index")
+        futures = []
+        for s, media in uploads:
+            if media.is_stored():
+                logger.debug(f"{media.key} already stored, skipping")
+                continue
+            # keys are set before uploading so all storages agree on them, and also for reused media as databases read them
+            s.set_key(media, url)
+            sha256 = DigestCache.get(media.filename, "SHA-256") if media_index and os.path.isfile(media.filename) else None
+            if sha256 and (existing_url := media_index.get_media_url(sha256, s.name)):
+                logger.debug(f"{media.filename} was stored in {s.name} before, reusing {existing_url}")
+                media.set("previously archived", True)
+                futures.append((s, media, sha256, None, existing_url))
+                continue
+            # each upload runs with a copy of the item's context
+            futures.append((s, media, sha256, s.get_upload_executor().submit(contextvars.copy_context().run, s.upload_and_get_cdn_url, media, metadata=metadata), None))
+
+        failures = []
+        for s, media, sha256, future, existing_url in futures:
+            if existing_url:
+                media.add_url(existing_url)
+                continue
+            try:
+                media.add_url(stored_url := future.result())
+                if sha256 and stored_url: media_index.add_media_url(sha256, s.name, stored_url)
+            except Exception as e:
+                logger.error(f"ERROR storage {s.name} failed to store {media.filename}: {e}: {traceback.format_exc()}")
+                failures.append(f"{s.name} ({os.path.basename(media.filename)}): {e}")
+        if len(failures):
+            raise Exception(f"{len(failures)}/{len(futures)} upload(s) failed for {url}: {'; '.join(failures)}")
 
     def all_inner_media(self, include_self=False):
         """ Media can be inside media properties, examples include transformations on original media.
@@ -107,7 +150,7 @@ class Media:
                             yield inner_media
 
     def is_stored(self) -> bool:
-        return len(self.urls) > 0 and len(self.urls) == len(ArchivingContext.get("storages"))
+        return len(self.urls) > 0 and len(self.urls) == len(ItemContext.current().get("storages"))
 
     def set(self, key: str, value: Any) -> Media:
         self.properties[key] = value
@@ -142,22 +185,24 @@ class Media:
     def is_image(self) -> bool:
         return self.mimetype.startswith("image")
 
+    def probe(self) -> Probe:
+        # ffprobe result of the file, shared with every other step that probes it (see ProbeCache)
+        return ProbeCache.get(self.filename)
+
     def is_valid_video(self) -> bool:
         # checks for video streams with ffmpeg, or min file size for a video
         # self.is_video() should be used together with this method
-        try:
-            streams = ffmpeg.probe(self.filename, select_streams='v')['streams']
-            logger.warning(f"STREAMS FOR {self.filename} {streams}")
-            return any(s.get("duration_ts", 0) > 0 for s in streams)
-        except Error: return False # ffmpeg errors when reading bad files
-        except Exception as e:
-            logger.error(e)
-            logger.error(traceback.format_exc())
+        probe = self.probe()
+        if probe.unreadable: return False # ffmpeg errors when reading bad files
+        if probe.error:
+            logger.error(f"could not probe {self.filename}: {probe.error}")
             try:
                 fsize = os.path.getsize(self.filename)
                 return fsize > 20_000
             except: pass
-        return True
+            return True
+        logger.debug(f"STREAMS FOR {self.filename} {probe.streams}")
+        return probe.has_video_frames()
     
     def clean_string(self, input_string):
 
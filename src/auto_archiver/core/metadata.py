@@ -1,16 +1,16 @@
 
 from __future__ import annotations
-import hashlib
 from typing import Any, List, Union, Dict
 from dataclasses import dataclass, field
 from dataclasses_json import dataclass_json, config
-import datetime
+import datetime, os
 from urllib.parse import urlparse
 from dateutil.parser import parse as parse_dt
 from loguru import logger
 
 from .media import Media
-from .context import ArchivingContext
+from .context import ItemContext
+from .hashing import DigestCache
 
 
 @dataclass_json  # annotation order matters
@@ -46,7 +46,7 @@ class Metadata:
     def store(self: Metadata, override_storages: List = None):
         # calls .store for all contained media. storages [Storage]
         self.remove_duplicate_media_by_hash()
-        storages = override_storages or ArchivingContext.get("storages")
+        storages = override_storages or ItemContext.current().get("storages")
         for media in self.media:
             media.store(override_storages=storages, url=self.get_url(), metadata=self)
 
@@ -141,20 +141,12 @@ class Metadata:
 
     def remove_duplicate_media_by_hash(self) -> None:
         # iterates all media, calculates a hash if it's missing and deletes duplicates
-        def calculate_hash_in_chunks(hash_algo, chunksize, filename) -> str:
-            # taken from hash_enricher, cannot be isolated to misc due to circular imports
-            with open(filename, "rb") as f:
-                while True:
-                    buf = f.read(chunksize)
-                    if not buf: break
-                    hash_algo.update(buf)
-            return hash_algo.hexdigest()
-
         media_hashes = set()
         new_media = []
         for m in self.media:
             h = m.get("hash")
-            if not h: h = calculate_hash_in_chunks(hashlib.sha256(), int(1.6e7), m.filename)
+            # streamed media are already stored and their local files deleted
+            if not h: h = DigestCache.get(m.filename, "SHA-256") if os.path.isfile(m.filename) else ""
             if len(h) and h in media_hashes: continue
             media_hashes.add(h)
             new_media.append(m)
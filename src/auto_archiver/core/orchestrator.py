@@ -1,33 +1,54 @@
 from __future__ import annotations
-from typing import Generator, Union, List
+from typing import Callable, Generator, Iterable, Union, List, Tuple, Deque
 from urllib.parse import urlparse
 from ipaddress import ip_address
+from collections import deque
+from functools import partial
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+import multiprocessing, contextvars, threading, copy, itertools
 
-from .context import ArchivingContext
+from .context import ArchivingContext, ItemContext
 
-from ..archivers import Archiver
+from ..archivers import Archiver, ArchiverRouter
 from ..feeders import Feeder
 from ..formatters import Formatter
 from ..storages import Storage
 from ..enrichers import Enricher
 from ..databases import Database
 from .metadata import Metadata
+from .media import Media
 
 from .project_details import ProjectDetail
+from ..utils.misc import folder_size
 
-import tempfile, traceback
+import os, tempfile, traceback, shutil
 from loguru import logger
 
 import random
 import string
 
 
+@dataclass
+class PendingItem:
+    """an item being archived concurrently, see ArchivingOrchestrator.feed_concurrently"""
+    item: Metadata
+    context: ItemContext
+    acquired: Future  # resolves to (result, cached) once downloaded and enriched
+    stored: Future = None  # resolves to (result, cached) once stored, submitted when the item's rows are final
+    inserted_rows: int = 0  # rows added below it for its extra media, known once acquired and inserted in the sheet once delivered
+
+
 class ArchivingOrchestrator:
+    name = "orchestrator"
+    WORKER_TYPES = ["thread", "process"]
+
     def __init__(self, config) -> None:
         self.feeder: Feeder = config.feeder
         self.formatter: Formatter = config.formatter
         self.enrichers: List[Enricher] = config.enrichers
         self.archivers: List[Archiver] = config.archivers
+        self.router = ArchiverRouter(self.archivers)
         self.databases: List[Database] = config.databases
         self.storages: List[Storage] = config.storages
         self.thumbnail_storages: List[Storage] = config.thumbnail_storages
@@ -35,11 +56,22 @@ class ArchivingOrchestrator:
         self.screenshot_storages: List[Storage] = config.screenshot_storages
         self.project_details: List[ProjectDetail] = config.project_details
 
+        orchestrator_config = getattr(config, "config", {}).get(self.name, {})
+        self.workers = int(orchestrator_config.get("workers", 1))
+        self.worker_type = orchestrator_config.get("worker_type", "thread")
+        self.upload_workers = int(orchestrator_config.get("upload_workers", 0))
+        self.max_tmp_disk_mb = int(orchestrator_config.get("max_tmp_disk_mb", 0))
+        self.race_archivers = bool(orchestrator_config.get("race_archivers", False))
+        self.enricher_processes = int(orchestrator_config.get("enricher_processes", 0))
+        assert self.workers >= 1, f"workers must be at least 1, got {self.workers}"
+        assert self.worker_type in ArchivingOrchestrator.WORKER_TYPES, f"worker_type must be one of {ArchivingOrchestrator.WORKER_TYPES}"
+
         ArchivingContext.set("storages", self.storages, keep_on_reset=True)
         ArchivingContext.set("thumbnail_storages", self.thumbnail_storages, keep_on_reset=True)
         ArchivingContext.set("html_metadata_storages", self.html_metadata_storages, keep_on_reset=True)
         ArchivingContext.set("screenshot_storages", self.screenshot_storages, keep_on_reset=True)
         ArchivingContext.set("project_details", self.project_details, keep_on_reset=True)
+        ArchivingContext.set("enricher_processes", self.enricher_processes, keep_on_reset=True)
 
         try: 
             for a in self.all_archivers_for_setup(): a.setup()
@@ -48,6 +80,18 @@ class ArchivingOrchestrator:
             self.cleanup()
 
 
+    @staticmethod
+    def configs() -> dict:
+        return {
+            "workers": {"default": 1, "help": "how many items (URLs) to archive at the same time, 1 archives them one after the other"},
+            "worker_type": {"default": "thread", "help": "when workers > 1, whether items are archived in threads or in (forked) processes", "choices": ArchivingOrchestrator.WORKER_TYPES},
+            "upload_workers": {"default": 0, "help": "if > 0, media is stored by this many background threads so the next items can be downloaded meanwhile, 0 stores it right after enriching"},
+            "max_tmp_disk_mb": {"default": 0, "help": "when archiving concurrently, stop feeding new items while the temporary folders of the items in flight use more than this many MB, 0 means no limit"},
+            "race_archivers": {"default": False, "help": "if True, the archivers suitable for a URL run at the same time and the first successful one in archivers order is used, the others are cancelled"},
+            "enricher_processes": {"default": 0, "help": "size of the process pool for CPU-bound enrichment of each media (eg: thumbnails, perceptual hashes), 0 means one per core and 1 disables the pool"},
+            "state_dir": {"default": "state", "help": "folder for the files kept between runs (translation cache, playlist progress, upload sessions), relative filenames of those are placed in it"},
+        }
+
     def set_uar(self):
         project_name = None
         for detail in self.project_details:
@@ -64,52 +108,254 @@ class ArchivingOrchestrator:
     def cleanup(self)->None:
         logger.info("Cleaning up")
         for a in self.all_archivers_for_setup(): a.cleanup()
+        for e in self.enrichers:
+            if not isinstance(e, Archiver): e.cleanup()
+        for d in self.databases: d.cleanup()
+        Enricher.shutdown_process_pool()
 
     def feed(self) -> Generator[Metadata]:
-        for item in self.feeder:
-            yield self.feed_item(item)
+        if self.workers > 1 or self.upload_workers > 0:
+            yield from self.feed_concurrently()
+        else:
+            for item, context in self.iterate_feeder():
+                yield self.feed_item(item, context)
         self.cleanup()
 
-    def feed_item(self, item: Metadata) -> Metadata:
+    def iterate_feeder(self) -> Generator[Tuple[Metadata, ItemContext]]:
+        """iterates the feeder giving each item its own ItemContext, where the feeder sets item values (eg: gsheet row)"""
+        items = iter(self.feeder)
+        while True:
+            context = ItemContext()
+            with context.activate():
+                try: item = next(items)
+                except StopIteration: return
+            yield item, context
+
+    def feed_item(self, item: Metadata, context: ItemContext = None) -> Metadata:
         """
         Takes one item (URL) to archive and calls self.archive, additionally:
+            - archives it within its own @context (a new one if not provided) and temporary folder
             - catches keyboard interruptions to do a clean exit
             - catches any unexpected error, logs it, and does a clean exit
         """
+        context = context or ItemContext()
         try:
-            ArchivingContext.reset()
-            with tempfile.TemporaryDirectory(dir="./") as tmp_dir:
-                ArchivingContext.set_tmp_dir(tmp_dir)
+            with context.activate(), tempfile.TemporaryDirectory(dir="./") as tmp_dir:
+                context.tmp_dir = tmp_dir
                 return self.archive(item)
         except KeyboardInterrupt:
             # catches keyboard interruptions to do a clean exit
             logger.warning(f"caught interrupt on {item=}")
-            for d in self.databases: d.aborted(item)
+            with context.activate():
+                for d in self.databases: d.aborted(item)
             self.cleanup()
             exit()
         except Exception as e:
-            logger.error(f'Got unexpected error on item {item}: {e}\n{traceback.format_exc()}')
-            for d in self.databases:
-                if type(e) == AssertionError: d.failed(item, str(e))
-                else: d.failed(item)
+            with context.activate():
+                self.failed(item, e)
+
+    def feed_concurrently(self) -> Generator[Metadata]:
+        """
+        Archives up to self.workers items at the same time:
+            - the feeder, URL sanitizing and all database calls happen in this thread
+            - archivers and enrichers (steps 3 and 4 of self.archive) run in a pool of threads/processes, each item with its own temporary folder and context
+            - storages and the formatter (steps 5 and 6) run in the same pool, or in a separate pool of self.upload_workers threads so item N is uploaded while item N+1 is downloaded
+            - an item is only stored once its sheet rows are final, as the stored file names include them, see settle_rows
+            - the feeder only skips the rows of an item's extra media once they are inserted, when the item is delivered
+            - no new items are fed while the temporary folders of the items in flight exceed self.max_tmp_disk_mb
+            - results are delivered to the databases in the same order the feeder produced the items
+        """
+        pending: Deque[PendingItem] = deque()
+        executor = self.get_executor()
+        upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="uploader") if self.upload_workers else None
+        store_executor = upload_executor or executor
+        max_pending = 2 * self.workers + self.upload_workers
+        try:
+            for item, context in self.iterate_feeder():
+                self.feeder.row_offset = 1
+                pending.append(PendingItem(item, context, self.submit(executor, item, context, pending)))
+                # keep a bounded number of items in flight and deliver the ones already finished
+                yield from self.advance(pending, store_executor, lambda: len(pending) >= max_pending or self.tmp_disk_exceeded(pending))
+            yield from self.advance(pending, store_executor, lambda: True)
+        except KeyboardInterrupt:
+            logger.warning(f"caught interrupt with {len(pending)} item(s) still being archived")
+            # the ones not started yet never run
+            for p in pending:
+                for future in filter(None, [p.acquired, p.stored]): future.cancel()
+            for ex in filter(None, [executor, upload_executor]): ex.shutdown(wait=False)
+            for p in pending:
+                with p.context.activate():
+                    for d in self.databases: d.aborted(p.item)
+                shutil.rmtree(p.context.tmp_dir, ignore_errors=True)
+            self.cleanup()
+            exit()
+        for ex in filter(None, [executor, upload_executor]): ex.shutdown()
 
+    def get_executor(self) -> Executor:
+        if self.worker_type == "process":
+            # forking means the workers inherit the already setup archivers/storages instead of pickling them
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_process_worker, initargs=(self,))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="archiver")
+
+    def submit(self, executor: Executor, item: Metadata, context: ItemContext, pending: Iterable[PendingItem] = ()) -> Future:
+        """
+        runs steps 1 and 2 of self.archive in this thread and sends steps 3 and 4 to the @executor,
+        the returned future resolves to (result, cached)
+        """
+        future = Future()
+        try:
+            with context.activate():
+                cached_result = self.start(item)
+        except Exception as e:
+            future.set_exception(e)
+        # the feeder and start() use the item's row in the sheet as it is now, the rows of the acquired @pending items
+        # are inserted above it before it is delivered
+        inserted = sum(p.inserted_rows for p in pending if p.stored is not None and self.same_worksheet(p.context.gsheet, context.gsheet))
+        if inserted: context.set("gsheet", dict(context.gsheet, row=context.gsheet["row"] + inserted))
+        if future.done(): return future
+        if cached_result:
+            future.set_result((cached_result, True))
+            return future
+
+        # created here so its disk usage can be monitored, removed once the item is delivered
+        context.tmp_dir = tempfile.mkdtemp(dir="./")
+        # set by settle_rows, media streamed while the item is acquired wait for it before being stored
+        context.set("rows_final", threading.Event())
+        return self.submit_stage(executor, item, context, "acquire")
+
+    def submit_stage(self, executor: Executor, item: Metadata, context: ItemContext, stage: str) -> Future:
+        if isinstance(executor, ProcessPoolExecutor):
+            # the rows_final event cannot reach another process, so process workers do not stream media
+            worker_context = context.picklable().set("stream_media_allowed", False)
+            return executor.submit(_run_in_worker, "process_in_context", item, worker_context, stage=stage)
+        return executor.submit(self.process_in_context, item, context, stage=stage)
+
+    def process_in_context(self, item: Metadata, context: ItemContext, stage: str) -> Tuple[Metadata, bool]:
+        """
+        runs inside a worker, within the item's context, returns (result, cached), @stage can be:
+            "acquire": steps 3 and 4 of self.archive
+            "store": steps 5 and 6 of self.archive
+        """
+        with context.activate():
+            if stage == "acquire": return self.acquire(item), False
+            return self.store(item), False
+
+    def advance(self, pending: Deque[PendingItem], store_executor: Executor, block: Callable[[], bool]) -> Generator[Metadata]:
+        """settles the rows of the acquired items (see settle_rows) and delivers the stored ones in order, waiting for them while block()"""
+        while len(pending):
+            self.settle_rows(pending, store_executor)
+            if pending[0].stored is not None and pending[0].stored.done():
+                yield self.deliver_next(pending)
+            elif block():
+                # until the oldest item is stored or the next one to settle is acquired
+                waiting = [pending[0].stored, next((p.acquired for p in pending if p.stored is None), None)]
+                wait([f for f in waiting if f is not None], return_when=FIRST_COMPLETED)
+            else: return
+
+    def settle_rows(self, pending: Deque[PendingItem], store_executor: Executor) -> None:
+        """
+        databases like gsheet_db write each media of an item in its own row, so the rows of an item are only final once all the items
+        before it are acquired and their number of media is known. Going through the pending items in order:
+            - once the items before it are acquired, the item's rows_final event is set
+            - once it is acquired too, the items after it are shifted by the rows it adds and its store stage is submitted,
+              storages name the files after the row so nothing is stored before
+        """
+        for i, p in enumerate(pending):
+            if p.stored is not None: continue
+            if (rows_final := p.context.get("rows_final")): rows_final.set()
+            if not p.acquired.done(): return
+            try:
+                result, cached = p.acquired.result()
+            except Exception:
+                # delivered as failed, it adds no rows
+                p.stored = p.acquired
+                continue
+            if (inserted := self.count_archived_media(result) - 1) > 0:
+                p.inserted_rows = inserted
+                self.shift_pending_rows(itertools.islice(pending, i + 1, None), p.context.gsheet, inserted)
+            p.stored = p.acquired if cached else self.submit_stage(store_executor, result, p.context, "store")
+
+    def deliver_next(self, pending: Deque[PendingItem]) -> Union[Metadata, None]:
+        """
+        signals the result (or failure) of the oldest pending item, already stored, to the databases.
+        databases like gsheet_db insert the rows of its extra media when it is delivered, so only then does the feeder skip them,
+        if it failed no rows are inserted and the items after it get back the rows settle_rows moved them from
+        """
+        p = pending.popleft()
+        with p.context.activate():
+            try:
+                result, cached = p.stored.result()
+                self.deliver(result, cached=cached)
+                # the feeder is past the last item it fed, rows inserted in another worksheet do not move it
+                if self.same_worksheet(p.context.gsheet, (pending[-1] if pending else p).context.gsheet):
+                    self.feeder.row_offset += p.inserted_rows
+                return result
+            except Exception as e:
+                self.failed(p.item, e)
+                if p.inserted_rows: self.shift_pending_rows(pending, p.context.gsheet, -p.inserted_rows)
+            finally:
+                if p.context.tmp_dir: shutil.rmtree(p.context.tmp_dir, ignore_errors=True)
+
+    def tmp_disk_exceeded(self, pending: Deque[PendingItem]) -> bool:
+        if not self.max_tmp_disk_mb: return False
+        used = sum(folder_size(p.context.tmp_dir) for p in pending if p.context.tmp_dir)
+        if exceeded := used > self.max_tmp_disk_mb * 1024 * 1024:
+            logger.debug(f"temporary folders use {used / 1024 / 1024:.1f}MB (max_tmp_disk_mb={self.max_tmp_disk_mb}), waiting for pending items before feeding more")
+        return exceeded
+
+    @staticmethod
+    def shift_pending_rows(pending: Iterable[PendingItem], gsheet: dict, inserted: int) -> None:
+        if not gsheet: return
+        for p in pending:
+            other = p.context.gsheet
+            if ArchivingOrchestrator.same_worksheet(gsheet, other) and other.get("row", 0) > gsheet.get("row", 0):
+                p.context.set("gsheet", dict(other, row=other["row"] + inserted))
+
+    @staticmethod
+    def same_worksheet(gsheet: dict, other: dict) -> bool:
+        return bool(gsheet and other) and gsheet.get("worksheet") is other.get("worksheet")
+
+    def failed(self, item: Metadata, e: Exception) -> None:
+        logger.error(f'Got unexpected error on item {item}: {e}\n{traceback.format_exc()}')
+        for d in self.databases:
+            if type(e) == AssertionError: d.failed(item, str(e))
+            else: d.failed(item, "")
 
     def archive(self, result: Metadata) -> Union[Metadata, None]:
         """
             Runs the archiving process for a single URL
             1. Each archiver can sanitize its own URLs
             2. Check for cached results in Databases, and signal start to the databases
-            3. Call Archivers until one succeeds
+            3. Call the Archivers routed to the URL until one succeeds
             4. Call Enrichers
             5. Store all downloaded/generated media
             6. Call selected Formatter and store formatted if needed
+            7. Signal completion to the databases
         """
+        if (cached_result := self.start(result)):
+            self.deliver(cached_result, cached=True)
+            self.feeder.row_offset = self.count_archived_media(cached_result)
+            return cached_result
+
+        result = self.process(result)
+        self.deliver(result)
+        # set the row_offset to the number of links archived
+        self.feeder.row_offset = self.count_archived_media(result)
+        return result
+
+    def start(self, result: Metadata) -> Union[Metadata, None]:
+        """steps 1 and 2 of self.archive, returns the cached result if a database has one"""
         original_url = result.get_url().strip()
         self.assert_valid_url(original_url)
 
         # 1 - sanitize - each archiver is responsible for cleaning/expanding its own URLs
+        # in archivers order, once a URL changes (eg: an expanded t.co link) the next ones are those routed to the new URL
         url = original_url
-        for a in self.archivers: url = a.sanitize_url(url)
+        routed = [id(a) for a in self.router.route(url)]
+        for a in self.archivers:
+            if id(a) not in routed: continue
+            if (sanitized := a.sanitize_url(url)) != url:
+                url, routed = sanitized, [id(r) for r in self.router.route(sanitized)]
         result.set_url(url)
         if original_url != url: result.set("original_url", original_url)
 
@@ -121,29 +367,41 @@ class ArchivingOrchestrator:
                 cached_result = (cached_result or Metadata()).merge(local_result)
         if cached_result:
             logger.debug("Found previously archived entry")
-            for d in self.databases:
-                try: d.done(cached_result, cached=True)
-                except Exception as e:
-                    logger.error(f"ERROR database {d.name}: {e}: {traceback.format_exc()}")
-            return cached_result
-
-        # 3 - call archivers until one succeeds
-        for a in self.archivers:
-            logger.info(f"Trying archiver {a.name} for {url}")
-            try:
-                r = a.download(result)
-                result.merge(r)
-                if result.is_success() and result.get("credit_string") is not None: break
-                elif result.is_success() and result.get("credit_string") is None:
-                    logger.info("Getting just credits from youtubedl_archiver")
-                    for archiver in self.archivers:
-                        if archiver.name == "youtubedl_archiver":
-                            archiver.download(result, only_credit_string=True)
-            except Exception as e: 
-                logger.error(f"ERROR archiver {a.name}: {e}: {traceback.format_exc()}")
+        return cached_result
+
+    def process(self, result: Metadata) -> Metadata:
+        """steps 3 to 6 of self.archive, the part that can run in a worker as it does not call the databases"""
+        return self.store(self.acquire(result))
+
+    def acquire(self, result: Metadata) -> Metadata:
+        """steps 3 and 4 of self.archive, downloads and enriches the content"""
+        url = result.get_url()
+        # archivers that download many files can hand each one over as soon as it is downloaded
+        if ItemContext.current().get("stream_media_allowed", True):
+            ItemContext.current().set("stream_media", partial(self.stream_media, result))
+
+        # 3 - call archivers until one succeeds, only the ones that declare they can handle the URL
+        archivers = self.router.route(url)
+        if self.race_archivers and len(archivers) > 1:
+            self.race(result, archivers)
+        else:
+            for a in archivers:
+                logger.info(f"Trying archiver {a.name} for {url}")
+                try:
+                    r = a.download(result)
+                    result.merge(r)
+                    if result.is_success() and result.get("credit_string") is not None: break
+                    elif result.is_success() and result.get("credit_string") is None:
+                        self.get_credit_string(result)
+                except Exception as e: 
+                    logger.error(f"ERROR archiver {a.name}: {e}: {traceback.format_exc()}")
+
+        # streamed media were already enriched and stored, and their local files deleted
+        streamed = [m for m in result.media if m.get("streamed")]
+        result.media = [m for m in result.media if not m.get("streamed")]
 
         for i, m in enumerate(result.get_all_media()):
-            m.set("id", f"""media_{i+1}""")
+            m.set("id", f"""media_{len(streamed)+i+1}""")
 
         # 4 - call enrichers to work with archived content
         for e in self.enrichers:
@@ -151,14 +409,98 @@ class ArchivingOrchestrator:
             except Exception as exc: 
                 logger.error(f"ERROR enricher {e.name}: {exc}: {traceback.format_exc()}")
 
-        gsheet = ArchivingContext.get("gsheet")
-        for m in result.get_all_media():
+        self.set_media_properties(result, result.get_all_media())
+        result.media = streamed + result.media
+        return result
+
+    def stream_media(self, result: Metadata, media: Media, metadata: Metadata = None) -> Media:
+        """
+        enriches and stores a single media as soon as an archiver downloads it and then deletes its local files,
+        used by archivers that download many files (eg: playlists) so the tmp dir only holds one at a time.
+        @metadata is what the archiver knows so far (eg: title), only the per_media enrichers run,
+        the others run once for the whole item in step 4
+        """
+        # when archiving concurrently the item's rows, part of the stored file names, can change until the items before it are acquired
+        if (rows_final := ItemContext.current().get("rows_final")): rows_final.wait()
+        streamed = ItemContext.current().setdefault("streamed_media", [])
+        media.set("id", f"media_{len(streamed) + 1}")
+        item = Metadata(metadata={**result.metadata, **(metadata.metadata if metadata else {})}, media=[media])
+        for e in self.enrichers:
+            if not e.per_media: continue
+            try: e.enrich(item)
+            except Exception as exc:
+                logger.error(f"ERROR enricher {e.name}: {exc}: {traceback.format_exc()}")
+        self.set_media_properties(item, item.get_all_media())
+        media.store(url=result.get_url(), metadata=item)
+
+        for m in item.get_all_media():
+            if os.path.isfile(m.filename): os.remove(m.filename)
+        media.set("streamed", True)
+        streamed.append(media)
+        return media
+
+    def set_media_properties(self, result: Metadata, media: List[Media]) -> None:
+        gsheet = ItemContext.current().gsheet
+        for m in media:
             m.set("name_prefix", gsheet.get("name_prefix"))
             m.set("row", gsheet.get("row"))
             m.set("uar", self.set_uar())
             m.set("title", result.get("title"))
             m.set("timestamp", result.get("timestamp"))
+
+    def race(self, result: Metadata, archivers: List[Archiver]) -> None:
+        """
+        runs the archivers at the same time, each in its own tmp subfolder, and merges their results in archivers order
+        until one succeeds (same outcome as calling them one by one), the lower priority ones are then cancelled:
+        not started ones do not run, running ones see Archiver.is_cancelled() and their results are ignored
+        """
+        url = result.get_url()
+        context = ItemContext.current()
+        cancelled = [threading.Event() for _ in archivers]
+
+        def run(a: Archiver, cancel: threading.Event) -> Metadata:
+            if cancel.is_set(): return None
+            racer_context = ItemContext(dict(context.values, archiver_cancelled=cancel))
+            if context.tmp_dir: racer_context.tmp_dir = tempfile.mkdtemp(dir=context.tmp_dir, prefix=f"{a.name}_")
+            with racer_context.activate():
+                return a.download(copy.deepcopy(result))
+
+        logger.info(f"Racing archivers {[a.name for a in archivers]} for {url}")
+        executor = ThreadPoolExecutor(max_workers=len(archivers), thread_name_prefix="archiver")
+        futures = [executor.submit(contextvars.copy_context().run, run, a, cancel) for a, cancel in zip(archivers, cancelled)]
+        try:
+            for i, (a, future) in enumerate(zip(archivers, futures)):
+                try:
+                    result.merge(future.result())
+                except Exception as e:
+                    logger.error(f"ERROR archiver {a.name}: {e}: {traceback.format_exc()}")
+                if result.is_success():
+                    logger.info(f"archiver {a.name} succeeded for {url}, cancelling {[l.name for l in archivers[i + 1:]]}")
+                    break
+        finally:
+            for cancel in cancelled: cancel.set()
+            for future in futures: future.cancel()
+            executor.shutdown(wait=False)
+
+        if result.is_success() and result.get("credit_string") is None:
+            self.get_credit_string(result)
+
+    def get_credit_string(self, result: Metadata) -> None:
+        logger.info("Getting just credits from youtubedl_archiver")
+        for archiver in self.archivers:
+            if archiver.name == "youtubedl_archiver":
+                # reuses the info yt-dlp extracted for this URL, if it tried it before
+                r = archiver.download(result, only_credit_string=True)
+                if r and r.get("credit_string"): result.set("credit_string", r.get("credit_string"))
+
+    def store(self, result: Metadata) -> Metadata:
+        """steps 5 and 6 of self.archive, stores the media and the formatted result"""
+        url = result.get_url()
+        gsheet = ItemContext.current().gsheet
+
         # 5 - store all downloaded/generated media
+        # when archiving concurrently the item's rows can have changed since its media were acquired, see settle_rows
+        for m in result.get_all_media(): m.set("row", gsheet.get("row"))
         result.store()
 
         # 6 - format and store formatted if needed
@@ -171,16 +513,20 @@ class ArchivingOrchestrator:
         if result.is_empty():
             result.status = "nothing archived"
 
-        # signal completion to databases and archivers
+        return result
+
+    def deliver(self, result: Metadata, cached: bool = False) -> None:
+        """step 7 of self.archive: signal completion to databases"""
         for d in self.databases:
-            try: d.done(result)
+            try: d.done(result, cached=cached)
             except Exception as e:
                 logger.error(f"ERROR database {d.name}: {e}: {traceback.format_exc()}")
 
-        # set the row_offset to the number of links archived
+    @staticmethod
+    def count_archived_media(result: Metadata) -> int:
+        # media that gets its own row, excludes generated media like thumbnails/screenshots
         all_media = [m for m in result.get_all_media() if (m.get("id", "") != "_final_media" and "thumbnail" not in m.get("id", "") and "html_metadata" not in m.get("id", "") and "screenshot" not in m.get("id", ""))]
-        self.feeder.row_offset = len(all_media)
-        return result
+        return len(all_media)
 
     def assert_valid_url(self, url: str) -> bool:
         """
@@ -203,4 +549,18 @@ class ArchivingOrchestrator:
             assert not ip.is_private, f"Invalid IP used"
 
     def all_archivers_for_setup(self) -> List[Archiver]:
-        return self.archivers + [e for e in self.enrichers if isinstance(e, Archiver)]
\ No newline at end of file
+        return self.archivers + [e for e in self.enrichers if isinstance(e, Archiver)]
+
+
+# process workers inherit the orchestrator when forked, see ArchivingOrchestrator.get_executor
+_worker_orchestrator: ArchivingOrchestrator = None
+
+
+def _init_process_worker(orchestrator: ArchivingOrchestrator) -> None:
+    global _worker_orchestrator
+    _worker_orchestrator = orchestrator
+
+
+def _run_in_worker(method: str, *args, **kwargs):
+    # the orchestrator cannot be pickled, so process workers call the one they inherited
+    return getattr(_worker_orchestrator, method)(*args, **kwargs)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+
+import ffmpeg
+
+from .hashing import DigestCache
+
+
+@dataclass
+class Probe:
+    """
+    the ffprobe result of a file, error is set (and streams empty) when it could not be probed,
+    unreadable means ffprobe ran but could not read the file (eg: corrupted) as opposed to ffprobe failing to run
+    """
+    streams: List[dict] = field(default_factory=list)
+    format: dict = field(default_factory=dict)
+    error: str = None
+    unreadable: bool = False
+
+    @property
+    def video_stream(self) -> Optional[dict]:
+        return next((s for s in self.streams if s.get("codec_type") == "video"), None)
+
+    @property
+    def audio_stream(self) -> Optional[dict]:
+        return next((s for s in self.streams if s.get("codec_type") == "audio"), None)
+
+    @property
+    def duration(self) -> Optional[float]:
+        # of the container, in seconds
+        return _float(self.format.get("duration"))
+
+    @property
+    def video_duration(self) -> Optional[float]:
+        # of the first video stream, in seconds
+        return _float((self.video_stream or {}).get("duration"))
+
+    @property
+    def video_codec(self) -> Optional[str]:
+        return (self.video_stream or {}).get("codec_name")
+
+    @property
+    def audio_codec(self) -> Optional[str]:
+        return (self.audio_stream or {}).get("codec_name")
+
+    @property
+    def width(self) -> Optional[int]:
+        return (self.video_stream or {}).get("width")
+
+    @property
+    def height(self) -> Optional[int]:
+        return (self.video_stream or {}).get("height")
+
+    def has_video_frames(self) -> bool:
+        return any(s.get("duration_ts", 0) > 0 for s in self.streams if s.get("codec_type") == "video")
+
+
+class ProbeCache:
+    """
+    Process-wide cache of ffprobe results so each media file is probed once, no matter how many steps need it:
+        ProbeCache.get(filename).duration
+    Entries are keyed on the file identity (path, size, mtime, inode) like the DigestCache, failures are cached too.
+    """
+    MAX_ENTRIES = 4096
+
+    _probes: OrderedDict[Tuple, Probe] = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(filename: str) -> Probe:
+        return ProbeCache.get_many([filename])[0]
+
+    @staticmethod
+    def get_many(filenames: List[str], mapper: Callable = map) -> List[Probe]:
+        """
+        returns the Probe of each file, the ones not cached are probed with mapper(ProbeCache.probe, filenames),
+        eg: Enricher.map_in_processes to run the ffprobes in parallel processes
+        """
+        keys: Dict[str, Tuple] = {}
+        probes: Dict[str, Probe] = {}
+        for filename in filenames:
+            try: keys[filename] = DigestCache._file_key(filename)
+            except OSError as e: probes[filename] = Probe(error=str(e))
+        with ProbeCache._lock:
+            for filename, key in keys.items():
+                if (cached := ProbeCache._probes.get(key)) is not None:
+                    ProbeCache._probes.move_to_end(key)
+                    probes[filename] = cached
+
+        missing = list(dict.fromkeys(f for f in filenames if f not in probes))
+        for filename, probe in zip(missing, mapper(ProbeCache.probe, missing)):
+            probes[filename] = probe
+            with ProbeCache._lock:
+                ProbeCache._probes[keys[filename]] = probe
+                while len(ProbeCache._probes) > ProbeCache.MAX_ENTRIES:
+                    ProbeCache._probes.popitem(last=False)
+        return [probes[filename] for filename in filenames]
+
+    @staticmethod
+    def probe(filename: str) -> Probe:
+        # runs ffprobe, it is pickled by qualified name so mappers can run it in other processes
+        try:
+            result = ffmpeg.probe(filename)
+            return Probe(streams=result.get("streams", []), format=result.get("format", {}))
+        except ffmpeg.Error as e:
+            return Probe(error=(e.stderr or b"").decode(errors="ignore").strip() or str(e), unreadable=True)
+        except Exception as e:
+            return Probe(error=str(e))
+
+    @staticmethod
+    def clear() -> None:
+        with ProbeCache._lock:
+            ProbeCache._probes.clear()
+
+
+def _float(value) -> Optional[float]:
+    try: return float(value)
+    except (TypeError, ValueError): return None
@@ -3,4 +3,5 @@ from .gsheet_db import GsheetsDb
 from .console_db import ConsoleDb
 from .csv_db import CSVDb
 from .api_db import AAApiDb
-from .atlos_db import AtlosDb
\ No newline at end of file
+from .atlos_db import AtlosDb
+from .sqlite_db import SQLiteDb
\ No newline at end of file
@@ -30,6 +30,10 @@ class Database(Step, ABC):
         """abort notification if user cancelled after start"""
         pass
 
+    def cleanup(self) -> None:
+        """called once all items are done, or upon errors, eg: to write any buffered updates"""
+        pass
+
     # @abstractmethod
     def fetch(self, item: Metadata) -> Union[Metadata, bool]:
         """check and fetch if the given item has been archived already, each database should handle its own caching, and configuration mechanisms"""
@@ -6,13 +6,11 @@ from urllib.parse import quote
 from loguru import logger
 
 from . import Database
-from ..core import Metadata, Media, ArchivingContext
-from ..utils import GWorksheet
+from ..core import Metadata, Media, ArchivingContext, ItemContext
+from ..utils import GWorksheet, Translator
 
 import os
 
-from google.cloud import translate_v2 as translate
-
 import re
 import random
 import string
@@ -28,12 +26,13 @@ class GsheetsDb(Database):
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
         super().__init__(config)
-        self.translate_client = translate.Client.from_service_account_json(self.service_account)
+        self.translator = Translator(self.service_account, cache_file=ArchivingContext.state_file(self.translation_cache) or None)
 
     @staticmethod
     def configs() -> dict:
         return {
             "service_account": {"default": "secrets/service_account.json", "help": "service account JSON file path"},
+            "translation_cache": {"default": "translation_cache.sqlite", "help": "sqlite file where translations of titles and texts are kept so re-archives do not call Google Translate again, relative to the orchestrator's state_dir, leave empty to only cache in memory"},
         }
 
     def started(self, item: Metadata) -> None:
@@ -49,6 +48,11 @@ class GsheetsDb(Database):
         logger.warning(f"ABORTED {item}")
         self._safe_status_update(item, '')
 
+    def cleanup(self) -> None:
+        # done() updates are buffered by each worksheet, the queued translations add theirs
+        self.translator.flush()
+        GWorksheet.flush_all()
+
     def fetch(self, item: Metadata) -> Union[Metadata, bool]:
         """check if the given item has been archived already"""
         return False
@@ -84,11 +88,6 @@ class GsheetsDb(Database):
         batch_if_valid(row, 'date', True, datetime.utcnow().replace(tzinfo=timezone.utc).isoformat())
         
         batch_if_valid(row, 'title', item.get_title())
-        
-        title_translated = self.translate_client.translate(item.get("title", ""), target_language='en')
-        if title_translated["detectedSourceLanguage"] != 'en':
-            batch_if_valid(row, 'title_translated', 
-                f"""({title_translated["detectedSourceLanguage"]}) {title_translated["translatedText"]}""")
 
         edited_text = None
         if item.get("edited_text", None) is None:
@@ -97,10 +96,11 @@ class GsheetsDb(Database):
             edited_text = item.get("edited_text", "")
 
         batch_if_valid(row, 'text', edited_text)
-        text_translated = self.translate_client.translate(edited_text, target_language='en')
-        if text_translated["detectedSourceLanguage"] != 'en':
-            batch_if_valid(row, 'text_translated', 
-                f"""({text_translated["detectedSourceLanguage"]}) {text_translated["translatedText"]}""")
+
+        # title and text are translated together with those of the next items, their cells are written once translated
+        translated_cols = [col for col in ['title_translated', 'text_translated'] if gw.col_exists(col) and gw.get_cell(row_values, col) == '']
+        if translated_cols:
+            self.translator.translate_later([item.get("title", ""), edited_text], lambda translations: self._set_translations(gw, row, translated_cols, translations))
         
         timestamp = item.get_timestamp()
         if timestamp is not None:
@@ -232,6 +232,16 @@ class GsheetsDb(Database):
 
         gw.batch_set_cell(cell_updates)
 
+    def _set_translations(self, gw: GWorksheet, row: int, cols: list, translations: list) -> None:
+        # translations are (title, text) results of Translator.translate_many, English or failed ones are left empty
+        cell_updates = []
+        for col, (lang, translated) in zip(['title_translated', 'text_translated'], translations):
+            if col not in cols or lang in ("", "en") or not translated: continue
+            value = f"""({lang}) {translated}"""
+            if len(value) > 5000: value = f"""{value[:4800]}..."""
+            cell_updates.append((row, col, value))
+        if cell_updates: gw.batch_set_cell(cell_updates)
+
     def _safe_status_update(self, item: Metadata, new_status: str) -> None:
         try:
             gw, row = self._retrieve_gsheet(item)
@@ -240,8 +250,8 @@ class GsheetsDb(Database):
             logger.debug(f"Unable to update sheet: {e}")
 
     def _retrieve_gsheet(self, item: Metadata) -> Tuple[GWorksheet, int]:
-        # TODO: to make gsheet_db less coupled with gsheet_feeder's "gsheet" parameter, this method could 1st try to fetch "gsheet" from ArchivingContext and, if missing, manage its own singleton - not needed for now
-        if gsheet := ArchivingContext.get("gsheet"):
+        # TODO: to make gsheet_db less coupled with gsheet_feeder's "gsheet" parameter, this method could 1st try to fetch "gsheet" from the ItemContext and, if missing, manage its own singleton - not needed for now
+        if gsheet := ItemContext.current().gsheet:
             gw: GWorksheet = gsheet.get("worksheet")
             row: int = gsheet.get("row")
         elif self.sheet_id:
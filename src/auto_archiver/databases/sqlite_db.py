@@ -0,0 +1,82 @@
+from typing import Union
+import os, pickle, sqlite3, threading, time
+from loguru import logger
+
+from . import Database
+from ..core import Metadata, ArchivingContext
+from ..utils import UrlUtil
+
+
+class SQLiteDb(Database):
+    """
+        Local index of archived URLs and stored media, in a SQLite file:
+        - fetch returns the previous result of a URL (normalized, eg: without tracking parameters) so archivers are skipped
+        - storages reuse the URL of media with the same SHA-256 that they stored before instead of uploading it again
+    """
+    name = "sqlite_db"
+
+    def __init__(self, config: dict) -> None:
+        # without this STEP.__init__ is not called
+        super().__init__(config)
+        self.assert_valid_string("db_file")
+        self.reuse_archived_urls = bool(self.reuse_archived_urls)
+        self.reuse_stored_media = bool(self.reuse_stored_media)
+        self.max_age_days = float(self.max_age_days or 0)
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS archives (url TEXT PRIMARY KEY, archived_at REAL, result BLOB)")
+            db.execute("CREATE TABLE IF NOT EXISTS media (sha256 TEXT, storage TEXT, url TEXT, stored_at REAL, PRIMARY KEY (sha256, storage))")
+        # read by Media.store_in_parallel, see get_media_url/add_media_url
+        if self.reuse_stored_media: ArchivingContext.set("media_index", self, keep_on_reset=True)
+
+    @staticmethod
+    def configs() -> dict:
+        return {
+            "db_file": {"default": "archive_index.sqlite", "help": "SQLite file with the index of archived URLs and stored media"},
+            "reuse_archived_urls": {"default": True, "help": "if True, URLs archived before are not archived again and their previous result is used"},
+            "max_age_days": {"default": 0, "help": "previous results older than this are archived again, 0 means they never expire"},
+            "reuse_stored_media": {"default": True, "help": "if True, media files with the same content as one stored before are not uploaded again and the existing URL is used (it keeps the name of the first upload)"},
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        # one connection per thread and process, sqlite connections cannot be shared by threads or survive a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.db = sqlite3.connect(self.db_file, timeout=30)
+            self._local.db.execute("PRAGMA journal_mode=WAL")
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def fetch(self, item: Metadata) -> Union[Metadata, bool]:
+        """returns the last result for the same normalized URL, if any"""
+        if not self.reuse_archived_urls: return False
+        row = self._connection().execute("SELECT archived_at, result FROM archives WHERE url = ?", (UrlUtil.normalize(item.get_url()),)).fetchone()
+        if not row: return False
+        archived_at, result = row
+        if self.max_age_days and archived_at < time.time() - self.max_age_days * 86400: return False
+        try:
+            cached = pickle.loads(result)
+        except Exception as e:
+            logger.warning(f"could not read the indexed result of {item.get_url()}: {e}")
+            return False
+        logger.success(f"{item.get_url()} was archived before, reusing that result")
+        return cached
+
+    def done(self, item: Metadata, cached: bool = False) -> None:
+        """indexes successful results by normalized URL"""
+        if cached or not item.is_success(): return
+        try:
+            result = pickle.dumps(item)
+        except Exception as e:
+            logger.warning(f"could not index the result of {item.get_url()}: {e}")
+            return
+        with self._connection() as db:
+            for url in set(filter(None, [item.get_url(), item.get("original_url")])):
+                db.execute("INSERT OR REPLACE INTO archives VALUES (?, ?, ?)", (UrlUtil.normalize(url), time.time(), result))
+
+    def get_media_url(self, sha256: str, storage: str) -> Union[str, None]:
+        row = self._connection().execute("SELECT url FROM media WHERE sha256 = ? AND storage = ?", (sha256, storage)).fetchone()
+        return row[0] if row else None
+
+    def add_media_url(self, sha256: str, storage: str, url: str) -> None:
+        with self._connection() as db:
+            db.execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?)", (sha256, storage, url, time.time()))
@@ -2,10 +2,9 @@ import hashlib
 from loguru import logger
 
 from . import Enricher
-from ..core import Metadata
+from ..core import Metadata, Probe, ProbeCache
 
 from datetime import timedelta
-import ffmpeg
 
 
 
@@ -14,6 +13,7 @@ class DurationEnricher(Enricher):
     Calculates duration for Media instances that are videos or audio clips
     """
     name = "duration_enricher"
+    per_media = True
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
@@ -30,18 +30,18 @@ class DurationEnricher(Enricher):
         url = to_enrich.get_url()
         logger.debug(f"calculating durations for {url=} (if it is a video or audio clip)")
 
-        for i, m in enumerate(to_enrich.media):
-            if len(duration := self.calculate_duration(m.filename)):
+        # files not probed yet are probed in parallel processes, the others come from the ProbeCache
+        probes = ProbeCache.get_many([m.filename for m in to_enrich.media], mapper=self.map_in_processes)
+        for i, probe in enumerate(probes):
+            if len(duration := self.format_duration(probe)):
                 to_enrich.media[i].set("duration_str", duration)
 
     def calculate_duration(self, filename) -> str:
-        try:
-            probe = ffmpeg.probe(filename)
-            duration = float(probe['format']['duration'])
-            duration = f"""{str(timedelta(seconds=duration))}"""
+        return self.format_duration(ProbeCache.get(filename))
 
-        except Exception as e:
-            print("DURATION ERROR", e)
-            duration = ''
-
-        return duration
\ No newline at end of file
+    @staticmethod
+    def format_duration(probe: Probe) -> str:
+        if probe.duration is None:
+            logger.debug(f"DURATION ERROR {probe.error or 'no duration'}")
+            return ''
+        return f"""{str(timedelta(seconds=probe.duration))}"""
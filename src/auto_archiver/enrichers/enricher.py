@@ -1,16 +1,28 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from abc import abstractmethod, ABC
-from ..core import Metadata, Step
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, ClassVar, Iterable, List
+import multiprocessing, os, sys, threading
+from loguru import logger
+from ..core import Metadata, Step, ArchivingContext
 
 @dataclass
 class Enricher(Step, ABC):
     name = "enricher"
+    # True for enrichers that work on each media on its own (eg: hashes, thumbnails), they also enrich
+    # media that archivers stream one at a time (see ArchivingOrchestrator.stream_media)
+    per_media = False
+
+    _process_pool: ClassVar[ProcessPoolExecutor] = None
+    _process_pool_pid: ClassVar[int] = None
+    _process_pool_lock = threading.Lock()
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
         super().__init__(config)
-        
+
 
     # only for typing...
     def init(name: str, config: dict) -> Enricher:
@@ -18,3 +30,50 @@ class Enricher(Step, ABC):
 
     @abstractmethod
     def enrich(self, to_enrich: Metadata) -> None: pass
+
+    def cleanup(self) -> None:
+        # called when enrichers are done, or upon errors, cleanup any resources
+        pass
+
+    @staticmethod
+    def max_processes() -> int:
+        # orchestrator.enricher_processes, 0 means one per core
+        return int(ArchivingContext.get("enricher_processes") or 0) or os.cpu_count() or 1
+
+    @staticmethod
+    def get_process_pool() -> ProcessPoolExecutor:
+        """
+        process pool shared by all enrichers (and items archived in threads), recreated in forked processes.
+        processes are spawned and not forked, forking a process with running threads can deadlock
+        """
+        with Enricher._process_pool_lock:
+            if Enricher._process_pool_pid != os.getpid():
+                Enricher._process_pool = ProcessPoolExecutor(max_workers=Enricher.max_processes(), mp_context=multiprocessing.get_context("spawn"))
+                Enricher._process_pool_pid = os.getpid()
+        return Enricher._process_pool
+
+    @staticmethod
+    def shutdown_process_pool() -> None:
+        with Enricher._process_pool_lock:
+            if Enricher._process_pool_pid == os.getpid():
+                # cancel_futures is new in python 3.9, before that the jobs of an interrupted map are cancelled by map itself
+                if sys.version_info >= (3, 9): Enricher._process_pool.shutdown(cancel_futures=True)
+                else: Enricher._process_pool.shutdown()
+            Enricher._process_pool = Enricher._process_pool_pid = None
+
+    @staticmethod
+    def map_in_processes(fn: Callable, *iterables: Iterable) -> List:
+        """
+        returns list(map(fn, *iterables)) computed in the process pool, for CPU-bound work on each media (eg: thumbnails)
+        fn must be a module level function and its arguments and results picklable,
+        runs in this process when there is a single job or enricher_processes is 1
+        """
+        jobs = list(zip(*iterables))
+        if len(jobs) <= 1 or Enricher.max_processes() <= 1: return [fn(*job) for job in jobs]
+        try:
+            return list(Enricher.get_process_pool().map(fn, *zip(*jobs)))
+        except BrokenProcessPool as e:
+            # eg: a worker was killed for using too much memory, the next call gets a new pool
+            logger.error(f"enricher process pool broke ({e}), running {fn.__name__} in this process")
+            with Enricher._process_pool_lock: Enricher._process_pool_pid = None
+            return [fn(*job) for job in jobs]
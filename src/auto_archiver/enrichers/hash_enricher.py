@@ -1,8 +1,8 @@
-import hashlib
 from loguru import logger
+from concurrent.futures import ThreadPoolExecutor
 
 from . import Enricher
-from ..core import Metadata, ArchivingContext
+from ..core import Metadata, ArchivingContext, DigestCache
 
 
 class HashEnricher(Enricher):
@@ -10,6 +10,7 @@ class HashEnricher(Enricher):
     Calculates hashes for Media instances
     """
     name = "hash_enricher"
+    per_media = True
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
@@ -17,33 +18,39 @@ class HashEnricher(Enricher):
         algo_choices = self.configs()["algorithm"]["choices"]
         assert self.algorithm in algo_choices, f"Invalid hash algorithm selected, must be one of {algo_choices} (you selected {self.algorithm})."
         self.chunksize = int(self.chunksize)
+        self.extra_algorithms = [a for a in (self.extra_algorithms or []) if a != self.algorithm]
+        for algorithm in self.extra_algorithms:
+            assert algorithm in DigestCache.ALGORITHMS, f"Invalid extra hash algorithm {algorithm}, must be one of {list(DigestCache.ALGORITHMS)}."
+        self.workers = max(1, int(self.workers))
         ArchivingContext.set("hash_enricher.algorithm", self.algorithm, keep_on_reset=True)
+        # other steps hashing the same files get these algorithms computed in the same read
+        DigestCache.register(self.algorithm, *self.extra_algorithms)
 
     @staticmethod
     def configs() -> dict:
         return {
             "algorithm": {"default": "SHA-256", "help": "hash algorithm to use", "choices": ["SHA-256", "SHA3-512"]},
-            "chunksize": {"default": int(1.6e7), "help": "number of bytes to use when reading files in chunks (if this value is too large you will run out of RAM), default is 16MB"},
+            "chunksize": {"default": int(1.6e7), "help": "number of bytes hashed at a time, files are memory-mapped so this no longer bounds RAM use, see scripts/benchmark_hashing.py to tune it. default is 16MB"},
+            "extra_algorithms": {
+                "default": [],
+                "help": f"other algorithms computed in the same pass and saved in each media's 'hashes', eg: MD5 to compare with GCS/Google Drive checksums. any of {list(DigestCache.ALGORITHMS)}, CSV if provided via the command line",
+                "cli_set": lambda cli_val, cur_val: list(set(cli_val.split(",")))
+            },
+            "workers": {"default": 4, "help": "how many media files of the same URL to hash at the same time"},
         }
 
     def enrich(self, to_enrich: Metadata) -> None:
         url = to_enrich.get_url()
         logger.debug(f"calculating media hashes for {url=} (using {self.algorithm})")
 
-        for i, m in enumerate(to_enrich.media):
-            if len(hd := self.calculate_hash(m.filename)):
-                to_enrich.media[i].set("hash", f"{self.algorithm}:{hd}")
+        algorithms = [self.algorithm] + self.extra_algorithms
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(to_enrich.media)))) as executor:
+            all_digests = executor.map(lambda m: DigestCache.get_many(m.filename, algorithms, self.chunksize), to_enrich.media)
+            for m, digests in zip(to_enrich.media, all_digests):
+                m.set("hash", f"{self.algorithm}:{digests[self.algorithm]}")
+                if self.extra_algorithms:
+                    m.set("hashes", {a: digests[a] for a in self.extra_algorithms})
 
     def calculate_hash(self, filename) -> str:
-        hash = None
-        if self.algorithm == "SHA-256":
-            hash = hashlib.sha256()
-        elif self.algorithm == "SHA3-512":
-            hash = hashlib.sha3_512()
-        else: return ""
-        with open(filename, "rb") as f:
-            while True:
-                buf = f.read(self.chunksize)
-                if not buf: break
-                hash.update(buf)
-        return hash.hexdigest()
+        if self.algorithm not in DigestCache.ALGORITHMS: return ""
+        return DigestCache.get(filename, self.algorithm, self.chunksize)
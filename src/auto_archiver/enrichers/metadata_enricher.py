@@ -11,6 +11,7 @@ class MetadataEnricher(Enricher):
     Extracts metadata information from files using exiftool.
     """
     name = "metadata_enricher"
+    per_media = True
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
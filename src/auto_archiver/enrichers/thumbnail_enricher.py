@@ -2,7 +2,7 @@ import ffmpeg, os
 from loguru import logger
 
 from . import Enricher
-from ..core import Media, Metadata, ArchivingContext
+from ..core import Media, Metadata, ItemContext, ProbeCache
 from ..utils.misc import random_str
 
 
@@ -11,18 +11,22 @@ class ThumbnailEnricher(Enricher):
     Generates thumbnails for all the media
     """
     name = "thumbnail_enricher"
+    per_media = True
+    MODES = ["seek", "single_pass", "keyframes"]
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
         super().__init__(config)
         self.thumbnails_per_second = int(self.thumbnails_per_minute) / 60
         self.max_thumbnails = int(self.max_thumbnails)
+        assert self.mode in self.MODES, f"mode must be one of {self.MODES}, got {self.mode}"
 
     @staticmethod
     def configs() -> dict:
         return {
             "thumbnails_per_minute": {"default": 60, "help": "how many thumbnails to generate per minute of video, can be limited by max_thumbnails"},
             "max_thumbnails": {"default": 16, "help": "limit the number of thumbnails to generate per video, 0 means no limit"},
+            "mode": {"default": "seek", "choices": ThumbnailEnricher.MODES, "help": "seek: one ffmpeg per thumbnail seeking to its exact timestamp (they run in parallel processes). single_pass: one ffmpeg per video that writes all the thumbnails while reading it once. keyframes: like single_pass but only decodes keyframes, the fastest, thumbnails are the first keyframes after the timestamps. see scripts/benchmark_thumbnails.py"},
         }
     
     def enrich(self, to_enrich: Metadata) -> None:
@@ -32,41 +36,45 @@ class ThumbnailEnricher(Enricher):
         Thumbnails are equally distributed across the video duration.
         """
         logger.debug(f"generating thumbnails for {to_enrich.get_url()}")
-        for m_id, m in enumerate(to_enrich.media[::]):
-            if m.is_video():
-                folder = os.path.join(ArchivingContext.get_tmp_dir(), random_str(24))
-                os.makedirs(folder, exist_ok=True)
-                logger.debug(f"generating thumbnails for {m.filename}")
-                duration = m.get("duration")
-
-                if duration is None:
-                    try:
-                        probe = ffmpeg.probe(m.filename)
-                        duration = float(next(stream for stream in probe['streams'] if stream['codec_type'] == 'video')['duration'])
-                        to_enrich.media[m_id].set("duration", duration)
-                    except Exception as e:
-                        logger.error(f"error getting duration of video {m.filename}: {e}")
-                        return
-
-                num_thumbs = int(min(max(1, duration * self.thumbnails_per_second), self.max_thumbnails))
-                timestamps = [duration / (num_thumbs + 1) * i for i in range(1, num_thumbs + 1)]
+        videos = [m for m in to_enrich.media if m.is_video()]
 
-                thumbnails_media = []
-                for index, timestamp in enumerate(timestamps):
-                    output_path = os.path.join(folder, f"out{index}.jpg")
-                    ffmpeg.input(m.filename, ss=timestamp).filter('scale', 512, -1).output(output_path, vframes=1, loglevel="quiet").run()
-
-                    try:
-                        thumbnails_media.append(Media(
-                            filename=output_path)
-                            .set("id", f"thumbnail_{index+1}")
-                            .set("timestamp", "%.3fs" % timestamp)
-                        )
-                    except Exception as e:
-                        logger.error(f"error creating thumbnail {index} for media: {e}")
+        # durations not known yet come from the ProbeCache, files not probed yet are probed in parallel
+        missing = [m for m in videos if m.get("duration") is None]
+        for m, probe in zip(missing, ProbeCache.get_many([m.filename for m in missing], mapper=self.map_in_processes)):
+            if probe.video_duration is None: logger.error(f"error getting duration of video {m.filename}: {probe.error}")
+            else: m.set("duration", probe.video_duration)
 
-                to_enrich.media[m_id].set("thumbnails", thumbnails_media)
-            elif "screenshot" not in m.get("id", ""):
+        jobs = []  # (media, timestamps, folder)
+        for m in videos:
+            if (duration := m.get("duration")) is None: continue
+            folder = os.path.join(ItemContext.current().tmp_dir, random_str(24))
+            os.makedirs(folder, exist_ok=True)
+            logger.debug(f"generating thumbnails for {m.filename}")
+
+            jobs.append((m, self.get_timestamps(duration), folder))
+
+        if self.mode == "seek":
+            # every thumbnail of every video is a job for the process pool, instead of one ffmpeg after the other
+            seeks = [(m.filename, timestamp, os.path.join(folder, f"out{index}.jpg")) for m, timestamps, folder in jobs for index, timestamp in enumerate(timestamps)]
+            generated = iter(self.map_in_processes(generate_thumbnail, *zip(*seeks)) if seeks else [])
+            generated = [[next(generated) for _ in timestamps] for _, timestamps, _ in jobs]
+        else:
+            # one ffmpeg per video writes all its thumbnails
+            generated = self.map_in_processes(generate_thumbnails_in_one_pass, [m.filename for m, _, _ in jobs], [timestamps for _, timestamps, _ in jobs], [folder for _, _, folder in jobs], [self.mode == "keyframes"] * len(jobs))
+
+        for (m, timestamps, folder), oks in zip(jobs, generated):
+            thumbnails_media = []
+            for index, (timestamp, ok) in enumerate(zip(timestamps, oks)):
+                if not ok: continue
+                thumbnails_media.append(Media(
+                    filename=os.path.join(folder, f"out{index}.jpg"))
+                    .set("id", f"thumbnail_{index+1}")
+                    .set("timestamp", "%.3fs" % timestamp)
+                )
+            m.set("thumbnails", thumbnails_media)
+
+        for m_id, m in enumerate(to_enrich.media[::]):
+            if not m.is_video() and "screenshot" not in m.get("id", ""):
                 logger.debug(f"copying {m.filename} as thumbnail")
                 thumbnails_media = []
                 try:
@@ -77,4 +85,43 @@ class ThumbnailEnricher(Enricher):
                 except Exception as e:
                     logger.error(f"error creating thumbnail for media: {e}")
 
-                to_enrich.media[m_id].set("thumbnails", thumbnails_media)
\ No newline at end of file
+                to_enrich.media[m_id].set("thumbnails", thumbnails_media)
+
+
+    def get_timestamps(self, duration: float) -> list:
+        """evenly spaced timestamps of the thumbnails of a video of @duration seconds, at least one"""
+        num_thumbs = max(1, int(duration * self.thumbnails_per_second))
+        # max_thumbnails 0 means no limit
+        if self.max_thumbnails > 0: num_thumbs = min(num_thumbs, self.max_thumbnails)
+        return [duration / (num_thumbs + 1) * i for i in range(1, num_thumbs + 1)]
+
+
+def generate_thumbnail(filename: str, timestamp: float, output_path: str) -> bool:
+    try:
+        ffmpeg.input(filename, ss=timestamp).filter('scale', 512, -1).output(output_path, vframes=1, loglevel="quiet").run()
+        return True
+    except Exception as e:
+        logger.error(f"error creating thumbnail at {timestamp}s of {filename}: {e}")
+        return False
+
+
+def generate_thumbnails_in_one_pass(filename: str, timestamps: list, folder: str, keyframes_only: bool = False) -> list:
+    """
+    writes out{index}.jpg in @folder for all the (evenly spaced) @timestamps reading the video once:
+    the input seeks to the first one and the select filter then keeps the first frame at or after each of them
+    (the fps filter would pick frames up to half an interval early), with @keyframes_only the other frames
+    are not even decoded so thumbnails are the first keyframes after each timestamp. returns whether each thumbnail was written
+    """
+    if not timestamps: return []
+    interval = timestamps[1] - timestamps[0] if len(timestamps) > 1 else timestamps[0]
+    input_args = {"skip_frame": "nokey"} if keyframes_only else {}
+    try:
+        (ffmpeg.input(filename, ss=timestamps[0], **input_args)
+            .filter("select", f"gte(t,selected_n*{interval:.6f})")
+            .filter("scale", 512, -1)
+            .output(os.path.join(folder, "out%d.jpg"), start_number=0, vframes=len(timestamps), vsync="vfr", loglevel="quiet")
+            .run())
+    except Exception as e:
+        logger.error(f"error creating thumbnails of {filename}: {e}")
+    return [os.path.isfile(os.path.join(folder, f"out{index}.jpg")) for index in range(len(timestamps))]
+
@@ -1,22 +1,110 @@
 import jsonlines
 import mimetypes
-import os, shutil, subprocess
+import os, shutil, subprocess, tempfile, threading, time
 from zipfile import ZipFile
 from loguru import logger
 from warcio.archiveiterator import ArchiveIterator
 
-from ..core import Media, Metadata, ArchivingContext
+from ..core import Media, Metadata, ItemContext
 from . import Enricher
 from ..archivers import Archiver
 from ..utils import UrlUtil, random_str
 
 
+class BrowsertrixPoolError(Exception):
+    """the warm pool could not provide a working crawler container"""
+
+
+class BrowsertrixPool:
+    """
+    Warm pool of long-lived browsertrix-crawler containers, each URL is crawled with `docker exec` in an idle one
+    instead of paying a `docker run --rm` (container start and profile copy) per URL:
+        container = pool.acquire()
+        subprocess.run(pool.exec_cmd(container) + crawl_args)
+        pool.release(container)  # or pool.discard(container) if it stopped
+    - containers are started lazily up to @size, idle ones wait in a list so concurrent items use different ones,
+      when all are busy acquire waits up to @acquire_timeout seconds for one to be released or discarded (which lets it start another)
+    - all of them mount @home_host (@home locally) as /crawls/ and are labelled so they can be removed all at once,
+      including the ones started by forked workers, see BrowsertrixPool.remove_containers
+    """
+    IMAGE = "webrecorder/browsertrix-crawler"
+    LABEL = "auto-archiver.warm-pool"
+
+    def __init__(self, size: int, home_host: str, home: str, label: str, acquire_timeout: float = None) -> None:
+        self.size = size
+        self.home_host = home_host
+        self.home = home
+        self.label = label
+        self.acquire_timeout = acquire_timeout
+        self.pid = os.getpid()
+        self.started = 0
+        self.idle = []
+        # notified whenever a container is released or a slot to start one frees up
+        self.condition = threading.Condition()
+
+    def acquire(self) -> str:
+        """
+        returns the id of an idle container, starting one if there are less than size, otherwise waits for one,
+        raises BrowsertrixPoolError if none could be started or none was free within acquire_timeout
+        """
+        deadline = None if self.acquire_timeout is None else time.monotonic() + self.acquire_timeout
+        with self.condition:
+            while not self.idle and self.started >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise BrowsertrixPoolError(f"no warm browsertrix-crawler container was free after {self.acquire_timeout}s")
+                self.condition.wait(remaining)
+            if self.idle: return self.idle.pop()
+            self.started += 1
+        try:
+            cmd = ["docker", "run", "-d", "--rm", "--label", f"{self.LABEL}={self.label}", "-v", f"{self.home_host}:/crawls/", self.IMAGE, "sleep", "infinity"]
+            container = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+            logger.debug(f"started warm browsertrix-crawler container {container[:12]}")
+            return container
+        except Exception as e:
+            self._stopped()
+            raise BrowsertrixPoolError(f"could not start a browsertrix-crawler container: {e}") from e
+
+    def release(self, container: str) -> None:
+        with self.condition:
+            self.idle.append(container)
+            self.condition.notify()
+
+    def discard(self, container: str) -> None:
+        subprocess.run(["docker", "rm", "-f", container], capture_output=True)
+        self._stopped()
+
+    def _stopped(self) -> None:
+        # a waiting acquire can start a container in its place
+        with self.condition:
+            self.started -= 1
+            self.condition.notify()
+
+    def exec_cmd(self, container: str) -> list:
+        # docker exec skips the image entrypoint that drops root, run as the owner of /crawls/ like it would
+        stat = os.stat(self.home)
+        return ["docker", "exec", "-u", f"{stat.st_uid}:{stat.st_gid}", container]
+
+    @staticmethod
+    def is_running(container: str) -> bool:
+        try: return subprocess.run(["docker", "inspect", "-f", "{{.State.Running}}", container], capture_output=True, text=True).stdout.strip() == "true"
+        except Exception: return False
+
+    @staticmethod
+    def remove_containers(label: str) -> None:
+        try:
+            containers = subprocess.run(["docker", "ps", "-aq", "--filter", f"label={BrowsertrixPool.LABEL}={label}"], capture_output=True, text=True).stdout.split()
+            if containers: subprocess.run(["docker", "rm", "-f", *containers], capture_output=True)
+        except Exception as e: logger.warning(f"could not remove the warm browsertrix-crawler containers: {e}")
+
+
 class WaczArchiverEnricher(Enricher, Archiver):
     """
     Uses https://github.com/webrecorder/browsertrix-crawler to generate a .WACZ archive of the URL
     If used with [profiles](https://github.com/webrecorder/browsertrix-crawler#creating-and-using-browser-profiles)
     it can become quite powerful for archiving private content.
     When used as an archiver it will extract the media from the .WACZ archive so it can be enriched.
+    With warm_pool_size the crawls run in long-lived docker containers (see BrowsertrixPool) instead of one container per URL.
     """
     name = "wacz_archiver_enricher"
 
@@ -34,6 +122,7 @@ class WaczArchiverEnricher(Enricher, Archiver):
             "extract_screenshot": {"default": True, "help": "If enabled the screenshot captured by browsertrix will be extracted into separate Media and appear in the html report. The .wacz file will be kept untouched."},
             "socks_proxy_host": {"default": None, "help": "SOCKS proxy host for browsertrix-crawler, use in combination with socks_proxy_port. eg: user:password@host"},
             "socks_proxy_port": {"default": None, "help": "SOCKS proxy port for browsertrix-crawler, use in combination with socks_proxy_host. eg 1234"},
+            "warm_pool_size": {"default": 0, "help": "if > 0 and browsertrix-crawler runs in docker, keep up to this many crawler containers running and crawl each URL with docker exec in an idle one, saving the container start and profile copy per URL. falls back to a docker run per URL if a container fails. 0 disables it"},
         }
     
     def setup(self) -> None:
@@ -47,10 +136,29 @@ class WaczArchiverEnricher(Enricher, Archiver):
         if self.docker_in_docker:
             os.makedirs(self.cwd_dind, exist_ok=True)
 
+        # the warm pool needs a folder that is mounted the same way for every container, in docker in docker that is BROWSERTRIX_HOME_HOST
+        self.warm_pool = None
+        self.warm_pool_lock = threading.Lock()
+        self.warm_pool_home = None
+        self.use_warm_pool = bool(int(self.warm_pool_size) > 0 and self.use_docker and not self.docker_commands and (not self.docker_in_docker or self.browsertrix_home_host))
+        if int(self.warm_pool_size) > 0 and not self.use_warm_pool:
+            logger.warning("warm_pool_size is ignored: it needs browsertrix-crawler in docker without docker_commands, and BROWSERTRIX_HOME_HOST in docker in docker")
+        if self.use_warm_pool:
+            self.warm_pool_label = random_str(8)
+            if not self.browsertrix_home_host:
+                self.warm_pool_home = os.path.abspath(tempfile.mkdtemp(dir="./", prefix="browsertrix_pool_"))
+            # the profile is copied once for all the crawls
+            if self.profile:
+                shutil.copyfile(self.profile, os.path.join(self.warm_pool_home or self.browsertrix_home_container, "profile.tar.gz"))
+
     def cleanup(self) -> None:
         if self.docker_in_docker:
             logger.debug(f"Removing {self.cwd_dind=}")
             shutil.rmtree(self.cwd_dind, ignore_errors=True)
+        if getattr(self, "use_warm_pool", False):
+            logger.debug(f"Removing the warm browsertrix-crawler containers {self.warm_pool_label=}")
+            BrowsertrixPool.remove_containers(self.warm_pool_label)
+            if self.warm_pool_home: shutil.rmtree(self.warm_pool_home, ignore_errors=True)
 
     def download(self, item: Metadata) -> Metadata:
         # this new Metadata object is required to avoid duplication
@@ -65,10 +173,7 @@ class WaczArchiverEnricher(Enricher, Archiver):
             return True
 
         url = to_enrich.get_url()
-
         collection = random_str(8)
-        browsertrix_home_host = self.browsertrix_home_host or os.path.abspath(ArchivingContext.get_tmp_dir())
-        browsertrix_home_container = self.browsertrix_home_container or browsertrix_home_host
 
         cmd = [
             "crawl",
@@ -85,9 +190,58 @@ class WaczArchiverEnricher(Enricher, Archiver):
             "--timeout", str(self.timeout),
             "--blockAds" # TODO: test
         ]
-        
+
+        my_env = os.environ.copy()
+        if self.socks_proxy_host and self.socks_proxy_port:
+            logger.debug("Using SOCKS proxy for browsertrix-crawler")
+            my_env["SOCKS_HOST"] = self.socks_proxy_host
+            my_env["SOCKS_PORT"] = str(self.socks_proxy_port)
+
+        collection_dir = None
+        if self.use_warm_pool:
+            try:
+                collection_dir = self.crawl_in_warm_pool(url, cmd, collection, my_env)
+                if not collection_dir: return False
+            except BrowsertrixPoolError as e:
+                logger.warning(f"{e}, falling back to a docker run for {url=}")
+        collection_dir = collection_dir or self.crawl(url, cmd, collection, my_env)
+        if not collection_dir: return False
+
+        wacz_fn = os.path.join(collection_dir, f"{collection}.wacz")
+        if not os.path.exists(wacz_fn):
+            logger.warning(f"Unable to locate and upload WACZ  {wacz_fn=}")
+            return False
+
+        to_enrich.add_media(Media(wacz_fn), "browsertrix")
+        if self.extract_media or self.extract_screenshot:
+            self.extract_media_from_wacz(to_enrich, wacz_fn)
+
+        jsonl_fn = os.path.join(collection_dir, "pages", "pages.jsonl")
+
+        if not os.path.exists(jsonl_fn):
+            logger.warning(f"Unable to locate and pages.jsonl  {jsonl_fn=}")
+        else:
+            logger.info(f"Parsing pages.jsonl  {jsonl_fn=}")
+            with jsonlines.open(jsonl_fn) as reader:
+                for obj in reader:
+                    if 'title' in obj:
+                        to_enrich.set_title(obj['title'])
+                    if 'text' in obj:
+                        to_enrich.set_content(obj['text'])
+
+
+        return True
+
+    def crawl(self, url: str, cmd: list, collection: str, env: dict) -> str:
+        """
+        runs the browsertrix-crawler @cmd for @url in a new docker container (or directly when already in docker),
+        returns the folder of the crawled @collection or None if it failed
+        """
+        browsertrix_home_host = self.browsertrix_home_host or os.path.abspath(ItemContext.current().tmp_dir)
+        browsertrix_home_container = self.browsertrix_home_container or browsertrix_home_host
+
         if self.docker_in_docker:
-            cmd.extend(["--cwd", self.cwd_dind])
+            cmd = cmd + ["--cwd", self.cwd_dind]
 
         # call docker if explicitly enabled or we are running on the host (not in docker)
         if self.use_docker:
@@ -96,7 +250,7 @@ class WaczArchiverEnricher(Enricher, Archiver):
             if self.docker_commands:
                 cmd = self.docker_commands + cmd
             else:
-                cmd = ["docker", "run", "--rm", "-v", f"{browsertrix_home_host}:/crawls/", "webrecorder/browsertrix-crawler"] + cmd
+                cmd = ["docker", "run", "--rm", "-v", f"{browsertrix_home_host}:/crawls/", BrowsertrixPool.IMAGE] + cmd
 
             if self.profile:
                 profile_fn = os.path.join(browsertrix_home_container, "profile.tar.gz")
@@ -112,126 +266,124 @@ class WaczArchiverEnricher(Enricher, Archiver):
 
         try:
             logger.info(f"Running browsertrix-crawler: {' '.join(cmd)}")
-            my_env = os.environ.copy()
-            if self.socks_proxy_host and self.socks_proxy_port:
-                logger.debug("Using SOCKS proxy for browsertrix-crawler")
-                my_env["SOCKS_HOST"] = self.socks_proxy_host
-                my_env["SOCKS_PORT"] = str(self.socks_proxy_port)
-            subprocess.run(cmd, check=True, env=my_env)
+            subprocess.run(cmd, check=True, env=env)
         except Exception as e:
             logger.error(f"WACZ generation failed: {e}")
-            return False
+            return None
 
-        
         if self.docker_in_docker:
-            wacz_fn = os.path.join(self.cwd_dind, "collections", collection, f"{collection}.wacz")
+            return os.path.join(self.cwd_dind, "collections", collection)
         elif self.use_docker:
-            wacz_fn = os.path.join(browsertrix_home_container, "collections", collection, f"{collection}.wacz")
-        else:
-            wacz_fn = os.path.join("collections", collection, f"{collection}.wacz")
-
-        if not os.path.exists(wacz_fn):
-            logger.warning(f"Unable to locate and upload WACZ  {wacz_fn=}")
-            return False
-
-        to_enrich.add_media(Media(wacz_fn), "browsertrix")
-        if self.extract_media or self.extract_screenshot:
-            self.extract_media_from_wacz(to_enrich, wacz_fn)
-
-        if self.docker_in_docker:
-            jsonl_fn = os.path.join(self.cwd_dind, "collections", collection, "pages", "pages.jsonl")
-        elif self.use_docker:
-            jsonl_fn = os.path.join(browsertrix_home_container, "collections", collection, "pages", "pages.jsonl")
-        else:
-            jsonl_fn = os.path.join("collections", collection, "pages", "pages.jsonl")
-
-        if not os.path.exists(jsonl_fn):
-            logger.warning(f"Unable to locate and pages.jsonl  {jsonl_fn=}")
-        else:
-            logger.info(f"Parsing pages.jsonl  {jsonl_fn=}")
-            with jsonlines.open(jsonl_fn) as reader:
-                for obj in reader:
-                    if 'title' in obj:
-                        to_enrich.set_title(obj['title'])
-                    if 'text' in obj:
-                        to_enrich.set_content(obj['text'])
+            return os.path.join(browsertrix_home_container, "collections", collection)
+        return os.path.join("collections", collection)
 
+    def crawl_in_warm_pool(self, url: str, cmd: list, collection: str, env: dict) -> str:
+        """
+        runs the browsertrix-crawler @cmd for @url in an idle container of the warm pool and moves the crawl to the item's tmp_dir,
+        returns the folder of the crawled @collection or None if the crawl failed,
+        raises BrowsertrixPoolError if the pool has no working container, so the caller can fall back to self.crawl
+        """
+        with self.warm_pool_lock:
+            # one pool per process, forked workers start their own containers in the same folder and with the same label
+            if self.warm_pool is None or self.warm_pool.pid != os.getpid():
+                home = self.warm_pool_home or self.browsertrix_home_container
+                # waiting longer than a crawl for a busy container means something is stuck, a docker run is faster then
+                self.warm_pool = BrowsertrixPool(int(self.warm_pool_size), self.warm_pool_home or self.browsertrix_home_host, home, self.warm_pool_label, acquire_timeout=int(self.timeout) + 60)
+        pool = self.warm_pool
+
+        container = pool.acquire()
+        # each crawl gets its own folder in the shared /crawls/
+        home_dir = os.path.join(pool.home, collection)
+        cmd = pool.exec_cmd(container) + cmd + ["--cwd", f"/crawls/{collection}"]
+        if self.profile: cmd.extend(["--profile", "/crawls/profile.tar.gz"])
+        try:
+            logger.info(f"Running browsertrix-crawler: {' '.join(cmd)}")
+            subprocess.run(cmd, check=True, env=env)
+        except Exception as e:
+            # the shared home outlives the item, partial crawls are not left behind in it
+            shutil.rmtree(home_dir, ignore_errors=True)
+            if not pool.is_running(container):
+                pool.discard(container)
+                raise BrowsertrixPoolError(f"warm browsertrix-crawler container {container[:12]} stopped ({e})") from e
+            pool.release(container)
+            logger.error(f"WACZ generation failed: {e}")
+            return None
+        pool.release(container)
 
-        return True
+        if not os.path.isdir(home_dir):
+            logger.error(f"WACZ generation failed: browsertrix-crawler did not write {home_dir}")
+            return None
+        crawl_dir = shutil.move(home_dir, os.path.join(ItemContext.current().tmp_dir, collection))
+        return os.path.join(crawl_dir, "collections", collection)
 
     def extract_media_from_wacz(self, to_enrich: Metadata, wacz_filename: str) -> None:
         """
         Receives a .wacz archive, and extracts all relevant media from it, adding them to to_enrich.
+        Records are read straight from the zip and only the media bodies are written to disk.
         """
         logger.info(f"WACZ extract_media or extract_screenshot flag is set, extracting media from {wacz_filename=}")
 
-        # unzipping the .wacz
-        tmp_dir = ArchivingContext.get_tmp_dir()
-        unzipped_dir = os.path.join(tmp_dir, "unzipped")
-        with ZipFile(wacz_filename, 'r') as z_obj:
-            z_obj.extractall(path=unzipped_dir)
-
-        # if warc is split into multiple gzip chunks, merge those
-        warc_dir = os.path.join(unzipped_dir, "archive")
-        warc_filename = os.path.join(tmp_dir, "merged.warc")
-        with open(warc_filename, 'wb') as outfile:
-            for filename in sorted(os.listdir(warc_dir)):
-                if filename.endswith('.gz'):
-                    chunk_file = os.path.join(warc_dir, filename)
-                    with open(chunk_file, 'rb') as infile:
-                        shutil.copyfileobj(infile, outfile)
-
-        # get media out of .warc
+        tmp_dir = ItemContext.current().tmp_dir
         counter = 0
         seen_urls = set()
-        import json
-        with open(warc_filename, 'rb') as warc_stream:
-            for record in ArchiveIterator(warc_stream):
-                # only include fetched resources
-                if record.rec_type == "resource" and record.content_type == "image/png" and self.extract_screenshot:  # screenshots
-                    fn = os.path.join(tmp_dir, f"warc-file-{counter}.png")
-                    with open(fn, "wb") as outf: outf.write(record.raw_stream.read())
-                    m = Media(filename=fn)
-                    to_enrich.add_media(m, "browsertrix-screenshot")
-                    counter += 1
-                if not self.extract_media: continue
-
-                if record.rec_type != 'response': continue
-                record_url = record.rec_headers.get_header('WARC-Target-URI')
-                if not UrlUtil.is_relevant_url(record_url):
-                    logger.debug(f"Skipping irrelevant URL {record_url} but it's still present in the WACZ.")
-                    continue
-                if record_url in seen_urls:
-                    logger.debug(f"Skipping already seen URL {record_url}.")
-                    continue
-
-                # filter by media mimetypes
-                content_type = record.http_headers.get("Content-Type")
-                if not content_type: continue
-                if not any(x in content_type for x in ["video", "image", "audio"]): continue
-
-                # create local file and add media
-                ext = mimetypes.guess_extension(content_type)
-                warc_fn = f"warc-file-{counter}{ext}"
-                fn = os.path.join(tmp_dir, warc_fn)
-
-                record_url_best_qual = UrlUtil.twitter_best_quality_url(record_url)
-                with open(fn, "wb") as outf: outf.write(record.raw_stream.read())
-
+        for record in self.iter_wacz_records(wacz_filename):
+            # only include fetched resources
+            if record.rec_type == "resource" and record.content_type == "image/png" and self.extract_screenshot:  # screenshots
+                fn = os.path.join(tmp_dir, f"warc-file-{counter}.png")
+                with open(fn, "wb") as outf: shutil.copyfileobj(record.raw_stream, outf)
                 m = Media(filename=fn)
-                m.set("src", record_url)
-                # if a link with better quality exists, try to download that
-                if record_url_best_qual != record_url:
-                    try:
-                        m.filename = self.download_from_url(record_url_best_qual, warc_fn)
-                        m.set("src", record_url_best_qual)
-                        m.set("src_alternative", record_url)
-                    except Exception as e: logger.warning(f"Unable to download best quality URL for {record_url=} got error {e}, using original in WARC.")
-
-                # remove bad videos
-                if m.is_video() and not m.is_valid_video(): continue
-                
-                to_enrich.add_media(m, warc_fn)
+                to_enrich.add_media(m, "browsertrix-screenshot")
                 counter += 1
-                seen_urls.add(record_url)
+            if not self.extract_media: continue
+
+            if record.rec_type != 'response': continue
+            record_url = record.rec_headers.get_header('WARC-Target-URI')
+            if not UrlUtil.is_relevant_url(record_url):
+                logger.debug(f"Skipping irrelevant URL {record_url} but it's still present in the WACZ.")
+                continue
+            if record_url in seen_urls:
+                logger.debug(f"Skipping already seen URL {record_url}.")
+                continue
+
+            # filter by media mimetypes
+            content_type = record.http_headers.get("Content-Type")
+            if not content_type: continue
+            if not any(x in content_type for x in ["video", "image", "audio"]): continue
+
+            # create local file and add media
+            ext = mimetypes.guess_extension(content_type)
+            warc_fn = f"warc-file-{counter}{ext}"
+            fn = os.path.join(tmp_dir, warc_fn)
+
+            record_url_best_qual = UrlUtil.twitter_best_quality_url(record_url)
+            with open(fn, "wb") as outf: shutil.copyfileobj(record.raw_stream, outf)
+
+            m = Media(filename=fn)
+            m.set("src", record_url)
+            # if a link with better quality exists, try to download that
+            if record_url_best_qual != record_url:
+                try:
+                    m.filename = self.download_from_url(record_url_best_qual, warc_fn)
+                    m.set("src", record_url_best_qual)
+                    m.set("src_alternative", record_url)
+                except Exception as e: logger.warning(f"Unable to download best quality URL for {record_url=} got error {e}, using original in WARC.")
+
+            # remove bad videos
+            if m.is_video() and not m.is_valid_video(): continue
+            
+            to_enrich.add_media(m, warc_fn)
+            counter += 1
+            seen_urls.add(record_url)
         logger.info(f"WACZ extract_media/extract_screenshot finished, found {counter} relevant media file(s)")
+
+    @staticmethod
+    def iter_wacz_records(wacz_filename: str):
+        """
+        yields the records of all the WARC files in a .wacz archive (it can be split into multiple gzip chunks),
+        they are decompressed while read from the zip, without extracting or merging them on disk
+        """
+        with ZipFile(wacz_filename, 'r') as z_obj:
+            warc_names = sorted(n for n in z_obj.namelist() if n.startswith("archive/") and n.endswith(".gz"))
+            for warc_name in warc_names:
+                with z_obj.open(warc_name) as warc_stream:
+                    yield from ArchiveIterator(warc_stream)
@@ -14,6 +14,7 @@ class WhisperEnricher(Enricher):
     Only works if an S3 compatible storage is used
     """
     name = "whisper_enricher"
+    per_media = True
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
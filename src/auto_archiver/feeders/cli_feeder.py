@@ -26,7 +26,7 @@ class CLIFeeder(Feeder):
     def __iter__(self) -> Metadata:
         for url in self.urls:
             logger.debug(f"Processing {url}")
-            yield Metadata().set_url(url)
             ArchivingContext.set("folder", "cli")
+            yield Metadata().set_url(url)
 
         logger.success(f"Processed {len(self.urls)} URL(s)")
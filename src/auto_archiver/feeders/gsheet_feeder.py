@@ -6,7 +6,7 @@ from slugify import slugify
 # from . import Enricher
 from . import Feeder
 from ..core import Metadata, ArchivingContext
-from ..utils import Gsheets, GWorksheet
+from ..utils import Gsheets, GWorksheet, google_api_call
 
 
 class GsheetsFeeder(Gsheets, Feeder):
@@ -41,7 +41,7 @@ class GsheetsFeeder(Gsheets, Feeder):
 
     def __iter__(self) -> Metadata:
         sh = self.open_sheet()
-        for ii, wks in enumerate(sh.worksheets()):
+        for ii, wks in enumerate(google_api_call("sheets_read", sh.worksheets)):
             if not self.should_process_sheet(wks.title):
                 logger.debug(f"SKIPPED worksheet '{wks.title}' due to allow/block rules")
                 continue
@@ -58,7 +58,8 @@ class GsheetsFeeder(Gsheets, Feeder):
             while True:
                 row += max(1, self.row_offset)
                 if row > gw.count_rows():
-                    gw.reload_sheet()
+                    # only the rows added since the sheet was read are downloaded
+                    gw.fetch_new_rows()
                     if row > gw.count_rows():
                         break
 
@@ -77,16 +78,17 @@ class GsheetsFeeder(Gsheets, Feeder):
 
                 # All checks done - archival process starts here
                 m = Metadata().set_url(url)
-                ArchivingContext.set("gsheet", {"name_prefix": name_prefix, "row": row, "worksheet": gw}, keep_on_reset=True)
+                # item values, the orchestrator gives each item its own ItemContext
+                ArchivingContext.set("gsheet", {"name_prefix": name_prefix, "row": row, "worksheet": gw})
                 if gw.get_cell_or_default(row, 'folder', "") is None:
                     folder = ''
                 else:
                     folder = slugify(gw.get_cell_or_default(row, 'folder', "").strip())
                 if len(folder):
                     if self.use_sheet_names_in_stored_paths:
-                        ArchivingContext.set("folder", os.path.join(folder, slugify(self.sheet), slugify(wks.title)), True)
+                        ArchivingContext.set("folder", os.path.join(folder, slugify(self.sheet), slugify(wks.title)))
                     else:
-                        ArchivingContext.set("folder", folder, True)
+                        ArchivingContext.set("folder", folder)
 
                 yield m
 
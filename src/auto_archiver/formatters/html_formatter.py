@@ -8,9 +8,8 @@ import minify_html, json
 import base64
 
 from ..version import __version__
-from ..core import Metadata, Media, ArchivingContext
+from ..core import Metadata, Media, ArchivingContext, DigestCache
 from . import Formatter
-from ..enrichers import HashEnricher
 from ..utils.misc import random_str
 
 
@@ -54,9 +53,9 @@ class HtmlFormatter(Formatter):
             outf.write(content)
         final_media = Media(filename=html_path, _mimetype="text/html")
 
-        he = HashEnricher({"hash_enricher": {"algorithm": ArchivingContext.get("hash_enricher.algorithm"), "chunksize": 1.6e7}})
-        if len(hd := he.calculate_hash(final_media.filename)):
-            final_media.set("hash", f"{he.algorithm}:{hd}")
+        algorithm = ArchivingContext.get("hash_enricher.algorithm") or DigestCache.DEFAULT_ALGORITHM
+        if len(hd := DigestCache.get(final_media.filename, algorithm)):
+            final_media.set("hash", f"{algorithm}:{hd}")
 
         final_media.set("id", f"html_metadata")
         return final_media
@@ -2,9 +2,8 @@ import os
 from typing import IO, List, Optional
 from loguru import logger
 import requests
-import hashlib
 
-from ..core import Media, Metadata
+from ..core import Media, Metadata, DigestCache
 from ..storages import Storage
 from ..utils import get_atlos_config_options
 
@@ -14,6 +13,7 @@ class AtlosStorage(Storage):
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
+        DigestCache.register("SHA-256")
 
     @staticmethod
     def configs() -> dict:
@@ -30,13 +30,7 @@ class AtlosStorage(Storage):
         # hash because there's no guarantee that the configuerer is using sha-256, which
         # is how Atlos hashes files.
 
-        sha256 = hashlib.sha256()
-        with open(media.filename, "rb") as f:
-            while True:
-                buf = f.read(4096)
-                if not buf: break
-                sha256.update(buf)
-        return sha256.hexdigest()
+        return DigestCache.get(media.filename, "SHA-256")
 
     def upload(self, media: Media, metadata: Optional[Metadata]=None, **_kwargs) -> bool:
         atlos_id = metadata.get("atlos_id")
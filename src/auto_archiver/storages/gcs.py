@@ -1,12 +1,11 @@
 
 from typing import IO
 from google.cloud import storage
-import os
+import os, threading
 
-from ..utils.misc import random_str
-from ..core import Media, ArchivingContext
+from ..utils.resumable_upload import UploadSessions, UploadProgress, resumable_put
+from ..core import Media, ArchivingContext, DigestCache
 from ..storages import Storage
-from ..enrichers import HashEnricher
 from loguru import logger
 import re
 
@@ -14,6 +13,9 @@ import re
 NO_DUPLICATES_FOLDER = "no-dups/"
 class GCSStorage(Storage):
     # name = "gcs_storage"
+    # (bucket, blob name) of content-addressed objects known to exist, shared by all GCS storages
+    _known_blobs = set()
+    _known_blobs_lock = threading.Lock()
 
     def __init__(self, config: dict) -> None:
         super().__init__(config)
@@ -24,6 +26,8 @@ class GCSStorage(Storage):
         self.random_no_duplicate = bool(self.random_no_duplicate)
         if self.random_no_duplicate:
             logger.warning("random_no_duplicate is set to True, this will override `path_generator`, `filename_generator` and `folder`.")
+            DigestCache.register("SHA-256")
+        self.upload_sessions = UploadSessions(ArchivingContext.state_file(self.upload_sessions_file))
 
     @staticmethod
     def configs() -> dict:
@@ -32,11 +36,13 @@ class GCSStorage(Storage):
             ** {
                 "bucket_name": {"default": None, "help": "GCS bucket name"},
                 "service_account": {"default": None, "help": "Google Cloud Service Account credentials file"},
-                "random_no_duplicate": {"default": False, "help": f"if set, it will override `path_generator`, `filename_generator` and `folder`. It will check if the file already exists and if so it will not upload it again. Creates a new root folder path `{NO_DUPLICATES_FOLDER}`"},
+                "random_no_duplicate": {"default": False, "help": f"if set, files are named after the SHA-256 of their content inside `{NO_DUPLICATES_FOLDER}` (in top_level_folder) instead of the project naming convention, files that already exist are not uploaded again"},
                 "private": {"default": False, "help": "if true GCS files will not be readable online"},
                 "scopes": {"default": None, "help": "Permission scopes the GCS client needs"},
                 "top_level_folder": {"default": None, "help": "Folder within the bucket to put media"},
-                "cdn_url": {"default": None, "help": "Folder within the bucket to put media"}
+                "cdn_url": {"default": None, "help": "Folder within the bucket to put media"},
+                "upload_chunk_size": {"default": 8 * 1024 * 1024, "help": "bytes sent per request of a resumable upload (multiple of 256KiB), larger is faster on good connections, smaller loses less on a network error"},
+                "upload_sessions_file": {"default": None, "help": "optional JSON file where resumable upload sessions are kept so an interrupted run resumes uploads mid-file, relative to the orchestrator's state_dir"},
             })
 
     def uploadf(self, file: IO[bytes], media: Media, **kwargs: dict) -> None:
@@ -87,44 +93,66 @@ class GCSStorage(Storage):
                 
                 filename = os.path.join("media", media.clean_string(filename))
 
-        destination_blob_name = os.path.join(self.top_level_folder, filename)
-        blob = self.bucket.blob(destination_blob_name)
-        
-        blob.upload_from_file(file, content_type=media.mimetype)
+        metadata = None
+        if self.random_no_duplicate:
+            destination_blob_name = self.content_addressed_name(media)
+            metadata = {"sha256": DigestCache.get(media.filename, "SHA-256")}
+        else:
+            destination_blob_name = os.path.join(self.top_level_folder, filename)
+        self.resumable_upload(media.filename, destination_blob_name, media.mimetype, metadata)
+        if self.random_no_duplicate:
+            with GCSStorage._known_blobs_lock: GCSStorage._known_blobs.add((self.bucket_name, destination_blob_name))
 
         media.set("destination_blob_name", destination_blob_name)
 
         return True
     
+    def resumable_upload(self, filename: str, destination_blob_name: str, content_type: str = None, metadata: dict = None) -> None:
+        # a session of an interrupted run for the same file and destination is resumed where it stopped
+        session_key = self.upload_sessions.key(f"{self.bucket_name}/{destination_blob_name}", filename)
+        if not (session_uri := self.upload_sessions.get(session_key)):
+            blob = self.bucket.blob(destination_blob_name)
+            blob.metadata = metadata
+            session_uri = blob.create_resumable_upload_session(content_type=content_type, size=os.path.getsize(filename))
+            self.upload_sessions.set(session_key, session_uri)
+        progress = UploadProgress(os.path.basename(filename), os.path.getsize(filename))
+        try:
+            resumable_put(session_uri, filename, self.upload_chunk_size, progress)
+        except Exception as e:
+            # expired or invalid sessions cannot be resumed
+            if getattr(getattr(e, "response", None), "status_code", None) in (404, 410):
+                self.upload_sessions.remove(session_key)
+            raise
+        self.upload_sessions.remove(session_key)
+
     def is_upload_needed(self, media: Media) -> bool:
-        return True
         if self.random_no_duplicate:
-            # checks if a folder with the hash already exists, if so it skips the upload
-            he = HashEnricher({"hash_enricher": {"algorithm": "SHA-256", "chunksize": 1.6e7}})
-            hd = he.calculate_hash(media.filename)
-            path = os.path.join(NO_DUPLICATES_FOLDER, hd[:24])
-
-            if existing_key:=self.file_in_folder(path):
-                media.key = existing_key
+            # objects are named after their content hash, if one exists the upload is skipped and its URL reused
+            destination_blob_name = self.content_addressed_name(media)
+            if self.blob_exists(destination_blob_name, DigestCache.get(media.filename, "SHA-256")):
+                media.set("destination_blob_name", destination_blob_name)
                 media.set("previously archived", True)
-                logger.debug(f"skipping upload of {media.filename} because it already exists in {media.key}")
+                logger.debug(f"skipping upload of {media.filename} because it already exists in {destination_blob_name}")
                 return False
-            
-            _, ext = os.path.splitext(media.key)
-            media.key = os.path.join(path, f"{random_str(24)}{ext}")
         return True
-    
-    
-    def file_in_folder(self, path:str) -> str:
-        return False
-        # checks if path exists and is not an empty folder
-        if not path.endswith('/'):
-            path = path + '/' 
-        resp = self.s3.list_objects(Bucket=self.bucket, Prefix=path, Delimiter='/', MaxKeys=1)
-        if 'Contents' in resp:
-            return resp['Contents'][0]['Key']
-        return False
-    
+
+    def content_addressed_name(self, media: Media) -> str:
+        hd = DigestCache.get(media.filename, "SHA-256")
+        _, ext = os.path.splitext(media.key or media.filename)
+        return os.path.join(self.top_level_folder or "", NO_DUPLICATES_FOLDER, hd[:2], f"{hd}{ext}")
+
+    def blob_exists(self, destination_blob_name: str, sha256: str) -> bool:
+        # the local index of known objects saves the metadata request
+        with GCSStorage._known_blobs_lock:
+            if (self.bucket_name, destination_blob_name) in GCSStorage._known_blobs: return True
+        if (blob := self.bucket.get_blob(destination_blob_name)) is None: return False
+        if (blob.metadata or {}).get("sha256", sha256) != sha256:
+            logger.warning(f"{destination_blob_name} exists with a different sha256 ({blob.metadata['sha256']}), uploading it again")
+            return False
+        with GCSStorage._known_blobs_lock:
+            GCSStorage._known_blobs.add((self.bucket_name, destination_blob_name))
+        return True
+
     def get_cdn_url(self, media: Media) -> str:
         # Add error handling
         return self.cdn_url.format(bucket_name=self.bucket_name, 
@@ -1,7 +1,8 @@
 
-import shutil, os, time, json
+import shutil, os, time, json, threading, socket, ssl
 from typing import IO
 from loguru import logger
+import httplib2
 
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
@@ -10,6 +11,8 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
 from ..core import Media, ArchivingContext
+from ..utils import google_api_call, backoff_delay
+from ..utils.resumable_upload import UploadSessions, UploadProgress, upload_chunk_size
 from . import Storage
 
 import re
@@ -17,6 +20,9 @@ import re
 from datetime import datetime
 import pytz
 
+# the connection failed before Drive answered, google_api_call only retries Drive's answers
+TRANSPORT_ERRORS = (httplib2.HttpLib2Error, ConnectionError, TimeoutError, socket.timeout, ssl.SSLError)
+
 
 class GDriveStorage(Storage):
     name = "gdrive_storage"
@@ -62,7 +68,18 @@ class GDriveStorage(Storage):
             logger.debug(f'Using GD Service Account {gd_service_account}')
             creds = service_account.Credentials.from_service_account_file(gd_service_account, scopes=SCOPES)
 
-        self.service = build('drive', 'v3', credentials=creds)
+        # see get_service
+        self.creds = creds
+        self._local = threading.local()
+
+        # (parent id, name) -> (id, expires at) of folders and uploaded files, folders are optionally kept on disk
+        self.folder_cache_ttl = int(self.folder_cache_ttl or 0)
+        self.api_cache = {}
+        self._cache_lock = threading.RLock()
+        # creating folders one at a time stops concurrent uploads from creating the same folder twice
+        self._folders_lock = threading.Lock()
+        self._load_cache()
+        self.upload_sessions = UploadSessions(ArchivingContext.state_file(self.upload_sessions_file))
 
     @staticmethod
     def configs() -> dict:
@@ -72,9 +89,21 @@ class GDriveStorage(Storage):
                 "root_folder_id": {"default": None, "help": "root google drive folder ID to use as storage, found in URL: 'https://drive.google.com/drive/folders/FOLDER_ID'"},
                 "oauth_token": {"default": None, "help": "JSON filename with Google Drive OAuth token: check auto-archiver repository scripts folder for create_update_gdrive_oauth_token.py. NOTE: storage used will count towards owner of GDrive folder, therefore it is best to use oauth_token_filename over service_account."},
                 "service_account": {"default": "secrets/service_account.json", "help": "service account JSON file path, same as used for Google Sheets. NOTE: storage used will count towards the developer account."},
-                "dated_subfolders": {"default": False, "help": "whether to nest the media within a dated subfolder"}
+                "dated_subfolders": {"default": False, "help": "whether to nest the media within a dated subfolder"},
+                "folder_cache_ttl": {"default": 24 * 3600, "help": "seconds a Drive folder/file ID is remembered instead of searching for it again, 0 disables the cache"},
+                "folder_cache_file": {"default": None, "help": "optional JSON file where folder IDs are kept between runs"},
+                "upload_chunk_size": {"default": 8 * 1024 * 1024, "help": "bytes sent per request of a resumable upload (multiple of 256KiB), larger is faster on good connections, smaller loses less on a network error"},
+                "upload_sessions_file": {"default": None, "help": "optional JSON file where resumable upload sessions are kept so an interrupted run resumes uploads mid-file, relative to the orchestrator's state_dir"},
             })
     
+    def get_service(self):
+        # the Drive service sends its requests through a single httplib2.Http, which is not thread-safe,
+        # so each upload thread (and forked process) builds its own
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.service = build('drive', 'v3', credentials=self.creds)
+            self._local.pid = os.getpid()
+        return self._local.service
+
     def get_path_parts(self, media: Media) -> list[str]:
         path_parts = []
 
@@ -147,11 +176,12 @@ class GDriveStorage(Storage):
         filename = path_parts[-1]
 
         logger.info(f"checking folders {path_parts[0:-1]} exist (or creating) before uploading {filename=}")
-        for folder in path_parts[0:-1]:
-            upload_to = self._get_id_from_parent_and_name(parent_id, folder, use_mime_type=True, raise_on_missing=False)
-            if upload_to is None:
-                upload_to = self._mkdir(folder, parent_id)
-            parent_id = upload_to
+        with self._folders_lock:
+            for folder in path_parts[0:-1]:
+                upload_to = self._get_id_from_parent_and_name(parent_id, folder, use_mime_type=True, raise_on_missing=False)
+                if upload_to is None:
+                    upload_to = self._mkdir(folder, parent_id)
+                parent_id = upload_to
 
         # upload file to gd
         logger.debug(f'uploading {filename=} to folder id {upload_to}')
@@ -159,29 +189,93 @@ class GDriveStorage(Storage):
             'name': [filename],
             'parents': [upload_to]
         }
-        media = MediaFileUpload(media.filename, resumable=True)
-        gd_file = self.service.files().create(supportsAllDrives=True, body=file_metadata, media_body=media, fields='id').execute()
+        try:
+            gd_file = self._resumable_create(file_metadata, media.filename, f"{self.name}|{upload_to}/{filename}")
+        except Exception:
+            # a cached folder may have been deleted, look it up again next time
+            self._forget_path(path_parts[0:-1])
+            raise
         logger.debug(f'uploadf: uploaded file {gd_file["id"]} successfully in folder={upload_to}')
+        # so get_cdn_url does not need to search for it
+        self._cache_set(self._cache_key(upload_to, filename, False), gd_file["id"])
+
+    def _resumable_create(self, file_metadata: dict, local_filename: str, destination: str, max_attempts: int = 10) -> dict:
+        """
+        uploads local_filename in upload_chunk_size chunks, each retried on its own,
+        the session is remembered so a new run continues where the previous stopped.
+        HTTP errors are retried by google_api_call, network errors here: the next chunk then asks Drive how many bytes it has
+        """
+        session_key = self.upload_sessions.key(destination, local_filename)
+        size = os.path.getsize(local_filename)
+        progress = UploadProgress(os.path.basename(local_filename), size)
+        media_body = MediaFileUpload(local_filename, chunksize=upload_chunk_size(self.upload_chunk_size), resumable=True)
+        request = self.get_service().files().create(supportsAllDrives=True, body=file_metadata, media_body=media_body, fields='id')
+        session_uri = self.upload_sessions.get(session_key)
+
+        response, attempt = None, 0
+        while response is None:
+            try:
+                if session_uri and request.resumable_uri is None:
+                    # a session of a previous run
+                    response = self._resume_session(request, session_uri, size, progress)
+                    if response is None and request.resumable_uri is None:
+                        self.upload_sessions.remove(session_key)
+                        session_uri = None
+                    continue
+                status, response = google_api_call("drive", request.next_chunk)
+                attempt = 0
+            except TRANSPORT_ERRORS as e:
+                attempt += 1
+                if attempt >= max_attempts: raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"upload of {progress.name} interrupted ({e}), resuming in {delay:.1f}s (attempt {attempt}/{max_attempts})")
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                if session_uri and getattr(getattr(e, "resp", None), "status", None) in (404, 410):
+                    logger.warning(f"upload session for {local_filename} expired, starting over")
+                    self.upload_sessions.remove(session_key)
+                    return self._resumable_create(file_metadata, local_filename, destination, max_attempts)
+                raise
+            if request.resumable_uri: self.upload_sessions.set(session_key, request.resumable_uri)
+            if status: progress.update(status.resumable_progress)
+        self.upload_sessions.remove(session_key)
+        progress.done()
+        return response
+
+    def _resume_session(self, request, session_uri: str, size: int, progress: UploadProgress) -> dict:
+        """
+        asks Drive how many bytes of @session_uri it has so @request continues from there,
+        returns the created file if the upload had finished and None otherwise, request.resumable_uri stays None if the session expired
+        """
+        resp, content = google_api_call("drive", request.http.request, session_uri, "PUT", headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"})
+        if resp.status in (200, 201): return json.loads(content)
+        if resp.status != 308:
+            logger.warning(f"upload session for {progress.name} cannot be resumed ({resp.status}), starting over")
+            return None
+        request.resumable_uri = session_uri
+        # "range: bytes=0-N" says what Drive has, no range means nothing yet
+        request.resumable_progress = int(resp["range"].split("-")[-1]) + 1 if "range" in resp else 0
+        progress.resume(request.resumable_progress)
+        return None
 
     # must be implemented even if unused
     def uploadf(self, file: IO[bytes], key: str, **kwargs: dict) -> bool: pass
 
-    def _get_id_from_parent_and_name(self, parent_id: str, name: str, retries: int = 3, sleep_seconds: int = 10, use_mime_type: bool = False, raise_on_missing: bool = True, use_cache=False):
+    def _get_id_from_parent_and_name(self, parent_id: str, name: str, retries: int = 3, sleep_seconds: int = 2, use_mime_type: bool = False, raise_on_missing: bool = True, use_cache=True):
         """
         Retrieves the id of a folder or file from its @name and the @parent_id folder
-        Optionally does multiple @retries and sleeps @sleep_seconds between them
+        Optionally does multiple @retries with a jittered exponential backoff from @sleep_seconds between them
         If @use_mime_type will restrict search to "mimeType='application/vnd.google-apps.folder'"
         If @raise_on_missing will throw error when not found, or returns None
-        Will remember previous calls to avoid duplication if @use_cache - might not have all edge cases tested, so use at own risk
+        Will remember found ids for folder_cache_ttl seconds if @use_cache
         Returns the id of the file or folder from its name as a string
         """
         # cache logic
-        if use_cache:
-            self.api_cache = getattr(self, "api_cache", {})
-            cache_key = f"{parent_id}_{name}_{use_mime_type}"
-            if cache_key in self.api_cache:
-                logger.debug(f"cache hit for {cache_key=}")
-                return self.api_cache[cache_key]
+        cache_key = self._cache_key(parent_id, name, use_mime_type)
+        if use_cache and (cached_id := self._cache_get(cache_key)):
+            logger.debug(f"cache hit for {cache_key=}")
+            return cached_id
 
         # API logic
         debug_header: str = f"[searching {name=} in {parent_id=}]"
@@ -190,26 +284,27 @@ class GDriveStorage(Storage):
             query_string += f" and mimeType='application/vnd.google-apps.folder' "
 
         for attempt in range(retries):
-            results = self.service.files().list(
+            results = google_api_call("drive", self.get_service().files().list(
                 # both below for Google Shared Drives
                 supportsAllDrives=True,
                 includeItemsFromAllDrives=True,
                 q=query_string,
                 spaces='drive',  # ie not appDataFolder or photos
                 fields='files(id, name)'
-            ).execute()
+            ).execute)
             items = results.get('files', [])
 
             if len(items) > 0:
                 logger.debug(f"{debug_header} found {len(items)} matches, returning last of {','.join([i['id'] for i in items])}")
                 _id = items[-1]['id']
-                if use_cache: self.api_cache[cache_key] = _id
+                if use_cache: self._cache_set(cache_key, _id)
                 return _id
             else:
                 logger.debug(f'{debug_header} not found, attempt {attempt+1}/{retries}.')
                 if attempt < retries - 1:
-                    logger.debug(f'sleeping for {sleep_seconds} second(s)')
-                    time.sleep(sleep_seconds)
+                    delay = backoff_delay(attempt, base=sleep_seconds)
+                    logger.debug(f'sleeping for {delay:.1f} second(s)')
+                    time.sleep(delay)
 
         if raise_on_missing:
             raise ValueError(f'{debug_header} not found after {retries} attempt(s)')
@@ -226,5 +321,51 @@ class GDriveStorage(Storage):
             'mimeType': 'application/vnd.google-apps.folder',
             'parents': [parent_id]
         }
-        gd_folder = self.service.files().create(supportsAllDrives=True, body=file_metadata, fields='id').execute()
-        return gd_folder.get('id')
\ No newline at end of file
+        gd_folder = google_api_call("drive", self.get_service().files().create(supportsAllDrives=True, body=file_metadata, fields='id').execute)
+        self._cache_set(self._cache_key(parent_id, name, True), gd_folder.get('id'))
+        return gd_folder.get('id')
+
+    @staticmethod
+    def _cache_key(parent_id: str, name: str, is_folder: bool) -> str:
+        return f"{parent_id}_{name}_{is_folder}"
+
+    def _cache_get(self, cache_key: str) -> str:
+        with self._cache_lock:
+            if (cached := self.api_cache.get(cache_key)) is None: return None
+            _id, expires_at = cached
+            if expires_at < time.time():
+                del self.api_cache[cache_key]
+                return None
+            return _id
+
+    def _cache_set(self, cache_key: str, _id: str) -> None:
+        if not self.folder_cache_ttl or not _id: return
+        with self._cache_lock:
+            self.api_cache[cache_key] = (_id, time.time() + self.folder_cache_ttl)
+            if self.folder_cache_file and cache_key.endswith("_True"): self._save_cache()
+
+    def _forget_path(self, folders: list) -> None:
+        with self._cache_lock:
+            parent_id = self.root_folder_id
+            for folder in folders:
+                if (cached := self.api_cache.pop(self._cache_key(parent_id, folder, True), None)) is None: break
+                parent_id = cached[0]
+            if self.folder_cache_file: self._save_cache()
+
+    def _load_cache(self) -> None:
+        if not self.folder_cache_ttl or not self.folder_cache_file or not os.path.exists(self.folder_cache_file): return
+        try:
+            with open(self.folder_cache_file, "r") as f:
+                now = time.time()
+                self.api_cache = {k: tuple(v) for k, v in json.load(f).items() if v[1] > now}
+            logger.debug(f"loaded {len(self.api_cache)} Drive folder ids from {self.folder_cache_file}")
+        except Exception as e:
+            logger.warning(f"could not load the Drive folder cache from {self.folder_cache_file}: {e}")
+
+    def _save_cache(self) -> None:
+        # only folders are kept between runs
+        folders = {k: v for k, v in self.api_cache.items() if k.endswith("_True")}
+        tmp_file = f"{self.folder_cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(folders, f)
+        os.replace(tmp_file, self.folder_cache_file)
\ No newline at end of file
@@ -3,9 +3,8 @@ from typing import IO
 import boto3, os
 
 from ..utils.misc import random_str
-from ..core import Media
+from ..core import Media, DigestCache
 from ..storages import Storage
-from ..enrichers import HashEnricher
 from loguru import logger
 
 NO_DUPLICATES_FOLDER = "no-dups/"
@@ -24,6 +23,7 @@ class S3Storage(Storage):
         self.random_no_duplicate = bool(self.random_no_duplicate)
         if self.random_no_duplicate:
             logger.warning("random_no_duplicate is set to True, this will override `path_generator`, `filename_generator` and `folder`.")
+            DigestCache.register("SHA-256")
 
     @staticmethod
     def configs() -> dict:
@@ -69,8 +69,7 @@ class S3Storage(Storage):
     def is_upload_needed(self, media: Media) -> bool:
         if self.random_no_duplicate:
             # checks if a folder with the hash already exists, if so it skips the upload
-            he = HashEnricher({"hash_enricher": {"algorithm": "SHA-256", "chunksize": 1.6e7}})
-            hd = he.calculate_hash(media.filename)
+            hd = DigestCache.get(media.filename, "SHA-256")
             path = os.path.join(NO_DUPLICATES_FOLDER, hd[:24])
 
             if existing_key:=self.file_in_folder(path):
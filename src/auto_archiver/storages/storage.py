@@ -2,12 +2,12 @@ from __future__ import annotations
 from abc import abstractmethod
 from dataclasses import dataclass
 from typing import IO, Optional
-import os
+from concurrent.futures import ThreadPoolExecutor
+import os, threading
 
 from ..utils.misc import random_str
 
-from ..core import Media, Step, ArchivingContext, Metadata
-from ..enrichers import HashEnricher
+from ..core import Media, Step, ItemContext, Metadata, DigestCache
 from loguru import logger
 from slugify import slugify
 
@@ -17,6 +17,7 @@ class Storage(Step):
     name = "storage"
     PATH_GENERATOR_OPTIONS = ["flat", "url", "random"]
     FILENAME_GENERATOR_CHOICES = ["random", "static"]
+    _upload_executor_lock = threading.Lock()
 
     def __init__(self, config: dict) -> None:
         # without this STEP.__init__ is not called
@@ -36,6 +37,10 @@ class Storage(Step):
                 "default": "random",
                 "help": "how to name stored files: 'random' creates a random string; 'static' uses a replicable strategy such as a hash.",
                 "choices": Storage.FILENAME_GENERATOR_CHOICES
+            },
+            "max_concurrent_uploads": {
+                "default": 4,
+                "help": "maximum number of files uploaded to this storage at the same time, shared by all the items being archived",
             }
         }
 
@@ -48,8 +53,23 @@ class Storage(Step):
             logger.debug(f"{media.key} already stored, skipping")
             return
         self.set_key(media, url)
+        media.add_url(self.upload_and_get_cdn_url(media, metadata=metadata))
+
+    def upload_and_get_cdn_url(self, media: Media, metadata: Optional[Metadata]=None) -> str:
+        # expects the key to be set already, see Media.store for the parallel usage
         self.upload(media, metadata=metadata)
-        media.add_url(self.get_cdn_url(media))
+        return self.get_cdn_url(media)
+
+    def get_upload_executor(self) -> ThreadPoolExecutor:
+        """
+        thread pool shared by all uploads to this storage, caps them at max_concurrent_uploads
+        recreated in forked processes as threads are not inherited
+        """
+        with Storage._upload_executor_lock:
+            if getattr(self, "_upload_executor_pid", None) != os.getpid():
+                self._upload_executor = ThreadPoolExecutor(max_workers=max(1, int(self.max_concurrent_uploads)), thread_name_prefix=self.name)
+                self._upload_executor_pid = os.getpid()
+        return self._upload_executor
 
     @abstractmethod
     def get_cdn_url(self, media: Media) -> str: pass
@@ -65,7 +85,8 @@ class Storage(Step):
     def set_key(self, media: Media, url) -> None:
         """takes the media and optionally item info and generates a key"""
         if media.key is not None and len(media.key) > 0: return
-        folder = ArchivingContext.get("folder", "")
+        context = ItemContext.current()
+        folder = context.folder
         filename, ext = os.path.splitext(media.filename)
 
         # path_generator logic
@@ -74,13 +95,12 @@ class Storage(Step):
             filename = slugify(filename)  # in case it comes with os.sep
         elif self.path_generator == "url": path = slugify(url)
         elif self.path_generator == "random":
-            path = ArchivingContext.get("random_path", random_str(24), True)
+            path = context.setdefault("random_path", random_str(24))
 
         # filename_generator logic
         if self.filename_generator == "random": filename = random_str(24)
         elif self.filename_generator == "static":
-            he = HashEnricher({"hash_enricher": {"algorithm": ArchivingContext.get("hash_enricher.algorithm"), "chunksize": 1.6e7}})
-            hd = he.calculate_hash(media.filename)
+            hd = DigestCache.get(media.filename, context.get("hash_enricher.algorithm"))
             filename = hd[:24]
 
         media.key = os.path.join(folder, path, f"{filename}{ext}")
@@ -1,7 +1,9 @@
 # we need to explicitly expose the available imports here
+from .google_api import google_api_call, backoff_delay, TokenBucket
 from .gworksheet import GWorksheet
 from .misc import *
-from .webdriver import Webdriver
+from .webdriver import Webdriver, WebdriverPool, wait_until_ready
 from .gsheet import Gsheets
 from .url import UrlUtil
-from .atlos import get_atlos_config_options
\ No newline at end of file
+from .atlos import get_atlos_config_options
+from .translator import Translator
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from typing import Callable, Dict
+
+from loguru import logger
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that allows @rate_per_minute calls per minute, with bursts of up to @capacity.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self) -> None:
+        # the API said the quota is exhausted, stop handing out tokens until they refill
+        with self.lock:
+            self.tokens = min(self.tokens, 0)
+            self.updated_at = time.monotonic()
+
+
+# requests per minute per user, see https://developers.google.com/sheets/api/limits and https://developers.google.com/drive/api/guides/limits
+GOOGLE_API_QUOTAS = {
+    "sheets_read": 60,
+    "sheets_write": 60,
+    "drive": 12000,
+    "translate": 600,
+}
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 10
+MAX_BACKOFF = 64
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(api: str) -> TokenBucket:
+    with _buckets_lock:
+        if api not in _buckets:
+            _buckets[api] = TokenBucket(GOOGLE_API_QUOTAS[api])
+        return _buckets[api]
+
+
+def backoff_delay(attempt: int, base: float = 1, cap: float = MAX_BACKOFF) -> float:
+    # exponential backoff with full jitter, attempt starts at 0
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def google_api_call(api: str, fn: Callable, *args, **kwargs):
+    """
+    calls fn(*args, **kwargs) once the @api quota (one of GOOGLE_API_QUOTAS) allows it,
+    retrying quota and server errors with jittered exponential backoff that honours Retry-After, eg:
+        google_api_call("sheets_read", worksheet.get_values)
+        google_api_call("drive", service.files().list(q=query).execute)
+    other errors are raised right away
+    """
+    bucket = get_bucket(api)
+    for attempt in range(MAX_ATTEMPTS):
+        bucket.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            status = _status_code(e)
+            retryable = status in RETRYABLE_STATUS or (status == 403 and "rateLimitExceeded" in str(e))
+            if not retryable or attempt == MAX_ATTEMPTS - 1:
+                raise
+            if status in (403, 429): bucket.drain()
+            delay = _retry_after(e)
+            if delay is None: delay = backoff_delay(attempt)
+            logger.warning(f"{api} API returned {status}, retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_ATTEMPTS})")
+            time.sleep(delay)
+
+
+def _status_code(e: Exception) -> int:
+    # gspread.exceptions.APIError has .response, googleapiclient HttpError has .resp, google.api_core errors have .code
+    if (response := getattr(e, "response", None)) is not None and hasattr(response, "status_code"):
+        return response.status_code
+    if (resp := getattr(e, "resp", None)) is not None and hasattr(resp, "status"):
+        return int(resp.status)
+    if isinstance(code := getattr(e, "code", None), int):
+        return code
+    return None
+
+
+def _retry_after(e: Exception) -> float:
+    headers = {}
+    if (response := getattr(e, "response", None)) is not None and hasattr(response, "headers"):
+        headers = response.headers or {}
+    elif (resp := getattr(e, "resp", None)) is not None and hasattr(resp, "get"):
+        headers = resp
+    retry_after = headers.get("Retry-After", headers.get("retry-after"))
+    try: return min(float(retry_after), MAX_BACKOFF * 4)
+    except (TypeError, ValueError): return None
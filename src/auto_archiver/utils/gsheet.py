@@ -1,8 +1,7 @@
 import json, gspread
-from gspread.exceptions import APIError
-from time import sleep
 
 from ..core import Step
+from .google_api import google_api_call
 
 
 class Gsheets(Step):
@@ -60,11 +59,7 @@ class Gsheets(Step):
         }
 
     def open_sheet(self):
-        while True:
-            try:
-                if self.sheet:
-                    return self.gsheets_client.open(self.sheet)
-                else:  # self.sheet_id
-                    return self.gsheets_client.open_by_key(self.sheet_id)
-            except APIError:
-                sleep(60)
+        if self.sheet:
+            return google_api_call("sheets_read", self.gsheets_client.open, self.sheet)
+        else:  # self.sheet_id
+            return google_api_call("sheets_read", self.gsheets_client.open_by_key, self.sheet_id)
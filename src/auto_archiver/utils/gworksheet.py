@@ -1,7 +1,11 @@
 from gspread import utils
-from gspread_formatting import set_row_height
-from gspread.exceptions import APIError
-from time import sleep
+from loguru import logger
+import re
+import threading
+import time
+import weakref
+
+from .google_api import google_api_call
 
 class GWorksheet:
     """
@@ -9,7 +13,17 @@ class GWorksheet:
     It can read the headers from a custom row number, but the row references
     should always include the offset of the header. 
     eg: if header=4, row 5 will be the first with data. 
+    batch_set_cell writes are buffered (write-behind) and sent for many rows/items at once:
+    one spreadsheet batchUpdate for inserted rows, merges and row heights plus one values batchUpdate.
+    The buffer is flushed when it holds flush_max_cells values, flush_interval seconds after the first buffered
+    write, before any read of the sheet, and on GWorksheet.flush_all(). Writes of a failed flush stay buffered.
+    set_cell writes right away without flushing, unless buffered rows still have to be inserted before it.
+    Fresh reads only download what is needed: get_cell(fresh=True) re-reads the REFRESH_COLS of a window of rows
+    and fetch_new_rows() only the rows added after the last known one.
     """
+    ROW_HEIGHT = 200
+    REFRESH_COLS = ['url', 'status', 'name_prefix']
+    _instances = weakref.WeakSet()
     COLUMN_NAMES = {
         'uar': 'uar',
         'url': 'link',
@@ -52,15 +66,21 @@ class GWorksheet:
         'screenshot'
     ]
 
-    def __init__(self, worksheet, columns=COLUMN_NAMES, header_row=1):
+    def __init__(self, worksheet, columns=COLUMN_NAMES, header_row=1, flush_max_cells=1000, flush_interval=10, refresh_window=50, refresh_ttl=5):
         self.wks = worksheet
         self.columns = columns
-        while True:
-            try:
-                self.values = self.wks.get_values()
-                break
-            except APIError:
-                sleep(60)
+        self.flush_max_cells = flush_max_cells
+        self.flush_interval = flush_interval
+        self.refresh_window = refresh_window
+        self.refresh_ttl = refresh_ttl
+        self._refreshed = None  # (first row, last row, cols, time) of the last refresh_rows
+        self._lock = threading.RLock()  # guards the buffers and the local values, never held during API calls
+        self._send_lock = threading.Lock()  # writes reach the sheet in the order they were made
+        self._timer = None
+        self._sheet_requests = []  # spreadsheets.batchUpdate requests: inserted rows, merges and row heights
+        self._value_updates = []  # values.batchUpdate ranges
+        GWorksheet._instances.add(self)
+        self.values = google_api_call("sheets_read", self.wks.get_values)
         if len(self.values) > 0:
             self.headers = [v.lower() for v in self.values[header_row - 1]]
         else:
@@ -89,24 +109,52 @@ class GWorksheet:
         return self.values
     
     def reload_sheet(self):
-        while True:
-            try:
-                self.values = self.wks.get_values()
-                break
-            except APIError:
-                sleep(60)
+        self.flush()
+        self.values = google_api_call("sheets_read", self.wks.get_values)
+        self._refreshed = None
+
+    def refresh_rows(self, first: int, last: int, cols: list = None):
+        """
+        re-reads only the @cols (default REFRESH_COLS) of rows first..last (1-based, inclusive) in a single request,
+        rows after the last known one are read whole with fetch_new_rows so none is left partially loaded
+        """
+        self.flush()
+        cols = [c for c in dict.fromkeys(cols or self.REFRESH_COLS) if c in self.columns and self.col_exists(c)]
+        if not cols: return
+        known = len(self.values)
+        if first <= min(last, known):
+            ranges = [f"{self.to_a1(first, c)}:{self.to_a1(min(last, known), c)}" for c in cols]
+            results = google_api_call("sheets_read", self.wks.batch_get, ranges)
+            for col, values in zip(cols, results):
+                for i in range(min(last, known) - first + 1):
+                    self._set_local_value(first + i, col, values[i][0] if i < len(values) and len(values[i]) else '')
+        if last > known: self.fetch_new_rows()
+        self._refreshed = (first, last, set(cols), time.monotonic())
+
+    def fetch_new_rows(self) -> int:
+        """reads all the columns of the rows after the last known one, returns how many were added"""
+        self.flush()
+        first = len(self.values) + 1
+        last_col = re.sub(r"\d", "", utils.rowcol_to_a1(1, max(1, len(self.headers))))
+        new_rows = google_api_call("sheets_read", self.wks.get, f"A{first}:{last_col}")
+        self.values.extend([list(r) for r in new_rows])
+        return len(new_rows)
 
     def get_cell(self, row, col: str, fresh=False):
         """
         returns the cell value from (row, col), 
         where row can be an index (1-based) OR list of values
         as received from self.get_row(row)
-        if fresh=True, the sheet is queried again for this cell
+        if fresh=True, the sheet is queried again for this cell (and the REFRESH_COLS of the next rows)
         """
         col_index = self._col_index(col)
 
-        if fresh:
-            # return self.wks.cell(row, col_index + 1).value
+        if fresh and type(row) == int:
+            # a single read covers the next refresh_window rows, as long as it is recent
+            refreshed = self._refreshed
+            if not (refreshed and refreshed[0] <= row <= refreshed[1] and col in refreshed[2] and time.monotonic() - refreshed[3] < self.refresh_ttl):
+                self.refresh_rows(row, row + self.refresh_window - 1, self.REFRESH_COLS + [col])
+        elif fresh:
             self.reload_sheet()
 
         if type(row) == int:
@@ -131,73 +179,124 @@ class GWorksheet:
     def set_cell(self, row: int, col: str, val):
         # row is 1-based
         col_index = self._col_index(col) + 1
-        while True:
-            try:
-                self.wks.update_cell(row, col_index, val)
-                break
-            except APIError:
-                sleep(60)
+        with self._send_lock:
+            with self._lock:
+                if any("insertDimension" in r for r in self._sheet_requests):
+                    # the row is counted after the buffered inserted rows, so it is written after them
+                    self._buffer_values([(row, col, val)])
+                    return
+                # buffered writes of the same cell are older and would overwrite this one
+                a1 = self.to_a1(row, col)
+                self._value_updates = [u for u in self._value_updates if u['range'] != a1]
+                self._set_local_value(row, col, str(val))
+            google_api_call("sheets_write", self.wks.update_cell, row, col_index, val)
 
     def batch_set_cell(self, cell_updates):
         """
         receives a list of [(row:int, col:str, val)] and batch updates it, the parameters are the same as in the self.set_cell() method
+        the rows are given after the extra media rows are inserted, the update is buffered until the next flush
+        """
+        rows = sorted(set(row for row, _, _ in cell_updates))
+
+        with self._lock:
+            # If all the rows are not equal, merge certain cells
+            if len(rows) > 1:
+                self._refreshed = None
+                range_start, range_end = rows[0], rows[-1]
+                for row in rows[:-1]:
+                    self._sheet_requests.append({"insertDimension": {"range": self._dimension_range(row, row), "inheritFromBefore": False}})
+                    self.values.insert(row - 1, [])
+                for col in self.COLS_TO_MERGE_IF_EXTRA_MEDIA:
+                    if not self.col_exists(col): continue
+                    col_index = self._col_index(col)
+                    self._sheet_requests.append({"mergeCells": {"mergeType": "MERGE_ALL", "range": {
+                        "sheetId": self.wks.id, "startRowIndex": range_start - 1, "endRowIndex": range_end,
+                        "startColumnIndex": col_index, "endColumnIndex": col_index + 1
+                    }}})
+
+            # a single request for each block of consecutive rows
+            for first, last in self._consecutive(rows):
+                self._sheet_requests.append({"updateDimensionProperties": {
+                    "range": self._dimension_range(first, last), "properties": {"pixelSize": self.ROW_HEIGHT}, "fields": "pixelSize"
+                }})
+
+            full = self._buffer_values(cell_updates)
+        if full: self.flush()
+
+    def _buffer_values(self, cell_updates) -> bool:
+        # call with self._lock held, returns whether the buffer is full and should be flushed
+        for row, col, val in cell_updates:
+            val = str(val)[0:49999]
+            self._value_updates.append({'range': self.to_a1(row, col), 'values': [[val]]})
+            self._set_local_value(row, col, val)
+        if len(self._value_updates) >= self.flush_max_cells: return True
+        self._start_timer()
+        return False
+
+    def _start_timer(self):
+        # call with self._lock held
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
         """
-        rows = set()
-        for row, _, _ in cell_updates:
-            while True:
-                try:
-                    set_row_height(self.wks, f"""{row}:{row}""", 200)
-                    break
-                except APIError:
-                    sleep(60)
-
-            rows.add(row)
-
-        # if 106 in rows:
-        #     rows = {106, 107, 108}
-        # If all the rows are not equal, merge certain cells
-        if len(rows) != 1:
-            rows = sorted(rows)
-            range_start = rows[0]
-            range_end = rows[-1]
-            for row in rows[:-1]:
-                while True:
-                    try:
-                        self.wks.insert_row([], index=row)
-                        break
-                    except APIError:
-                        sleep(60)
-
-            for col in self.COLS_TO_MERGE_IF_EXTRA_MEDIA:
-                while True:
-                    try:
-                        self.wks.merge_cells(range_start, self._col_index(col)+1, range_end, self._col_index(col)+1)
-                        break
-                    except APIError:
-                        sleep(60)
-
-        cell_updates = [
-            {
-                'range': self.to_a1(row, col),
-                'values': [[str(val)[0:49999]]]
-            }
-            for row, col, val in cell_updates
-        ]
-
-        while True:
+        sends all the buffered writes, sheet structure first since the values' rows account for inserted rows
+        if sending fails the writes go back to the buffer, ahead of any newer ones, and the error is raised
+        """
+        with self._send_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                sheet_requests, self._sheet_requests = self._sheet_requests, []
+                value_updates, self._value_updates = self._value_updates, []
+
             try:
-                self.wks.batch_update(cell_updates, value_input_option='USER_ENTERED')
-                break
-            except APIError:
-                sleep(60)
-
-        if len(rows) != 1:
-            while True:
-                try:
-                    self.values = self.wks.get_values()
-                    break
-                except APIError:
-                    sleep(60)
+                if sheet_requests:
+                    google_api_call("sheets_write", self.wks.spreadsheet.batch_update, {"requests": sheet_requests})
+                    sheet_requests = []
+                if value_updates:
+                    google_api_call("sheets_write", self.wks.batch_update, value_updates, value_input_option='USER_ENTERED')
+            except Exception:
+                with self._lock:
+                    self._sheet_requests = sheet_requests + self._sheet_requests
+                    self._value_updates = value_updates + self._value_updates
+                raise
+
+    def _flush_from_timer(self):
+        # exceptions in the timer thread would go unnoticed, the writes stay buffered and are retried later
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"error writing {len(self._value_updates)} buffered cell(s) to worksheet {self.wks.title}: {e}")
+            with self._lock: self._start_timer()
+
+    @staticmethod
+    def flush_all():
+        for gw in list(GWorksheet._instances): gw.flush()
+
+    def _set_local_value(self, row: int, col: str, val: str):
+        # keeps self.values in sync with the buffered writes, as the sheet will be after a flush
+        while len(self.values) < row: self.values.append([])
+        values = self.values[row - 1]
+        col_index = self._col_index(col)
+        if len(values) <= col_index: values.extend([''] * (col_index + 1 - len(values)))
+        values[col_index] = val
+
+    def _dimension_range(self, first: int, last: int) -> dict:
+        # rows are 1-based and inclusive
+        return {"sheetId": self.wks.id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last}
+
+    @staticmethod
+    def _consecutive(rows):
+        # [1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]
+        blocks = []
+        for row in rows:
+            if blocks and blocks[-1][1] == row - 1: blocks[-1][1] = row
+            else: blocks.append([row, row])
+        return [tuple(b) for b in blocks]
 
     def to_a1(self, row: int, col: str):
         # row is 1-based
@@ -52,6 +52,15 @@ def update_nested_dict(dictionary, update_dict):
         else:
             dictionary[key] = value
 
+def folder_size(folder: str) -> int:
+    # total size in bytes of the files inside folder (recursively)
+    total = 0
+    for root, _, files in os.walk(folder):
+        for f in files:
+            try: total += os.path.getsize(os.path.join(root, f))
+            except OSError: pass
+    return total
+
 def random_str(length: int = 32) -> str:
     assert length <= 32, "length must be less than 32 as UUID4 is used"
     return str(uuid.uuid4()).replace("-", "")[:length]
\ No newline at end of file
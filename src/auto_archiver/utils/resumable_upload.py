@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from loguru import logger
+
+from .google_api import backoff_delay
+from ..core import DigestCache
+
+CHUNK_MULTIPLE = 256 * 1024  # resumable upload chunks must be multiples of 256KiB
+
+
+def upload_chunk_size(chunk_size) -> int:
+    # rounds the configured chunk size down to a valid one
+    return max(CHUNK_MULTIPLE, int(chunk_size) // CHUNK_MULTIPLE * CHUNK_MULTIPLE)
+
+
+class UploadSessions:
+    """
+    Resumable upload session URIs, optionally kept in a JSON file so an interrupted run resumes mid-file.
+    Kept sessions are keyed on the destination and the file content (size, SHA-256), so a new run downloading the same file
+    to another temporary folder resumes it and a changed file starts over.
+    """
+    MAX_AGE = 6 * 24 * 3600  # Drive and GCS sessions expire after a week
+
+    def __init__(self, filename: str = None) -> None:
+        self.filename = filename
+        self.sessions = {}
+        self.lock = threading.Lock()
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "r") as f:
+                    self.sessions = {k: v for k, v in json.load(f).items() if v["created"] > time.time() - self.MAX_AGE}
+            except Exception as e:
+                logger.warning(f"could not load upload sessions from {filename}: {e}")
+
+    def key(self, destination: str, filename: str) -> str:
+        # sessions that are not kept only live as long as the file in this run's temporary folder, so the content
+        # is only hashed when they are kept, the digest is usually cached already by the hash_enricher or the storage deduplication
+        if not self.filename: return f"{destination}|{os.path.getsize(filename)}"
+        return f"{destination}|{os.path.getsize(filename)}|{DigestCache.get(filename, 'SHA-256')}"
+
+    def get(self, key: str) -> str:
+        with self.lock:
+            return self.sessions.get(key, {}).get("uri")
+
+    def set(self, key: str, uri: str) -> None:
+        with self.lock:
+            if self.sessions.get(key, {}).get("uri") == uri: return
+            self.sessions[key] = {"uri": uri, "created": time.time()}
+            self._save()
+
+    def remove(self, key: str) -> None:
+        with self.lock:
+            if self.sessions.pop(key, None) is not None: self._save()
+
+    def _save(self) -> None:
+        if not self.filename: return
+        tmp_file = f"{self.filename}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.sessions, f)
+        os.replace(tmp_file, self.filename)
+
+
+class UploadProgress:
+    """logs the bytes uploaded, at most every @log_every seconds, and the average speed once done"""
+
+    def __init__(self, name: str, total: int, log_every: float = 10) -> None:
+        self.name = name
+        self.total = total
+        self.log_every = log_every
+        self.uploaded = 0
+        self.resumed_from = 0
+        self.started_at = self.logged_at = time.monotonic()
+
+    def resume(self, offset: int) -> None:
+        self.uploaded = self.resumed_from = offset
+        if offset: logger.info(f"resuming upload of {self.name} from {self._mb(offset)}/{self._mb(self.total)}")
+
+    def update(self, uploaded: int) -> None:
+        self.uploaded = uploaded
+        if time.monotonic() - self.logged_at >= self.log_every:
+            self.logged_at = time.monotonic()
+            logger.debug(f"uploading {self.name}: {self._mb(uploaded)}/{self._mb(self.total)} ({100 * uploaded / max(1, self.total):.0f}%) at {self.speed():.1f}MB/s")
+
+    def done(self) -> None:
+        self.uploaded = self.total
+        logger.debug(f"uploaded {self.name}: {self._mb(self.total)} in {time.monotonic() - self.started_at:.1f}s at {self.speed():.1f}MB/s")
+
+    def speed(self) -> float:
+        # MB/s of the bytes sent in this run
+        return (self.uploaded - self.resumed_from) / 1e6 / max(1e-6, time.monotonic() - self.started_at)
+
+    @staticmethod
+    def _mb(n: int) -> str:
+        return f"{n / 1e6:.1f}MB"
+
+
+def resumable_put(session_uri: str, filename: str, chunk_size: int, progress: UploadProgress, max_attempts: int = 10) -> requests.Response:
+    """
+    uploads @filename to a resumable @session_uri (eg: from google.cloud.storage Blob.create_resumable_upload_session)
+    in chunks of @chunk_size bytes, first asking the server how much it already has so interrupted uploads resume
+    network and server errors are retried with backoff from the last byte the server confirmed
+    """
+    total = os.path.getsize(filename)
+    chunk_size = upload_chunk_size(chunk_size)
+    with requests.Session() as http, open(filename, "rb") as f:
+        attempt, offset = 0, None
+        while True:
+            try:
+                if offset is None:
+                    # Content-Range */total asks for the upload status
+                    r = http.put(session_uri, headers={"Content-Range": f"bytes */{total}"}, timeout=60)
+                    if r.status_code in (200, 201): return r
+                    if r.status_code != 308: r.raise_for_status()
+                    offset = _confirmed_bytes(r)
+                    progress.resume(offset)
+                f.seek(offset)
+                data = f.read(chunk_size)
+                last = offset + len(data) - 1
+                content_range = f"bytes {offset}-{last}/{total}" if data else f"bytes */{total}"
+                r = http.put(session_uri, data=data, headers={"Content-Range": content_range}, timeout=300)
+                if r.status_code in (200, 201):
+                    progress.done()
+                    return r
+                if r.status_code != 308: r.raise_for_status()
+                offset = _confirmed_bytes(r)
+                progress.update(offset)
+                attempt = 0
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status is not None and status not in (408, 429) and status < 500: raise
+                attempt += 1
+                if attempt >= max_attempts: raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"upload of {progress.name} interrupted ({e}), resuming in {delay:.1f}s (attempt {attempt}/{max_attempts})")
+                time.sleep(delay)
+                offset = None
+
+
+def _confirmed_bytes(response: requests.Response) -> int:
+    # 308 responses say what the server has with "Range: bytes=0-N", no Range means nothing yet
+    if not (received := response.headers.get("Range")): return 0
+    return int(received.split("-")[-1]) + 1
@@ -0,0 +1,148 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from google.cloud import translate_v2 as translate
+from loguru import logger
+
+from .google_api import google_api_call
+
+
+class Translator:
+    """
+    Google Translate client that only pays the API round-trip for text it has not seen before:
+        translator.translate_many(["hola", "hello"]) -> [("es", "hello"), ("en", "hello")]
+    - text without words (empty, only links, mentions or numbers) never reaches the API
+    - all the remaining text is sent in batches of many strings per request, translate_later queues the text of
+      many items so they share requests, sent once MAX_BATCH_SIZE/MAX_BATCH_CHARS are queued, flush_interval
+      seconds after the first queued text or on flush()
+    - results are cached by hash of the text, in a sqlite file when cache_file is given so re-archives reuse them
+    the language is always detected by the API, local detection marks too much short non-English text as English
+    """
+    MAX_BATCH_SIZE = 128  # segments per request allowed by the v2 API
+    MAX_BATCH_CHARS = 30000  # recommended max characters per request
+
+    NON_WORDS = re.compile(r"https?://\S+|@\w+|[\d_]+|[^\w\s]")
+
+    def __init__(self, service_account: str, target_language: str = "en", cache_file: str = None, flush_interval: float = 10) -> None:
+        self.client = translate.Client.from_service_account_json(service_account)
+        self.target_language = target_language
+        self.flush_interval = flush_interval
+        self.cache: Dict[str, Tuple[str, str]] = {}
+        self.lock = threading.Lock()
+        self._pending: List[Tuple[List[str], Callable]] = []  # (texts, callback) queued by translate_later
+        self._pending_lock = threading.Lock()
+        self._timer = None
+        self.db = None
+        if cache_file:
+            self.db = sqlite3.connect(cache_file, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, source_language TEXT, translated_text TEXT)")
+            self.db.commit()
+
+    def translate(self, text: str) -> Tuple[str, str]:
+        return self.translate_many([text])[0]
+
+    def translate_many(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """returns a (detected source language, translated text) for each text, in order, ("", "") if it could not be translated"""
+        results: Dict[str, Tuple[str, str]] = {}
+        missing: Dict[str, str] = {}  # key -> text
+        for text in texts:
+            key = self._key(text)
+            if key in results or key in missing: continue
+            if (known := self._known(key, text)) is not None:
+                results[key] = known
+            else:
+                missing[key] = text
+
+        for batch in self._batches(list(missing.items())):
+            try:
+                translated = google_api_call("translate", self.client.translate, [text for _, text in batch], target_language=self.target_language)
+            except Exception as e:
+                logger.error(f"Unable to translate {len(batch)} text(s): {e}")
+                continue
+            for (key, _), t in zip(batch, translated):
+                results[key] = (t.get("detectedSourceLanguage", ""), t.get("translatedText", ""))
+                self._set_cached(key, results[key])
+
+        return [results.get(self._key(text), ("", "")) for text in texts]
+
+    def translate_later(self, texts: List[str], callback: Callable[[List[Tuple[str, str]]], None]) -> None:
+        """
+        like translate_many but the @texts that need the API are queued to be sent together with those of other calls,
+        callback(results) is called with the translate_many results right away when none do, otherwise by the flush
+        (from the caller of the flush or the timer thread)
+        """
+        if all(self._known(self._key(text), text) is not None for text in texts):
+            return callback(self.translate_many(texts))
+        with self._pending_lock:
+            self._pending.append((texts, callback))
+            queued = [text for texts, _ in self._pending for text in texts]
+            full = len(queued) >= self.MAX_BATCH_SIZE or sum(len(text or "") for text in queued) >= self.MAX_BATCH_CHARS
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full: self.flush()
+
+    def flush(self) -> None:
+        """translates all the queued texts and calls their callbacks"""
+        with self._pending_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, []
+        if not pending: return
+
+        results = iter(self.translate_many([text for texts, _ in pending for text in texts]))
+        for texts, callback in pending:
+            item_results = [next(results) for _ in texts]
+            try:
+                callback(item_results)
+            except Exception as e:
+                logger.error(f"error handling the translation of {texts}: {e}")
+
+    def _flush_from_timer(self) -> None:
+        # exceptions in timer threads would otherwise go unnoticed
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"error flushing queued translations: {e}")
+
+    def needs_translation(self, text: str) -> bool:
+        # anything with words goes to the API, which detects the language
+        return bool(text) and any(c.isalpha() for c in self.NON_WORDS.sub(" ", text))
+
+    def _known(self, key: str, text: str) -> Tuple[str, str]:
+        # the result when the API is not needed, None otherwise
+        if not self.needs_translation(text): return (self.target_language, text)
+        return self._get_cached(key)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.target_language}\0{text or ''}".encode()).hexdigest()
+
+    def _batches(self, items: List[Tuple[str, str]]):
+        batch, chars = [], 0
+        for key, text in items:
+            if batch and (len(batch) >= self.MAX_BATCH_SIZE or chars + len(text) > self.MAX_BATCH_CHARS):
+                yield batch
+                batch, chars = [], 0
+            batch.append((key, text))
+            chars += len(text)
+        if batch: yield batch
+
+    def _get_cached(self, key: str) -> Tuple[str, str]:
+        with self.lock:
+            if key in self.cache: return self.cache[key]
+            if self.db is None: return None
+            row = self.db.execute("SELECT source_language, translated_text FROM translations WHERE key = ?", (key,)).fetchone()
+            if row: self.cache[key] = tuple(row)
+            return self.cache.get(key)
+
+    def _set_cached(self, key: str, value: Tuple[str, str]) -> None:
+        with self.lock:
+            self.cache[key] = value
+            if self.db is None: return
+            self.db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", (key, *value))
+            self.db.commit()
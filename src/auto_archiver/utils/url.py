@@ -1,13 +1,31 @@
 import re
-from urllib.parse import urlparse, urlunparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 class UrlUtil:
     telegram_private = re.compile(r"https:\/\/t\.me(\/c)\/(.+)\/(\d+)")
     is_istagram = re.compile(r"https:\/\/www\.instagram\.com")
+    tracking_parameters = re.compile(r"^(utm_.*|fbclid|gclid|igshid|igsh|si|feature|ref_src|ref_url)$")
 
     @staticmethod
     def clean(url: str) -> str: return url
 
+    @staticmethod
+    def normalize(url: str) -> str:
+        """
+        canonical form used to recognise the same link submitted differently, not meant to be requested:
+        https://WWW.Example.com/post/?utm_source=x&b=2&a=1#top -> https://example.com/post?a=1&b=2
+        """
+        parsed = urlparse(url.strip())
+        netloc = parsed.netloc.lower()
+        for prefix in ["www.", "m.", "mobile."]: netloc = UrlUtil.remove_prefix(netloc, prefix)
+        query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not UrlUtil.tracking_parameters.match(k))
+        return urlunparse(("https", netloc, parsed.path.rstrip("/") or "/", "", urlencode(query), ""))
+
+    @staticmethod
+    def remove_prefix(text: str, prefix: str) -> str:
+        # str.removeprefix is only available from python 3.9
+        return text[len(prefix):] if prefix and text.startswith(prefix) else text
+
     @staticmethod
     def is_auth_wall(url: str) -> bool:
         """
@@ -1,12 +1,13 @@
 from __future__ import annotations
+from contextlib import contextmanager
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.proxy import Proxy, ProxyType
 from loguru import logger
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.service import Service
 
-import time
+import os, queue, threading, time
 
 
 class Webdriver:
@@ -32,21 +33,128 @@ class Webdriver:
             logger.error(f"failed to get new webdriver, possibly due to insufficient system resources or timeout settings: {e}")
 
         if self.facebook_accept_cookies:
-            try:
-                logger.debug(f'Trying fb click accept cookie popup.')
-                self.driver.get("http://www.facebook.com")
-                foo = self.driver.find_element(By.XPATH, "//button[@data-cookiebanner='accept_only_essential_button']")
-                foo.click()
-                logger.debug(f'fb click worked')
-                # linux server needs a sleep otherwise facebook cookie won't have worked and we'll get a popup on next page
-                time.sleep(2)
-            except:
-                logger.warning(f'Failed on fb accept cookies.')
+            Webdriver.accept_facebook_cookies(self.driver)
 
         return self.driver
 
+    @staticmethod
+    def accept_facebook_cookies(driver: webdriver) -> None:
+        try:
+            logger.debug(f'Trying fb click accept cookie popup.')
+            driver.get("http://www.facebook.com")
+            foo = driver.find_element(By.XPATH, "//button[@data-cookiebanner='accept_only_essential_button']")
+            foo.click()
+            logger.debug(f'fb click worked')
+            # linux server needs a sleep otherwise facebook cookie won't have worked and we'll get a popup on next page
+            time.sleep(2)
+        except:
+            logger.warning(f'Failed on fb accept cookies.')
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.driver.close()
         self.driver.quit()
         del self.driver
         return True
+
+
+class WebdriverPool:
+    """
+    Pool of long-lived webdrivers reused across items, instead of launching firefox and geckodriver for each page:
+        with pool.session(facebook_accept_cookies=True) as driver: driver.get(url)
+    - up to @size idle drivers are kept open, when all of them are busy an extra one is opened and closed after use
+    - a driver is recycled (closed and replaced) after @max_pages pages, when it crashed, or if it is unresponsive when reused
+    - the facebook cookie popup is accepted once per driver, the first time a facebook page needs it
+    - drivers cannot be shared with forked processes, create the pool in the process that uses it
+    """
+
+    def __init__(self, width: int, height: int, timeout_seconds: int, http_proxy: str = "", size: int = 1, max_pages: int = 50) -> None:
+        self.width = width
+        self.height = height
+        self.timeout_seconds = timeout_seconds
+        self.http_proxy = http_proxy
+        self.size = size
+        self.max_pages = max_pages
+        self.pid = os.getpid()
+        self.idle = queue.LifoQueue()  # the most recently used driver is the warmest
+        self.lock = threading.Lock()
+        self.drivers = set()  # all the open Webdriver, to close them on shutdown
+
+    @contextmanager
+    def session(self, facebook_accept_cookies: bool = False):
+        wd = self.acquire()
+        if facebook_accept_cookies and not wd.facebook_cookies_accepted:
+            Webdriver.accept_facebook_cookies(wd.driver)
+            wd.facebook_cookies_accepted = True
+        wd.pages += 1
+        try:
+            yield wd.driver
+        except TimeoutException:
+            # the page took too long but the driver is fine
+            self.release(wd)
+            raise
+        except WebDriverException:
+            self.discard(wd)
+            raise
+        except BaseException:
+            self.release(wd)
+            raise
+        self.release(wd)
+
+    def acquire(self) -> Webdriver:
+        while True:
+            try: wd = self.idle.get_nowait()
+            except queue.Empty: break
+            try:
+                wd.driver.current_window_handle  # raises if firefox/geckodriver died while idle
+                return wd
+            except Exception:
+                logger.warning("pooled webdriver is unresponsive, replacing it")
+                self.discard(wd)
+
+        wd = Webdriver(self.width, self.height, self.timeout_seconds, http_proxy=self.http_proxy)
+        wd.__enter__()
+        if not hasattr(wd, "driver"): raise WebDriverException("failed to get new webdriver")
+        wd.pages, wd.facebook_cookies_accepted = 0, False
+        with self.lock: self.drivers.add(wd)
+        return wd
+
+    def release(self, wd: Webdriver) -> None:
+        # drivers still in use on shutdown were already closed
+        with self.lock: shut_down = wd not in self.drivers
+        if shut_down or wd.pages >= self.max_pages or self.idle.qsize() >= self.size:
+            return self.discard(wd)
+        try:
+            # stops whatever the last page is still loading or playing
+            wd.driver.get("about:blank")
+        except Exception:
+            return self.discard(wd)
+        self.idle.put(wd)
+
+    def discard(self, wd: Webdriver) -> None:
+        with self.lock: self.drivers.discard(wd)
+        try: wd.driver.quit()
+        except Exception as e: logger.debug(f"error closing webdriver: {e}")
+
+    def shutdown(self) -> None:
+        with self.lock: drivers, self.drivers = list(self.drivers), set()
+        for wd in drivers:
+            try: wd.driver.quit()
+            except Exception as e: logger.debug(f"error closing webdriver: {e}")
+        self.idle = queue.LifoQueue()
+
+
+def wait_until_ready(driver: webdriver, timeout: float, network_idle: float = 0.5) -> bool:
+    """
+    waits until the page finished loading (document.readyState) and no network request finished for @network_idle seconds,
+    for at most @timeout seconds. returns False if the page was not ready by then
+    """
+    # finished requests are counted from the resource timing entries, whose buffer only holds 250 by default
+    script = "performance.setResourceTimingBufferSize(100000); return [document.readyState, performance.getEntriesByType('resource').length]"
+    deadline = time.monotonic() + timeout
+    requests, idle_since = -1, time.monotonic()
+    while time.monotonic() < deadline:
+        ready_state, finished = driver.execute_script(script)
+        if finished != requests: requests, idle_since = finished, time.monotonic()
+        elif ready_state == "complete" and time.monotonic() - idle_since >= network_idle: return True
+        time.sleep(0.1)
+    return False
@@ -0,0 +1,10 @@
+import pytest
+
+from auto_archiver.core import ArchivingContext
+
+
+@pytest.fixture(autouse=True)
+def reset_archiving_context():
+    # process-wide values (storages, project details, ...) must not leak between tests
+    yield
+    ArchivingContext.reset(full_reset=True)
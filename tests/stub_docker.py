@@ -0,0 +1,68 @@
+"""
+stand-in for the docker CLI in tests of the browsertrix-crawler warm pool, installed as `docker` by the stub_docker fixture:
+containers are JSON files in $STUB_DOCKER_DIR/containers and every command is appended to $STUB_DOCKER_DIR/log.
+a crawl writes a WACZ and pages.jsonl for its --collection under --cwd (or /crawls/) of the mounted folder,
+URLs containing "fail" leave a partial crawl behind and exit 1, and an exec in a container marked "dead" stops it (exit 137)
+"""
+import json, os, sys, uuid, zipfile
+
+STATE = os.environ["STUB_DOCKER_DIR"]
+CONTAINERS = os.path.join(STATE, "containers")
+
+
+def log(line: str) -> None:
+    with open(os.path.join(STATE, "log"), "a") as f: f.write(line + "\n")
+
+
+def option(args: list, name: str, default: str = None) -> str:
+    return args[args.index(name) + 1] if name in args else default
+
+
+def crawl(mount: str, args: list) -> None:
+    collection = option(args, "--collection")
+    cwd = option(args, "--cwd", "/crawls").replace("/crawls", mount, 1)
+    collection_dir = os.path.join(cwd, "collections", collection)
+    os.makedirs(os.path.join(collection_dir, "pages"), exist_ok=True)
+    if "fail" in option(args, "--url"): sys.exit(1)
+    with zipfile.ZipFile(os.path.join(collection_dir, f"{collection}.wacz"), "w") as z: z.writestr("pages/pages.jsonl", "{}")
+    with open(os.path.join(collection_dir, "pages", "pages.jsonl"), "w") as f: f.write(json.dumps({"title": f"crawl of {option(args, '--url')}"}) + "\n")
+
+
+def main(args: list) -> None:
+    os.makedirs(CONTAINERS, exist_ok=True)
+    command = args[0]
+    if command == "run":
+        mount = option(args, "-v").rsplit(":", 1)[0]
+        if "-d" in args:
+            container = uuid.uuid4().hex
+            with open(os.path.join(CONTAINERS, container), "w") as f: json.dump({"mount": mount, "label": option(args, "--label")}, f)
+            log(f"start {container}")
+            print(container)
+        else:
+            log("run")
+            crawl(mount, args)
+    elif command == "exec":
+        container = args[args.index("-u") + 2]
+        state_file = os.path.join(CONTAINERS, container)
+        if not os.path.exists(state_file): sys.exit(1)
+        with open(state_file) as f: state = json.load(f)
+        if state.get("dead"):
+            os.remove(state_file)
+            sys.exit(137)
+        log(f"exec {container}")
+        crawl(state["mount"], args)
+    elif command == "inspect":
+        print("true" if os.path.exists(os.path.join(CONTAINERS, args[-1])) else "false")
+    elif command == "ps":
+        label = option(args, "--filter")[len("label="):]
+        for container in os.listdir(CONTAINERS):
+            with open(os.path.join(CONTAINERS, container)) as f:
+                if json.load(f)["label"] == label: print(container)
+    elif command == "rm":
+        for container in args[2:]:
+            if os.path.exists(os.path.join(CONTAINERS, container)): os.remove(os.path.join(CONTAINERS, container))
+            log(f"rm {container}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
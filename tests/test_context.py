@@ -0,0 +1,78 @@
+import threading
+from types import SimpleNamespace
+
+import gspread
+
+from auto_archiver.core import ArchivingContext, ItemContext, Media
+from auto_archiver.core.orchestrator import ArchivingOrchestrator
+from auto_archiver.feeders import GsheetsFeeder
+from auto_archiver.storages import Storage
+from auto_archiver.utils import GWorksheet
+
+
+def test_item_values_are_isolated_between_threads():
+    ArchivingContext.set("storages", ["shared"], keep_on_reset=True)
+    seen, ready = {}, threading.Barrier(3)
+
+    def archive(name: str) -> None:
+        with ItemContext().activate() as context:
+            ArchivingContext.set("folder", name)
+            context.tmp_dir = f"/tmp/{name}"
+            ready.wait(5)
+            seen[name] = (ArchivingContext.get("folder"), ArchivingContext.get_tmp_dir(), ArchivingContext.get("storages"))
+
+    threads = [threading.Thread(target=archive, args=(name,)) for name in ["a", "b", "c"]]
+    for t in threads: t.start()
+    for t in threads: t.join(5)
+    # each item sees its own values and the process-wide ones
+    assert seen == {name: (name, f"/tmp/{name}", ["shared"]) for name in ["a", "b", "c"]}
+    assert ArchivingContext.get("folder") is None
+
+
+def test_activate_restores_the_previous_item():
+    with ItemContext({"folder": "outer"}).activate():
+        with ItemContext({"folder": "inner"}).activate():
+            assert ArchivingContext.get("folder") == "inner"
+        assert ArchivingContext.get("folder") == "outer"
+
+
+def test_item_values_override_process_wide_ones():
+    ArchivingContext.set("hash_enricher.algorithm", "SHA-256", keep_on_reset=True)
+    with ItemContext().activate():
+        ArchivingContext.set("hash_enricher.algorithm", "SHA3-512")
+        assert ArchivingContext.get("hash_enricher.algorithm") == "SHA3-512"
+        ArchivingContext.reset()
+        assert ArchivingContext.get("hash_enricher.algorithm") == "SHA-256"
+
+
+def test_picklable_drops_what_cannot_reach_another_process():
+    worksheet = SimpleNamespace(lock=threading.Lock())
+    context = ItemContext({"tmp_dir": "/tmp/a", "rows_final": threading.Event(), "gsheet": {"row": 3, "worksheet": worksheet}})
+    assert context.picklable().values == {"tmp_dir": "/tmp/a", "gsheet": {"row": 3}}
+
+
+def test_random_path_is_shared_by_the_media_of_an_item(tmp_path):
+    storage = type("PathStorage", (Storage,), {"name": "path_storage", "get_cdn_url": lambda self, m: "", "uploadf": lambda self, f, k, **kw: True})(
+        {"path_storage": {**{k: v["default"] for k, v in Storage.configs().items()}, "path_generator": "random"}})
+    keys = []
+    for item in range(2):
+        with ItemContext().activate():
+            media = [Media(str(tmp_path / f"{item}_{i}.txt")) for i in range(2)]
+            for m in media: storage.set_key(m, "https://example.com")
+            keys.append([m.key.split("/")[0] for m in media])
+    assert keys[0][0] == keys[0][1] and keys[1][0] == keys[1][1] and keys[0][0] != keys[1][0]
+
+
+def test_feeder_values_belong_to_their_item(monkeypatch):
+    # the second row has no folder, the first row's must not leak into it
+    from test_gworksheet import FakeWorksheet
+    wks = FakeWorksheet([["link", "media number + archive status", "destination folder"], ["https://a", "", "folder a"], ["https://b", "", ""]])
+    monkeypatch.setattr(gspread, "service_account", lambda filename: SimpleNamespace(open=lambda sheet: SimpleNamespace(worksheets=lambda: [wks])))
+    columns = dict(GWorksheet.COLUMN_NAMES, folder="destination folder")
+    feeder = GsheetsFeeder({"gsheet_feeder": {**{k: v["default"] for k, v in GsheetsFeeder.configs().items()}, "sheet": "test", "columns": columns, "use_sheet_names_in_stored_paths": False}})
+    orchestrator = object.__new__(ArchivingOrchestrator)
+    orchestrator.feeder = feeder
+
+    items = [(item.get_url(), context.folder, context.gsheet["row"]) for item, context in orchestrator.iterate_feeder()]
+    assert items == [("https://a", "folder-a", 2), ("https://b", "", 3)]
+    assert ItemContext.current().gsheet is None
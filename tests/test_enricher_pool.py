@@ -0,0 +1,38 @@
+import operator
+from types import SimpleNamespace
+
+import pytest
+
+from auto_archiver.core import ArchivingContext
+from auto_archiver.enrichers import Enricher
+from auto_archiver.enrichers import enricher as enricher_module
+
+
+@pytest.fixture(autouse=True)
+def two_processes():
+    ArchivingContext.set("enricher_processes", 2, keep_on_reset=True)
+    yield
+    Enricher.shutdown_process_pool()
+
+
+def test_map_in_processes():
+    assert Enricher.map_in_processes(operator.mul, [1, 2, 3], [4, 5, 6]) == [4, 10, 18]
+    assert Enricher._process_pool is not None
+
+
+def test_single_jobs_run_in_this_process():
+    assert Enricher.map_in_processes(operator.mul, [2], [3]) == [6]
+    assert Enricher._process_pool is None
+
+
+@pytest.mark.parametrize("version", [(3, 8, 0), (3, 11, 0)])
+def test_shutdown_and_recreate(monkeypatch, version):
+    monkeypatch.setattr(enricher_module, "sys", SimpleNamespace(version_info=version))
+    assert Enricher.map_in_processes(operator.add, [1, 2], [1, 2]) == [2, 4]
+    pool = Enricher._process_pool
+    Enricher.shutdown_process_pool()
+    assert Enricher._process_pool is None
+    # a shut down pool is not reused and shutting down twice is harmless
+    Enricher.shutdown_process_pool()
+    assert Enricher.map_in_processes(operator.add, [1, 2], [1, 2]) == [2, 4]
+    assert Enricher._process_pool is not pool
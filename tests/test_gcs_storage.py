@@ -0,0 +1,117 @@
+import hashlib, os
+from types import SimpleNamespace
+
+import pytest
+
+from auto_archiver.core import ArchivingContext, DigestCache, Media
+from auto_archiver.storages import gcs
+from auto_archiver.storages.gcs import GCSStorage, GCSStorage1
+
+
+class FakeBucket:
+    """a bucket of {blob name: metadata}, records the metadata requests and the upload sessions"""
+
+    def __init__(self) -> None:
+        self.blobs = {}
+        self.requests = []
+
+    def get_blob(self, name: str):
+        self.requests.append(("get_blob", name))
+        if name not in self.blobs: return None
+        return SimpleNamespace(metadata=self.blobs[name])
+
+    def blob(self, name: str):
+        bucket = self
+
+        class Blob:
+            metadata = None
+
+            def create_resumable_upload_session(self, content_type=None, size=None):
+                bucket.requests.append(("upload", name))
+                bucket.blobs[name] = self.metadata
+                return f"https://upload/{name}"
+        return Blob()
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setattr(gcs.storage.Client, "from_service_account_json", lambda *args: SimpleNamespace(bucket=lambda name: bucket))
+    monkeypatch.setattr(gcs, "resumable_put", lambda *args: None)
+    monkeypatch.setattr(GCSStorage, "_known_blobs", set())
+    ArchivingContext.set("project_details", [SimpleNamespace(name="project_naming_convention", value="only_uar")], keep_on_reset=True)
+    return bucket
+
+
+def make_storage(**config) -> GCSStorage1:
+    config = {**{k: v["default"] for k, v in GCSStorage.configs().items()}, "bucket_name": "bucket", "top_level_folder": "project", "cdn_url": "https://cdn/{bucket_name}/{key}", **config}
+    return GCSStorage1({GCSStorage1.name: config})
+
+
+def media(tmp_path, row: int, content: bytes = b"video") -> Media:
+    filename = str(tmp_path / f"{row}.mp4")
+    with open(filename, "wb") as f: f.write(content)
+    m = Media(filename).set("id", "media_1").set("row", row).set("uar", "test")
+    m.key = f"{row}.mp4"
+    return m
+
+
+def content_addressed(content: bytes) -> str:
+    sha256 = hashlib.sha256(content).hexdigest()
+    return f"project/no-dups/{sha256[:2]}/{sha256}.mp4"
+
+
+def test_project_naming_without_dedup(bucket, tmp_path):
+    storage = make_storage()
+    m = media(tmp_path, 2)
+    storage.upload(m)
+    assert bucket.requests == [("upload", "project/media/2_test.mp4")]
+    assert storage.get_cdn_url(m) == "https://cdn/bucket/project/media/2_test.mp4"
+
+
+def test_same_content_is_uploaded_once(bucket, tmp_path):
+    storage = make_storage(random_no_duplicate=True)
+    first, second = media(tmp_path, 2), media(tmp_path, 3)
+    storage.upload(first)
+    storage.upload(second)
+    name = content_addressed(b"video")
+    # the second file is known from the first upload, not even its metadata is requested
+    assert bucket.requests == [("get_blob", name), ("upload", name)]
+    assert bucket.blobs[name] == {"sha256": hashlib.sha256(b"video").hexdigest()}
+    assert storage.get_cdn_url(first) == storage.get_cdn_url(second) == f"https://cdn/bucket/{name}"
+    assert second.get("previously archived") and not first.get("previously archived")
+
+
+def test_objects_of_previous_runs_are_reused(bucket, tmp_path):
+    name = content_addressed(b"video")
+    bucket.blobs[name] = {"sha256": hashlib.sha256(b"video").hexdigest()}
+    m = media(tmp_path, 2)
+    make_storage(random_no_duplicate=True).upload(m)
+    assert bucket.requests == [("get_blob", name)]
+    assert m.get("destination_blob_name") == name and m.get("previously archived")
+
+
+def test_object_with_another_hash_is_uploaded_again(bucket, tmp_path):
+    name = content_addressed(b"video")
+    bucket.blobs[name] = {"sha256": "not the content"}
+    make_storage(random_no_duplicate=True).upload(media(tmp_path, 2))
+    assert bucket.requests == [("get_blob", name), ("upload", name)]
+
+
+def test_different_content_is_not_deduplicated(bucket, tmp_path):
+    storage = make_storage(random_no_duplicate=True)
+    storage.upload(media(tmp_path, 2, b"video"))
+    storage.upload(media(tmp_path, 3, b"another video"))
+    assert [r for r in bucket.requests if r[0] == "upload"] == [("upload", content_addressed(b"video")), ("upload", content_addressed(b"another video"))]
+
+
+def test_file_is_hashed_once(bucket, tmp_path, monkeypatch):
+    storage = make_storage(random_no_duplicate=True)
+    m = media(tmp_path, 2)
+    DigestCache.clear()
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda file, *args, **kwargs: opened.append(file) or real_open(file, *args, **kwargs))
+    storage.upload(m)
+    # once by Storage.upload, once to be hashed
+    assert opened.count(m.filename) == 2
@@ -0,0 +1,144 @@
+import re, threading, time
+from types import SimpleNamespace
+
+import pytest
+
+from auto_archiver.core import ArchivingContext, Media
+from auto_archiver.storages import gd
+from auto_archiver.storages.gd import GDriveStorage
+
+
+class FakeDrive:
+    """a Drive service over a dict of {(parent id, name): (id, is folder)}, counts the API calls"""
+
+    def __init__(self) -> None:
+        self.files_by_parent = {}
+        self.calls = {"list": 0, "create": 0}
+        self.lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def list(self, q: str, **kwargs):
+        parent, name = re.search(r"'(.*?)' in parents and name = '(.*?)'", q).groups()
+        folders_only = "mimeType" in q
+
+        def execute():
+            with self.lock:
+                self.calls["list"] += 1
+                found = self.files_by_parent.get((parent, name))
+            return {"files": [{"id": found[0], "name": name}] if found and (found[1] or not folders_only) else []}
+        return SimpleNamespace(execute=execute)
+
+    def create(self, body: dict, **kwargs):
+        def execute():
+            # slow enough for concurrent uploads to race
+            time.sleep(0.05)
+            with self.lock:
+                self.calls["create"] += 1
+                _id = f"id{len(self.files_by_parent)}"
+                self.files_by_parent[(body["parents"][0], body["name"][0])] = (_id, "mimeType" in body)
+            return {"id": _id}
+        return SimpleNamespace(execute=execute)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    drive = FakeDrive()
+    monkeypatch.setattr(gd.service_account.Credentials, "from_service_account_file", lambda *args, **kwargs: None)
+    monkeypatch.setattr(gd, "build", lambda *args, **kwargs: drive)
+    monkeypatch.setattr(gd, "backoff_delay", lambda attempt, base=1: 0)
+    ArchivingContext.set("project_details", [SimpleNamespace(name="project_naming_convention", value="only_uar")], keep_on_reset=True)
+    return drive
+
+
+def make_storage(**config) -> GDriveStorage:
+    storage = GDriveStorage({"gdrive_storage": {**{k: v["default"] for k, v in GDriveStorage.configs().items()}, "root_folder_id": "root", **config}})
+
+    # the file content is not what is tested here
+    def create(file_metadata, local_filename, destination):
+        return storage.get_service().create(body=file_metadata).execute()
+    storage._resumable_create = create
+    return storage
+
+
+def media(row: int) -> Media:
+    m = Media(f"{row}.mp4").set("id", "media_1").set("row", row).set("uar", "test")
+    m.key = f"{row}.mp4"
+    return m
+
+
+def test_each_thread_gets_its_own_service(monkeypatch):
+    monkeypatch.setattr(gd, "build", lambda *args, **kwargs: object())
+    storage = object.__new__(GDriveStorage)
+    storage.creds = None
+    storage._local = threading.local()
+    services = []
+    threads = [threading.Thread(target=lambda: services.append((storage.get_service(), storage.get_service()))) for _ in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    # reused within a thread, never shared between threads
+    assert all(first is second for first, second in services)
+    assert len({id(first) for first, _ in services}) == 3
+    assert storage.get_service() is storage.get_service() and storage.get_service() not in [s for s, _ in services]
+
+
+def test_folder_and_file_ids_are_cached(drive):
+    storage = make_storage()
+    storage.upload(media(2))
+    assert drive.calls == {"list": 3, "create": 2}  # the "media" folder was searched for (3 attempts) and created
+    storage.upload(media(3))
+    # the folder id is known and the urls of the uploaded files too
+    assert drive.calls == {"list": 3, "create": 3}
+    assert storage.get_cdn_url(media(2)) == "https://drive.google.com/file/d/id1/view?usp=sharing"
+    assert storage.get_cdn_url(media(3)) == "https://drive.google.com/file/d/id2/view?usp=sharing"
+    assert drive.calls["list"] == 3
+
+
+def test_expired_ids_are_searched_again(drive):
+    storage = make_storage(folder_cache_ttl=1)
+    storage.upload(media(2))
+    list_calls = drive.calls["list"]
+    storage.api_cache = {k: (_id, time.time() - 1) for k, (_id, _) in storage.api_cache.items()}
+    assert storage.get_cdn_url(media(2)) == "https://drive.google.com/file/d/id1/view?usp=sharing"
+    assert drive.calls["list"] == list_calls + 2 and drive.calls["create"] == 2
+
+
+def test_no_cache(drive):
+    storage = make_storage(folder_cache_ttl=0)
+    storage.upload(media(2))
+    storage.upload(media(3))
+    assert storage.api_cache == {} and drive.calls["create"] == 3
+    # the folder created by the first upload is found by the second one
+    assert drive.calls["list"] == 4
+
+
+def test_folders_are_kept_in_the_cache_file(drive, tmp_path):
+    cache_file = str(tmp_path / "folders.json")
+    make_storage(folder_cache_file=cache_file).upload(media(2))
+    list_calls = drive.calls["list"]
+    storage = make_storage(folder_cache_file=cache_file)
+    # only folders are kept between runs
+    assert list(storage.api_cache) == ["root_media_True"]
+    storage.upload(media(3))
+    assert drive.calls["list"] == list_calls and drive.calls["create"] == 3
+
+
+def test_concurrent_uploads_create_a_folder_once(drive):
+    storage = make_storage()
+    threads = [threading.Thread(target=storage.upload, args=(media(row),)) for row in range(2, 6)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    folders = [k for k, (_, is_folder) in drive.files_by_parent.items() if is_folder]
+    assert folders == [("root", "media")] and drive.calls["create"] == 5
+
+
+def test_failed_uploads_forget_the_cached_folders(drive):
+    storage = make_storage()
+    storage.upload(media(2))
+
+    def deleted_folder(file_metadata, local_filename, destination): raise Exception("File not found: id0")
+    storage._resumable_create = deleted_folder
+    with pytest.raises(Exception):
+        storage.upload(media(3))
+    assert "root_media_True" not in storage.api_cache
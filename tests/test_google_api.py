@@ -0,0 +1,127 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from auto_archiver.utils import google_api, google_api_call, backoff_delay, TokenBucket
+
+
+class APIError(Exception):
+    """like gspread's APIError, the status and headers come in .response"""
+
+    def __init__(self, status: int, headers: dict = None, message: str = "") -> None:
+        super().__init__(message or f"status {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class FakeClock:
+    """time for google_api: sleeping only advances the clock, the sleeps are recorded"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # buckets start full for every test
+    clock = FakeClock()
+    monkeypatch.setattr(google_api, "time", clock)
+    monkeypatch.setattr(google_api, "_buckets", {})
+    return clock
+
+
+def failing(*errors, result="ok"):
+    """fails with each of the @errors and then returns @result, fn.calls counts the attempts"""
+    errors = list(errors)
+
+    def fn():
+        fn.calls += 1
+        if errors: raise errors.pop(0)
+        return result
+    fn.calls = 0
+    return fn
+
+
+def test_token_bucket_allows_bursts_then_waits():
+    bucket = TokenBucket(rate_per_minute=600, capacity=5)
+    start = time.monotonic()
+    for _ in range(5): bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(2): bucket.acquire()
+    # 2 more tokens at 10 per second
+    assert 0.15 <= time.monotonic() - start < 1
+
+
+def test_token_bucket_drain_empties_it():
+    bucket = TokenBucket(rate_per_minute=600)
+    bucket.drain()
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.parametrize("attempt", range(10))
+def test_backoff_delay_is_capped_full_jitter(attempt):
+    delays = [backoff_delay(attempt, base=1, cap=8) for _ in range(200)]
+    assert all(0 <= d <= min(8, 2 ** attempt) for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retryable_errors_are_retried(clock):
+    fn = failing(APIError(503), APIError(429), APIError(500))
+    assert google_api_call("sheets_read", fn) == "ok"
+    assert fn.calls == 4
+
+
+def test_retry_after_is_honoured(clock):
+    assert google_api_call("sheets_read", failing(APIError(503, {"Retry-After": "7"}))) == "ok"
+    assert clock.sleeps == [7]
+
+
+def test_quota_errors_drain_the_bucket(clock):
+    google_api_call("sheets_write", failing(APIError(429, {"Retry-After": "0"})))
+    # the bucket refills at 1 per second after the drain
+    assert clock.sleeps == [0, 1]
+
+
+def test_rate_limit_403_is_retried_other_403_are_not(clock):
+    fn = failing(APIError(403, message="rateLimitExceeded"))
+    assert google_api_call("drive", fn) == "ok"
+    assert fn.calls == 2
+    fn = failing(APIError(403, message="forbidden"))
+    with pytest.raises(APIError):
+        google_api_call("drive", fn)
+    assert fn.calls == 1
+
+
+def test_client_errors_are_raised_right_away(clock):
+    with pytest.raises(APIError):
+        google_api_call("sheets_write", failing(APIError(400)))
+    with pytest.raises(ValueError):
+        google_api_call("sheets_write", failing(ValueError("bad")))
+    assert clock.sleeps == []
+
+
+def test_gives_up_after_max_attempts(clock):
+    fn = failing(*[APIError(500)] * google_api.MAX_ATTEMPTS)
+    with pytest.raises(APIError):
+        google_api_call("translate", fn)
+    assert fn.calls == google_api.MAX_ATTEMPTS
+
+
+@pytest.mark.parametrize("error, status", [
+    (APIError(429), 429),
+    (SimpleNamespace(resp=SimpleNamespace(status="503")), 503),
+    (SimpleNamespace(code=500), 500),
+    (ConnectionResetError(), None),
+])
+def test_status_code_of_each_google_client(error, status):
+    assert google_api._status_code(error) == status
@@ -0,0 +1,187 @@
+import pytest
+from gspread import utils
+
+from auto_archiver.utils import GWorksheet
+
+COLUMNS = GWorksheet.COLUMN_NAMES
+
+
+class FakeWorksheet:
+    """a gspread worksheet that applies the writes to a list of rows and records the requests, @fail makes the next writes raise"""
+    id = 0
+    title = "sheet"
+
+    def __init__(self, rows: list) -> None:
+        self.rows = [list(r) for r in rows]
+        self.requests = []
+        self.fail = 0
+        self.spreadsheet = self
+
+    def _write(self, name: str, *args) -> None:
+        self.requests.append((name, *args))
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionResetError("connection reset")
+
+    def _set(self, row: int, col: int, val) -> None:
+        while len(self.rows) < row: self.rows.append([])
+        values = self.rows[row - 1]
+        values.extend([""] * (col - len(values)))
+        values[col - 1] = val
+
+    def get_values(self):
+        return [list(r) for r in self.rows]
+
+    def get(self, a1_range):
+        # "A5:C" reads columns A to C of rows 5 to the end
+        self.requests.append(("get", a1_range))
+        start, end = a1_range.split(":")
+        first, first_col = utils.a1_to_rowcol(start)
+        _, last_col = utils.a1_to_rowcol(f"{end}1")
+        return [r[first_col - 1:last_col] for r in self.rows[first - 1:]]
+
+    def batch_get(self, ranges):
+        self.requests.append(("batch_get", ranges))
+        results = []
+        for a1_range in ranges:
+            (first, col), (last, _) = [utils.a1_to_rowcol(a1) for a1 in a1_range.split(":")]
+            results.append([r[col - 1:col] for r in self.rows[first - 1:last]])
+        return results
+
+    def update_cell(self, row, col, val):
+        self._write("update_cell", row, col, val)
+        self._set(row, col, val)
+
+    def batch_update(self, updates, value_input_option=None):
+        if type(updates) == dict:
+            self._write("structure", updates["requests"])
+            for r in updates["requests"]:
+                if "insertDimension" in r:
+                    start = r["insertDimension"]["range"]["startIndex"]
+                    self.rows.insert(start, [])
+            return
+        self._write("values", updates)
+        for u in updates:
+            row, col = utils.a1_to_rowcol(u["range"])
+            self._set(row, col, u["values"][0][0])
+
+
+@pytest.fixture
+def wks():
+    return FakeWorksheet([["link", "media number + archive status", "upload title"], ["https://a", "", ""], ["https://b", "", ""], ["https://c", "", ""]])
+
+
+def requests_of(wks, name):
+    return [r for r in wks.requests if r[0] == name]
+
+
+def test_batch_set_cell_is_buffered_until_flush(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "done"), (2, "title", "a")])
+    gw.batch_set_cell([(3, "status", "done")])
+    assert wks.requests == []
+    assert gw.get_cell(3, "status") == "done"
+    gw.flush()
+    assert len(requests_of(wks, "values")) == 1 and len(requests_of(wks, "structure")) == 1
+    assert wks.rows[1] == ["https://a", "done", "a"] and wks.rows[2][1] == "done"
+
+
+def test_failed_flush_keeps_the_writes(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "done")])
+    wks.fail = 1
+    with pytest.raises(ConnectionResetError):
+        gw.flush()
+    gw.batch_set_cell([(3, "status", "done")])
+    gw.flush()
+    assert wks.rows[1][1] == "done" and wks.rows[2][1] == "done"
+
+
+def test_failed_values_do_not_resend_the_structure(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "1/2"), (3, "status", "2/2")])
+    wks.requests, wks.fail = [], 0
+    original_write = wks._write
+
+    def fail_values(name, *args):
+        original_write(name, *args)
+        if name == "values" and len(requests_of(wks, "values")) == 1: raise ConnectionResetError("connection reset")
+    wks._write = fail_values
+    with pytest.raises(ConnectionResetError):
+        gw.flush()
+    gw.flush()
+    assert len(requests_of(wks, "structure")) == 1 and len(requests_of(wks, "values")) == 2
+    # the row inserted for the extra media is where the values were written
+    assert [r[1] for r in wks.rows[1:4]] == ["1/2", "2/2", ""]
+
+
+def test_timer_errors_are_logged_and_retried(wks, monkeypatch):
+    from auto_archiver.utils import gworksheet
+    errors = []
+    monkeypatch.setattr(gworksheet.logger, "error", errors.append)
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "done")])
+    wks.fail = 1
+    gw._flush_from_timer()
+    assert len(errors) == 1 and "connection reset" in errors[0]
+    assert gw._timer is not None
+    gw._timer.cancel()
+    gw._flush_from_timer()
+    assert wks.rows[1][1] == "done"
+
+
+def test_set_cell_does_not_drain_the_buffer(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "done")])
+    gw.set_cell(3, "status", "Archive in progress")
+    assert [r[0] for r in wks.requests] == ["update_cell"]
+    assert wks.rows[2][1] == "Archive in progress" and wks.rows[1][1] == ""
+    gw.flush()
+    assert wks.rows[1][1] == "done"
+
+
+def test_set_cell_replaces_older_buffered_writes(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    gw.batch_set_cell([(2, "status", "done"), (2, "title", "a")])
+    gw.set_cell(2, "status", "")
+    gw.flush()
+    assert wks.rows[1] == ["https://a", "", "a"]
+
+
+def test_set_cell_waits_for_buffered_inserted_rows(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, flush_interval=60)
+    # the first item has 2 media, so the next one (https://b) is now on row 4
+    gw.batch_set_cell([(2, "status", "1/2"), (3, "status", "2/2")])
+    gw.set_cell(4, "status", "Archive in progress")
+    assert wks.requests == []
+    gw.flush()
+    assert [r[:2] for r in wks.rows[1:5]] == [["", "1/2"], ["https://a", "2/2"], ["https://b", "Archive in progress"], ["https://c", ""]]
+
+
+def test_fresh_reads_only_download_the_refresh_columns(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, refresh_window=2)
+    wks.rows[2][1] = "done elsewhere"
+    wks.rows[2][2] = "not refreshed"
+    assert gw.get_cell(3, "status", fresh=True) == "done elsewhere"
+    assert gw.get_cell(3, "title") == ""
+    assert [r[0] for r in wks.requests] == ["batch_get"]
+    # the window was refreshed, the next row does not need another request
+    assert gw.get_cell(4, "status", fresh=True) == ""
+    assert len(wks.requests) == 1
+
+
+def test_rows_past_the_known_end_are_read_whole(wks):
+    gw = GWorksheet(wks, columns=COLUMNS, refresh_window=5)
+    wks.rows.append(["https://d", "", "a title"])
+    assert gw.get_cell(4, "status", fresh=True) == ""
+    assert gw.count_rows() == 5
+    assert gw.get_row(5) == ["https://d", "", "a title"]
+    assert ("get", "A5:C") in wks.requests
+
+
+def test_fetch_new_rows(wks):
+    gw = GWorksheet(wks, columns=COLUMNS)
+    assert gw.fetch_new_rows() == 0
+    wks.rows.extend([["https://d", "", "d"], ["https://e"]])
+    assert gw.fetch_new_rows() == 2
+    assert gw.get_cell(5, "title") == "d" and gw.get_cell(6, "url") == "https://e"
@@ -0,0 +1,80 @@
+import hashlib, os
+
+import pytest
+
+from auto_archiver.core import DigestCache
+
+
+@pytest.fixture(autouse=True)
+def clear_digest_cache():
+    DigestCache.clear()
+    yield
+    DigestCache.clear()
+
+
+@pytest.fixture
+def sample(tmp_path):
+    filename = str(tmp_path / "sample.bin")
+    with open(filename, "wb") as f: f.write(os.urandom(100_000))
+    return filename
+
+
+def expected(filename: str, algorithm: str) -> str:
+    with open(filename, "rb") as f:
+        return DigestCache.ALGORITHMS[algorithm](f.read()).hexdigest()
+
+
+def count_computes(monkeypatch) -> list:
+    calls = []
+    compute = DigestCache._compute
+
+    def counting(filename, algorithms, chunksize):
+        calls.append(set(algorithms))
+        return compute(filename, algorithms, chunksize)
+    monkeypatch.setattr(DigestCache, "_compute", staticmethod(counting))
+    return calls
+
+
+@pytest.mark.parametrize("chunksize", [None, 4096, 7])
+def test_digests_match_hashlib(sample, chunksize):
+    digests = DigestCache.get_many(sample, ["SHA-256", "SHA3-512", "MD5"], chunksize)
+    assert digests == {algorithm: expected(sample, algorithm) for algorithm in ["SHA-256", "SHA3-512", "MD5"]}
+
+
+def test_empty_file(tmp_path):
+    filename = str(tmp_path / "empty")
+    open(filename, "wb").close()
+    assert DigestCache.get(filename) == hashlib.sha256(b"").hexdigest()
+
+
+def test_algorithms_share_a_single_read(sample, monkeypatch):
+    calls = count_computes(monkeypatch)
+    DigestCache.get_many(sample, ["SHA-256", "MD5"])
+    assert DigestCache.get(sample, "MD5") == expected(sample, "MD5")
+    assert DigestCache.get(sample) == expected(sample, "SHA-256")
+    assert calls == [{"SHA-256", "MD5"}]
+
+
+def test_modified_file_is_hashed_again(sample, monkeypatch):
+    calls = count_computes(monkeypatch)
+    DigestCache.get(sample)
+    with open(sample, "ab") as f: f.write(b"more")
+    assert DigestCache.get(sample) == expected(sample, "SHA-256")
+    assert len(calls) == 2
+
+
+def test_invalid_algorithm(sample):
+    with pytest.raises(AssertionError):
+        DigestCache.get(sample, "SHA-1")
+
+
+def test_file_locks_are_released(sample, monkeypatch):
+    DigestCache.get(sample)
+    DigestCache.get(sample)
+    assert DigestCache._file_locks == {}
+
+    def failing(filename, algorithms, chunksize): raise OSError("read error")
+    monkeypatch.setattr(DigestCache, "_compute", staticmethod(failing))
+    with pytest.raises(OSError):
+        DigestCache.get(sample, "MD5")
+    assert DigestCache._file_locks == {}
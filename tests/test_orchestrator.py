@@ -0,0 +1,352 @@
+import json, os, time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from auto_archiver.archivers import Archiver
+from auto_archiver.core import ArchivingContext, ItemContext, Media, Metadata
+from auto_archiver.core.orchestrator import ArchivingOrchestrator
+from auto_archiver.core.project_details import ProjectName
+from auto_archiver.databases import Database
+from auto_archiver.feeders import Feeder
+from auto_archiver.formatters import MuteFormatter
+from auto_archiver.storages import Storage
+
+
+class FakeFeeder(Feeder):
+    name = "fake_feeder"
+
+    def __init__(self, urls: list) -> None:
+        super().__init__({})
+        self.urls = urls
+        self.row_offset = 1
+
+    def __iter__(self):
+        # like the gsheet_feeder, the next row skips the rows used by the extra media of the last item
+        row = 1
+        for url in self.urls:
+            row += max(1, self.row_offset)
+            ArchivingContext.set("gsheet", {"row": row, "worksheet": "sheet", "name_prefix": ""})
+            yield Metadata().set_url(url)
+
+
+class FakeArchiver(Archiver):
+    """downloads ?media=N files after sleeping ?delay=seconds, handing them to stream_media with ?stream"""
+    name = "fake_archiver"
+
+    def download(self, item: Metadata) -> Metadata:
+        query = parse_qs(urlparse(item.get_url()).query)
+        time.sleep(float(query.get("delay", ["0"])[0]))
+        result = Metadata().merge(item)
+        stream_media = ItemContext.current().get("stream_media") if "stream" in query else None
+        for i in range(int(query["media"][0])):
+            filename = os.path.join(ItemContext.current().tmp_dir, f"file_{i}.txt")
+            with open(filename, "w") as f: f.write(f"{item.get_url()} {i}")
+            media = Media(filename)
+            if stream_media: stream_media(media)
+            result.add_media(media)
+        return result.success("fake")
+
+
+class FakeStorage(Storage):
+    """logs the row each media is uploaded with, gd.py and gcs.py name the files after it"""
+    name = "fake_storage"
+
+    def __init__(self, log_file: str) -> None:
+        super().__init__({self.name: {k: v["default"] for k, v in Storage.configs().items()}})
+        self.log_file = log_file
+
+    def set_key(self, media: Media, url: str) -> None:
+        media.key = os.path.basename(media.filename)
+
+    def uploadf(self, file, key, **kwargs) -> bool: return True
+
+    def get_cdn_url(self, media: Media) -> str: return f"fake://{media.key}"
+
+    def upload_and_get_cdn_url(self, media: Media, metadata: Metadata = None) -> str:
+        # appended from worker threads and processes
+        with open(self.log_file, "a") as f: f.write(json.dumps([metadata.get_url(), media.get("id"), media.get("row")]) + "\n")
+        return self.get_cdn_url(media)
+
+
+class FakeDb(Database):
+    name = "fake_db"
+
+    def __init__(self) -> None:
+        super().__init__({})
+        self.rows = {}
+
+    def done(self, item: Metadata, cached: bool = False) -> None:
+        self.rows[item.get_url()] = ItemContext.current().gsheet["row"]
+
+
+def make_orchestrator(urls: list, db: Database, storage: Storage, archivers: list = None, **orchestrator_config) -> ArchivingOrchestrator:
+    config = SimpleNamespace(
+        feeder=FakeFeeder(urls), formatter=MuteFormatter({}), enrichers=[], archivers=archivers or [FakeArchiver({})], databases=[db],
+        storages=[storage], thumbnail_storages=[], html_metadata_storages=[], screenshot_storages=[],
+        project_details=[ProjectName({"project_name": {"value": "test"}})], config={"orchestrator": orchestrator_config})
+    return ArchivingOrchestrator(config)
+
+
+def archive(tmp_path, monkeypatch, urls: list, **orchestrator_config) -> tuple:
+    monkeypatch.chdir(tmp_path)
+    uploads_log = str(tmp_path / "uploads.jsonl")
+    db = FakeDb()
+    results = list(make_orchestrator(urls, db, FakeStorage(uploads_log), **orchestrator_config).feed())
+    with open(uploads_log) as f: uploads = [json.loads(line) for line in f]
+    return results, db.rows, uploads
+
+
+# the first items take the longest, so the later ones are acquired before their rows are final
+URLS = [
+    "https://example.com/a?media=3&delay=0.4",
+    "https://example.com/b?media=2",
+    "https://example.com/c?media=1&delay=0.1",
+    "https://example.com/d?media=2",
+]
+
+
+def assert_rows_consistent(urls: list, rows: dict, uploads: list) -> None:
+    assert set(rows) == set(urls)
+    # the files are stored with the row the databases get
+    for url, media_id, row in uploads:
+        assert row == rows[url], f"{url} {media_id} stored with row {row} but delivered with row {rows[url]}"
+    # and the media rows of the items do not overlap
+    media_count = {url: int(parse_qs(urlparse(url).query)["media"][0]) for url in urls}
+    ordered = sorted(urls, key=rows.get)
+    for previous, url in zip(ordered, ordered[1:]):
+        assert rows[url] >= rows[previous] + media_count[previous]
+
+
+def test_sequential_rows(tmp_path, monkeypatch):
+    results, rows, uploads = archive(tmp_path, monkeypatch, URLS)
+    assert len(results) == len(URLS) and len(uploads) == 8
+    assert_rows_consistent(URLS, rows, uploads)
+
+
+@pytest.mark.parametrize("orchestrator_config", [
+    {"workers": 3},
+    {"workers": 3, "upload_workers": 2},
+    {"workers": 3, "worker_type": "process"},
+])
+def test_concurrent_rows_are_final_before_storing(tmp_path, monkeypatch, orchestrator_config):
+    results, rows, uploads = archive(tmp_path, monkeypatch, URLS, **orchestrator_config)
+    assert [r.get_url() for r in results] == URLS
+    assert len(uploads) == 8
+    assert_rows_consistent(URLS, rows, uploads)
+
+
+def test_streamed_media_wait_for_final_rows(tmp_path, monkeypatch):
+    urls = ["https://example.com/a?media=2&delay=0.4", "https://example.com/b?media=3&stream=1", "https://example.com/c?media=1"]
+    results, rows, uploads = archive(tmp_path, monkeypatch, urls, workers=3)
+    assert all(m.get("streamed") for m in results[1].media)
+    assert_rows_consistent(urls, rows, uploads)
+
+
+class RacingArchiver(Archiver):
+    """succeeds (or not) after a delay, unless another archiver won the race first"""
+    name = "racing_archiver"
+
+    def __init__(self, label: str, delay: float, success: bool) -> None:
+        super().__init__({})
+        self.label, self.delay, self.success = label, delay, success
+        self.finished = False
+
+    def download(self, item: Metadata) -> Metadata:
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if self.is_cancelled(): return False
+            time.sleep(0.01)
+        self.finished = True
+        return Metadata().merge(item).set("archived_by", self.label).success(self.label) if self.success else False
+
+
+def test_race_keeps_the_priority_order(tmp_path):
+    slow_first = RacingArchiver("first", 0.3, True)
+    fast_second = RacingArchiver("second", 0.0, True)
+    failing = RacingArchiver("failing", 0.0, False)
+    orchestrator = make_orchestrator([], FakeDb(), FakeStorage(str(tmp_path / "uploads.jsonl")), archivers=[failing, slow_first, fast_second])
+    result = Metadata().set_url("https://example.com")
+    with ItemContext().activate() as context:
+        context.tmp_dir = str(tmp_path)
+        orchestrator.race(result, [failing, slow_first, fast_second])
+    # the fast one finished first but the result is the one of the first successful archiver in order
+    assert result.is_success() and result.get("archived_by") == "first" and fast_second.finished
+
+
+def test_race_cancels_the_lower_priority_archivers(tmp_path):
+    fast_first = RacingArchiver("first", 0.0, True)
+    slow_second = RacingArchiver("second", 5, True)
+    orchestrator = make_orchestrator([], FakeDb(), FakeStorage(str(tmp_path / "uploads.jsonl")), archivers=[fast_first, slow_second])
+    result = Metadata().set_url("https://example.com")
+    start = time.monotonic()
+    with ItemContext().activate() as context:
+        context.tmp_dir = str(tmp_path)
+        orchestrator.race(result, [fast_first, slow_second])
+    assert result.get("archived_by") == "first" and time.monotonic() - start < 1
+    time.sleep(0.1)
+    assert not slow_second.finished
+
+
+class TitledArchiver(FakeArchiver):
+    """the title of each item is its URL, so the sheet shows which item was written in each row"""
+
+    def download(self, item: Metadata) -> Metadata:
+        return super().download(item).set_title(item.get_url())
+
+
+class SlowStorage(FakeStorage):
+    def upload_and_get_cdn_url(self, media: Media, metadata: Metadata = None) -> str:
+        time.sleep(0.2)
+        return super().upload_and_get_cdn_url(media, metadata)
+
+
+def archive_sheet(tmp_path, monkeypatch, urls: list, storage_cls=SlowStorage, **orchestrator_config) -> list:
+    """archives @urls listed in a fake google sheet with the gsheet_feeder and gsheet_db, returns the sheet rows"""
+    from test_gworksheet import FakeWorksheet
+    import gspread
+    from auto_archiver.databases import GsheetsDb, gsheet_db
+    from auto_archiver.feeders import GsheetsFeeder
+    from auto_archiver.utils import GWorksheet
+
+    monkeypatch.chdir(tmp_path)
+    wks = FakeWorksheet([["link", "media number + archive status", "upload title"]] + [[url, "", ""] for url in urls])
+    monkeypatch.setattr(gspread, "service_account", lambda filename: SimpleNamespace(open=lambda sheet: SimpleNamespace(worksheets=lambda: [wks])))
+    monkeypatch.setattr(gsheet_db, "Translator", lambda *args, **kwargs: SimpleNamespace(flush=lambda: None))
+    feeder = GsheetsFeeder({"gsheet_feeder": {**{k: v["default"] for k, v in GsheetsFeeder.configs().items()}, "sheet": "test", "columns": GWorksheet.COLUMN_NAMES}})
+    db = GsheetsDb({"gsheet_db": {**{k: v["default"] for k, v in GsheetsDb.configs().items()}, "translation_cache": ""}})
+
+    orchestrator = make_orchestrator([], db, storage_cls(str(tmp_path / "uploads.jsonl")), archivers=[TitledArchiver({})], **orchestrator_config)
+    orchestrator.feeder = feeder
+    list(orchestrator.feed())
+    return wks.rows
+
+
+@pytest.mark.parametrize("orchestrator_config", [{}, {"workers": 3}, {"workers": 3, "upload_workers": 2}])
+def test_gsheet_rows_of_extra_media(tmp_path, monkeypatch, orchestrator_config):
+    # the first item is acquired quickly and its extra media rows are only inserted once it is slowly stored and delivered
+    urls = ["https://example.com/a?media=3"] + [f"https://example.com/{c}?media=1&delay=0.05" for c in "bcdefg"]
+    rows = archive_sheet(tmp_path, monkeypatch, urls, **orchestrator_config)
+    assert [r[1] for r in rows[1:4]] == ["1/3: fake: success", "2/3: fake: success", "3/3: fake: success"]
+    archived = rows[4:]
+    assert [r[0] for r in archived] == urls[1:]
+    # each row has the results of its own URL
+    assert all(r[1] == "1/1: fake: success" and r[2] == r[0] for r in archived), archived
+
+
+class FailingStorage(SlowStorage):
+    def upload_and_get_cdn_url(self, media: Media, metadata: Metadata = None) -> str:
+        if "fail" in metadata.get_url(): raise ConnectionResetError("connection reset")
+        return super().upload_and_get_cdn_url(media, metadata)
+
+
+def test_gsheet_rows_after_an_item_fails_to_store(tmp_path, monkeypatch):
+    # no rows are inserted for the media of an item that could not be stored
+    urls = ["https://example.com/fail?media=3"] + [f"https://example.com/{c}?media=1&delay=0.05" for c in "bcd"]
+    rows = archive_sheet(tmp_path, monkeypatch, urls, storage_cls=FailingStorage, workers=3)
+    assert [r[0] for r in rows[1:]] == urls
+    assert rows[1][1].startswith("Archive failed")
+    assert all(r[1] == "1/1: fake: success" and r[2] == r[0] for r in rows[2:]), rows
+
+
+class SanitizingArchiver(Archiver):
+    """logs the URLs it sanitizes, replacing @old with @new in them"""
+    name = "sanitizing_archiver"
+
+    def __init__(self, domains: list, old: str = "", new: str = "", log: list = None) -> None:
+        super().__init__({})
+        self.domains, self.old, self.new, self.log = domains, old, new, log
+
+    def sanitize_url(self, url: str) -> str:
+        self.log.append((self.domains[0], url))
+        return url.replace(self.old, self.new) if self.old else url
+
+    def download(self, item: Metadata) -> Metadata: return False
+
+
+def test_expanded_urls_are_sanitized_by_their_archivers(tmp_path):
+    log = []
+    archivers = [
+        SanitizingArchiver(["t.co"], "https://t.co/abc", "https://x.com/user/status/1?s=20", log=log),
+        SanitizingArchiver(["example.com"], log=log),
+        SanitizingArchiver(["x.com"], "?s=20", "", log=log),
+    ]
+    orchestrator = make_orchestrator([], FakeDb(), FakeStorage(str(tmp_path / "uploads.jsonl")), archivers=archivers)
+    item = Metadata().set_url("https://t.co/abc")
+    with ItemContext().activate():
+        orchestrator.start(item)
+    assert log == [("t.co", "https://t.co/abc"), ("x.com", "https://x.com/user/status/1?s=20")]
+    assert item.get_url() == "https://x.com/user/status/1" and item.get("original_url") == "https://t.co/abc"
+
+
+class TimedArchiver(FakeArchiver):
+    """logs when each download starts and ends, ?size=MB writes a file of that size first"""
+
+    def __init__(self, log: list) -> None:
+        super().__init__({})
+        self.log = log
+
+    def download(self, item: Metadata) -> Metadata:
+        self.log.append(("download", item.get_url(), time.monotonic()))
+        if (size := parse_qs(urlparse(item.get_url()).query).get("size")):
+            with open(os.path.join(ItemContext.current().tmp_dir, "big.bin"), "wb") as f: f.write(b"0" * int(size[0]) * 1024 * 1024)
+        result = super().download(item)
+        self.log.append(("downloaded", item.get_url(), time.monotonic()))
+        return result
+
+
+class TimedStorage(FakeStorage):
+    def __init__(self, log_file: str, log: list) -> None:
+        super().__init__(log_file)
+        self.log = log
+
+    def upload_and_get_cdn_url(self, media: Media, metadata: Metadata = None) -> str:
+        time.sleep(0.3)
+        self.log.append(("uploaded", metadata.get_url(), time.monotonic()))
+        return super().upload_and_get_cdn_url(media, metadata)
+
+
+class SlowFeeder(FakeFeeder):
+    """takes a while to read each row and logs how many items were in flight then"""
+
+    def __init__(self, urls: list, db: FakeDb) -> None:
+        super().__init__(urls)
+        self.db, self.in_flight = db, []
+
+    def __iter__(self):
+        for i, item in enumerate(super().__iter__()):
+            time.sleep(0.1)
+            self.in_flight.append(i - len(self.db.rows))
+            yield item
+
+
+def archive_timed(tmp_path, monkeypatch, urls: list, **orchestrator_config) -> tuple:
+    os.makedirs(tmp_path, exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    log, db = [], FakeDb()
+    orchestrator = make_orchestrator([], db, TimedStorage(str(tmp_path / "uploads.jsonl"), log), archivers=[TimedArchiver(log)], **orchestrator_config)
+    orchestrator.feeder = SlowFeeder(urls, db)
+    results = list(orchestrator.feed())
+    return results, log, orchestrator.feeder.in_flight
+
+
+def test_uploads_overlap_with_the_next_download(tmp_path, monkeypatch):
+    urls = [f"https://example.com/{c}?media=1" for c in "abc"]
+    results, log, _ = archive_timed(tmp_path, monkeypatch, urls, upload_workers=1)
+    assert [r.get_url() for r in results] == urls
+    when = {(event, url): t for event, url, t in log}
+    # a single download worker, the next item is downloaded while the previous one is uploaded
+    for previous, url in zip(urls, urls[1:]):
+        assert when[("download", url)] < when[("uploaded", previous)]
+    # and the temporary folders are gone once the items are delivered
+    assert not [f for f in os.listdir(tmp_path) if f.startswith("tmp")]
+
+
+def test_feeding_waits_while_tmp_disk_is_exceeded(tmp_path, monkeypatch):
+    # each item holds 2MB in its temporary folder while it is downloaded
+    urls = [f"https://example.com/{c}?media=1&size=2&delay=0.5" for c in "abcde"]
+    results, _, in_flight = archive_timed(tmp_path / "unlimited", monkeypatch, urls, workers=4)
+    assert len(results) == len(urls) and max(in_flight) >= 3
+    results, _, in_flight = archive_timed(tmp_path / "limited", monkeypatch, urls, workers=4, max_tmp_disk_mb=1)
+    assert len(results) == len(urls) and max(in_flight) <= 1
@@ -0,0 +1,110 @@
+import os
+
+import ffmpeg
+import pytest
+
+from auto_archiver.core import Probe, ProbeCache
+from auto_archiver.core import probe as probe_module
+
+PROBE = {
+    "streams": [
+        {"codec_type": "audio", "codec_name": "aac", "duration": "9.9"},
+        {"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720, "duration": "10.0", "duration_ts": 300},
+    ],
+    "format": {"duration": "10.05"},
+}
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """ffprobe results by filename, the probed filenames are recorded in probes["calls"]"""
+    probes = {"calls": []}
+
+    def fake_probe(filename):
+        probes["calls"].append(filename)
+        result = probes.get(os.path.basename(filename), PROBE)
+        if isinstance(result, Exception): raise result
+        return result
+    monkeypatch.setattr(probe_module.ffmpeg, "probe", fake_probe)
+    ProbeCache.clear()
+    yield probes
+    ProbeCache.clear()
+
+
+@pytest.fixture
+def video(tmp_path):
+    filename = str(tmp_path / "video.mp4")
+    with open(filename, "wb") as f: f.write(b"video")
+    return filename
+
+
+def test_probe_properties(probes, video):
+    probe = ProbeCache.get(video)
+    assert probe.error is None
+    assert (probe.duration, probe.video_duration) == (10.05, 10.0)
+    assert (probe.video_codec, probe.audio_codec, probe.width, probe.height) == ("h264", "aac", 1280, 720)
+    assert probe.has_video_frames()
+
+
+def test_missing_values():
+    probe = Probe(streams=[{"codec_type": "video", "duration": "N/A"}])
+    assert probe.duration is None and probe.video_duration is None and probe.audio_codec is None
+    assert not probe.has_video_frames()
+
+
+def test_files_are_probed_once(probes, video, tmp_path):
+    other = str(tmp_path / "other.mp4")
+    with open(other, "wb") as f: f.write(b"other")
+    ProbeCache.get(video)
+    probes_ = ProbeCache.get_many([video, other, other])
+    assert probes["calls"] == [video, other]
+    assert probes_[1] is probes_[2]
+
+
+def test_modified_files_are_probed_again(probes, video):
+    ProbeCache.get(video)
+    with open(video, "ab") as f: f.write(b"more")
+    ProbeCache.get(video)
+    assert probes["calls"] == [video, video]
+
+
+def test_get_many_uses_the_mapper(probes, video, tmp_path):
+    mapped = []
+
+    def mapper(fn, filenames):
+        mapped.append(list(filenames))
+        return map(fn, filenames)
+    ProbeCache.get_many([video], mapper=mapper)
+    ProbeCache.get_many([video], mapper=mapper)
+    assert mapped == [[video], []]
+
+
+def test_failures_are_cached(probes, video):
+    probes["video.mp4"] = ffmpeg.Error("ffprobe", b"", b"moov atom not found")
+    probe = ProbeCache.get(video)
+    assert probe.unreadable and probe.error == "moov atom not found" and probe.streams == []
+    assert ProbeCache.get(video) is probe
+    assert probes["calls"] == [video]
+
+
+def test_ffprobe_failing_to_run_is_not_unreadable(probes, video):
+    probes["video.mp4"] = FileNotFoundError("ffprobe not found")
+    probe = ProbeCache.get(video)
+    assert not probe.unreadable and "ffprobe not found" in probe.error
+
+
+def test_missing_file(probes, tmp_path):
+    probe = ProbeCache.get(str(tmp_path / "missing.mp4"))
+    assert probe.error and probes["calls"] == []
+
+
+def test_cache_is_bounded(probes, tmp_path, monkeypatch):
+    monkeypatch.setattr(ProbeCache, "MAX_ENTRIES", 2)
+    filenames = []
+    for i in range(3):
+        filenames.append(str(tmp_path / f"{i}.mp4"))
+        with open(filenames[-1], "wb") as f: f.write(b"video")
+        ProbeCache.get(filenames[-1])
+    assert len(ProbeCache._probes) == 2
+    ProbeCache.get(filenames[0])
+    assert probes["calls"] == filenames + filenames[:1]
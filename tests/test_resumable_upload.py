@@ -0,0 +1,134 @@
+import json, os, shutil
+from types import SimpleNamespace
+
+import httplib2
+import pytest
+
+from auto_archiver.core import DigestCache
+from auto_archiver.storages import gd
+from auto_archiver.storages.gd import GDriveStorage
+from auto_archiver.utils.resumable_upload import UploadSessions
+
+
+@pytest.fixture
+def sample(tmp_path):
+    filename = str(tmp_path / "a" / "video.mp4")
+    os.makedirs(os.path.dirname(filename))
+    with open(filename, "wb") as f: f.write(os.urandom(1000))
+    return filename
+
+
+def test_session_key_follows_the_content_not_the_path(sample, tmp_path):
+    # the next run downloads the same file to another temporary folder
+    sessions = UploadSessions(str(tmp_path / "sessions.json"))
+    copy = str(tmp_path / "b.mp4")
+    shutil.copy(sample, copy)
+    os.utime(copy, (1, 1))
+    assert sessions.key("drive|folder/1_x.mp4", sample) == sessions.key("drive|folder/1_x.mp4", copy)
+    assert sessions.key("drive|folder/1_x.mp4", sample) != sessions.key("drive|folder/2_x.mp4", sample)
+    with open(copy, "ab") as f: f.write(b"changed")
+    DigestCache.clear()
+    assert sessions.key("drive|folder/1_x.mp4", sample) != sessions.key("drive|folder/1_x.mp4", copy)
+
+
+def test_sessions_not_kept_do_not_hash_the_file(sample, monkeypatch):
+    from auto_archiver.utils import resumable_upload
+    monkeypatch.setattr(resumable_upload.DigestCache, "get", lambda *args: pytest.fail("the file was hashed"))
+    assert UploadSessions().key("drive|folder/1_x.mp4", sample) == "drive|folder/1_x.mp4|1000"
+
+
+def test_sessions_are_kept_in_the_file(tmp_path):
+    filename = str(tmp_path / "sessions.json")
+    sessions = UploadSessions(filename)
+    sessions.set("a", "https://upload/a")
+    sessions.set("b", "https://upload/b")
+    sessions.remove("b")
+    assert UploadSessions(filename).get("a") == "https://upload/a"
+    assert UploadSessions(filename).get("b") is None
+
+    with open(filename) as f: stored = json.load(f)
+    stored["a"]["created"] -= UploadSessions.MAX_AGE + 1
+    with open(filename, "w") as f: json.dump(stored, f)
+    assert UploadSessions(filename).get("a") is None
+
+
+class FakeRequest:
+    """
+    a googleapiclient resumable HttpRequest: each next_chunk returns or raises the next of @chunks,
+    the session URI comes with the first chunk, @http_responses answer the status queries of a stored session
+    """
+
+    def __init__(self, chunks: list, http_responses: list = None) -> None:
+        self.chunks = list(chunks)
+        self.http_responses = list(http_responses or [])
+        self.resumable_uri = None
+        self.resumable_progress = 0
+        self.queries = []
+        self.http = SimpleNamespace(request=self.query)
+
+    def query(self, uri, method, headers):
+        self.queries.append((uri, headers["Content-Range"]))
+        return self.http_responses.pop(0)
+
+    def next_chunk(self):
+        outcome = self.chunks.pop(0)
+        if isinstance(outcome, Exception): raise outcome
+        self.resumable_uri = self.resumable_uri or "https://upload/new"
+        return outcome
+
+
+def progress(n):
+    return (SimpleNamespace(resumable_progress=n), None)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(gd, "backoff_delay", lambda attempt: 0)
+    storage = object.__new__(GDriveStorage)
+    storage.upload_chunk_size = 256 * 1024
+    storage.upload_sessions = UploadSessions()
+    return storage
+
+
+def upload(storage, sample, request):
+    storage.get_service = lambda: SimpleNamespace(files=lambda: SimpleNamespace(create=lambda **kwargs: request))
+    return storage._resumable_create({"name": ["1_x.mp4"]}, sample, "gdrive_storage|folder/1_x.mp4")
+
+
+def test_network_errors_resume_the_upload(storage, sample):
+    request = FakeRequest([progress(500), ConnectionResetError("reset"), httplib2.ServerNotFoundError("dns"), (None, {"id": "file"})])
+    assert upload(storage, sample, request) == {"id": "file"}
+    assert request.chunks == []
+    # done uploads forget their session
+    assert storage.upload_sessions.sessions == {}
+
+
+def test_network_errors_give_up_eventually(storage, sample):
+    request = FakeRequest([ConnectionResetError("reset")] * 3)
+    storage.get_service = lambda: SimpleNamespace(files=lambda: SimpleNamespace(create=lambda **kwargs: request))
+    with pytest.raises(ConnectionResetError):
+        storage._resumable_create({"name": ["1_x.mp4"]}, sample, "gdrive_storage|folder/1_x.mp4", max_attempts=3)
+    assert request.chunks == []
+
+
+def test_session_of_a_previous_run_is_resumed(storage, sample):
+    session_key = storage.upload_sessions.key("gdrive_storage|folder/1_x.mp4", sample)
+    storage.upload_sessions.set(session_key, "https://upload/old")
+    request = FakeRequest([(None, {"id": "file"})], [(httplib2.Response({"status": 308, "range": "bytes=0-599"}), b"")])
+    assert upload(storage, sample, request) == {"id": "file"}
+    assert request.queries == [("https://upload/old", "bytes */1000")]
+    assert request.resumable_uri == "https://upload/old" and request.resumable_progress == 600
+
+
+def test_finished_session_of_a_previous_run(storage, sample):
+    storage.upload_sessions.set(storage.upload_sessions.key("gdrive_storage|folder/1_x.mp4", sample), "https://upload/old")
+    request = FakeRequest([], [(httplib2.Response({"status": 200}), b'{"id": "file"}')])
+    assert upload(storage, sample, request) == {"id": "file"}
+    assert storage.upload_sessions.sessions == {}
+
+
+def test_expired_session_starts_over(storage, sample):
+    storage.upload_sessions.set(storage.upload_sessions.key("gdrive_storage|folder/1_x.mp4", sample), "https://upload/old")
+    request = FakeRequest([progress(500), (None, {"id": "file"})], [(httplib2.Response({"status": 404}), b"")])
+    assert upload(storage, sample, request) == {"id": "file"}
+    assert request.resumable_uri == "https://upload/new" and request.resumable_progress == 0
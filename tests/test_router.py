@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from auto_archiver.archivers import Archiver
+from auto_archiver.archivers.router import ArchiverRouter
+
+
+def archiver(name: str, domains=(), url_patterns=(), suitable=None) -> Archiver:
+    cls = type(f"Router{name.title()}Archiver", (Archiver,), {
+        "name": name, "domains": list(domains), "url_patterns": list(url_patterns), "download": lambda self, item: False,
+    })
+    if suitable: cls.suitable = lambda self, url: suitable(url)
+    return cls({})
+
+
+@pytest.fixture
+def archivers():
+    return [
+        archiver("telegram", domains=["t.me", "telegram.me"]),
+        archiver("instagram", domains=["instagram.com"]),
+        archiver("twitter", domains=["twitter.com", "x.com"], url_patterns=[r"https?://(?:fx|vx)twitter\.com/\w+/status/\d+"]),
+        archiver("vk", url_patterns=[re.compile(r"vk\.com/wall-?\d+")]),
+        archiver("youtubedl"),
+        archiver("tiktok", domains=["tiktok.com"], suitable=lambda url: "/video/" in url),
+    ]
+
+
+def names(archivers) -> list:
+    return [a.name for a in archivers]
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://t.me/channel/1", ["telegram", "youtubedl"]),
+    ("t.me/channel/1", ["telegram", "youtubedl"]),
+    ("https://www.instagram.com/p/abc/", ["instagram", "youtubedl"]),
+    ("https://INSTAGRAM.com/p/abc/", ["instagram", "youtubedl"]),
+    ("https://x.com/user/status/1", ["twitter", "youtubedl"]),
+    ("https://fxtwitter.com/user/status/1", ["twitter", "youtubedl"]),
+    ("https://vk.com/wall-1_2", ["vk", "youtubedl"]),
+    ("https://vk.com/video1", ["youtubedl"]),
+    ("https://example.com/t.me/channel", ["youtubedl"]),
+    ("https://www.tiktok.com/@user/video/1", ["youtubedl", "tiktok"]),
+    ("https://www.tiktok.com/@user", ["youtubedl"]),
+    ("not a url", ["youtubedl"]),
+])
+def test_route(archivers, url, expected):
+    assert names(ArchiverRouter(archivers).route(url)) == expected
+
+
+def test_domains_do_not_match_other_hostnames(archivers):
+    router = ArchiverRouter(archivers)
+    # a domain matches itself and its subdomains, not hostnames that merely end with it
+    assert names(router.route("https://notinstagram.com/p/abc/")) == ["youtubedl"]
+    assert names(router.route("https://instagram.com.evil.net/p/abc/")) == ["youtubedl"]
+    assert names(router.route("https://cdn.t.me/file")) == ["telegram", "youtubedl"]
+
+
+def test_configured_order_is_kept(archivers):
+    reordered = [archivers[4], archivers[2], archivers[0]]
+    assert names(ArchiverRouter(reordered).route("https://twitter.com/user/status/1")) == ["youtubedl", "twitter"]
+
+
+def test_same_domain_in_many_archivers(archivers):
+    router = ArchiverRouter([archiver("telegram_api", domains=["t.me"]), *archivers])
+    assert names(router.route("https://t.me/c/1/2")) == ["telegram_api", "telegram", "youtubedl"]
+
+
+def test_hostname():
+    assert ArchiverRouter.hostname("https://User:pw@WWW.Example.com:8080/a") == "www.example.com"
+    assert ArchiverRouter.hostname("example.com/path") == "example.com"
+    assert ArchiverRouter.hostname("http://[::1") == ""
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from auto_archiver.core import ArchivingContext, ItemContext, Media, Metadata
+from auto_archiver.databases import SQLiteDb
+from auto_archiver.storages import Storage
+
+
+class CountingStorage(Storage):
+    name = "counting_storage"
+
+    def __init__(self, name: str) -> None:
+        super().__init__({self.name: {k: v["default"] for k, v in Storage.configs().items()}})
+        self.name = name
+        self.uploads = []
+
+    def get_cdn_url(self, media: Media) -> str: return f"{self.name}://{media.key}"
+
+    def uploadf(self, file, key, **kwargs) -> bool:
+        self.uploads.append(key)
+        return True
+
+
+@pytest.fixture
+def storages():
+    storages = [CountingStorage("first"), CountingStorage("second")]
+    ArchivingContext.set("storages", storages, keep_on_reset=True)
+    for kind in ["thumbnail_storages", "html_metadata_storages", "screenshot_storages"]: ArchivingContext.set(kind, [], keep_on_reset=True)
+    return storages
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteDb({"sqlite_db": {**{k: v["default"] for k, v in SQLiteDb.configs().items()}, "db_file": str(tmp_path / "index.sqlite")}})
+
+
+def store(tmp_path, name: str, content: str) -> Media:
+    with ItemContext().activate() as context:
+        context.tmp_dir = str(tmp_path)
+        filename = os.path.join(str(tmp_path), name)
+        with open(filename, "w") as f: f.write(content)
+        media = Media(filename)
+        media.store(url=f"https://example.com/{name}", metadata=Metadata().set_url(f"https://example.com/{name}"))
+    return media
+
+
+def test_stored_media_are_reused(tmp_path, db, storages):
+    first = store(tmp_path, "a.txt", "same")
+    again = store(tmp_path, "b.txt", "same")
+    other = store(tmp_path, "c.txt", "different")
+    assert [len(s.uploads) for s in storages] == [2, 2]
+    assert again.urls == first.urls and again.get("previously archived")
+    assert other.urls != first.urls and not other.get("previously archived")
+
+
+def test_reused_media_have_a_key(tmp_path, db, storages):
+    store(tmp_path, "a.txt", "same")
+    # every storage has it, databases like gsheet_db still read the key
+    again = store(tmp_path, "b.txt", "same")
+    assert [len(s.uploads) for s in storages] == [1, 1]
+    assert again.key is not None and os.path.splitext(again.key)[1] == ".txt"
+
+
+def test_archived_urls_are_fetched_normalized(tmp_path, db):
+    item = Metadata().set_url("https://example.com/post?utm_source=x").success("test")
+    db.done(item)
+    assert db.fetch(Metadata().set_url("https://example.com/post")).status == "test: success"
+    assert not db.fetch(Metadata().set_url("https://example.com/other"))
+    # failures are not indexed
+    db.done(Metadata().set_url("https://example.com/failed"))
+    assert not db.fetch(Metadata().set_url("https://example.com/failed"))
@@ -0,0 +1,58 @@
+import os, shutil, subprocess
+
+import pytest
+
+from auto_archiver.enrichers import ThumbnailEnricher
+from auto_archiver.enrichers.thumbnail_enricher import generate_thumbnail, generate_thumbnails_in_one_pass
+
+
+def enricher(**config) -> ThumbnailEnricher:
+    defaults = {k: v["default"] for k, v in ThumbnailEnricher.configs().items()}
+    return ThumbnailEnricher({"thumbnail_enricher": {**defaults, **config}})
+
+
+@pytest.mark.parametrize("duration, config, expected", [
+    (120, {}, 16),
+    (10, {}, 10),
+    (0.5, {}, 1),
+    (0, {}, 1),
+    (120, {"max_thumbnails": 4}, 4),
+    (600, {"max_thumbnails": 0}, 600),
+    (600, {"max_thumbnails": 0, "thumbnails_per_minute": 6}, 60),
+    (5, {"thumbnails_per_minute": 0}, 1),
+])
+def test_number_of_thumbnails(duration, config, expected):
+    assert len(enricher(**config).get_timestamps(duration)) == expected
+
+
+def test_timestamps_are_evenly_spaced():
+    assert enricher(max_thumbnails=3).get_timestamps(120) == [30, 60, 90]
+
+
+def test_invalid_mode():
+    with pytest.raises(AssertionError):
+        enricher(mode="fast")
+
+
+def test_one_pass_without_timestamps(tmp_path):
+    assert generate_thumbnails_in_one_pass(str(tmp_path / "missing.mp4"), [], str(tmp_path)) == []
+
+
+@pytest.fixture
+def video(tmp_path):
+    if not shutil.which("ffmpeg"): pytest.skip("ffmpeg is not installed")
+    filename = str(tmp_path / "video.mp4")
+    subprocess.run(["ffmpeg", "-loglevel", "quiet", "-f", "lavfi", "-i", "testsrc=duration=6:size=320x240:rate=10", "-g", "10", filename], check=True)
+    return filename
+
+
+@pytest.mark.parametrize("keyframes_only", [False, True])
+def test_one_pass_writes_every_thumbnail(video, tmp_path, keyframes_only):
+    timestamps = enricher(max_thumbnails=5).get_timestamps(6)
+    assert generate_thumbnails_in_one_pass(video, timestamps, str(tmp_path), keyframes_only) == [True] * 5
+    assert sorted(f for f in os.listdir(tmp_path) if f.endswith(".jpg")) == [f"out{i}.jpg" for i in range(5)]
+
+
+def test_seek(video, tmp_path):
+    assert generate_thumbnail(video, 3, str(tmp_path / "out0.jpg"))
+    assert not generate_thumbnail(str(tmp_path / "missing.mp4"), 3, str(tmp_path / "out1.jpg"))
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from auto_archiver.utils import Translator
+from auto_archiver.utils import translator as translator_module
+
+
+class FakeClient:
+    """translates to upper case, detecting Spanish, and records the texts of each request"""
+
+    def __init__(self) -> None:
+        self.requests = []
+
+    def translate(self, texts, target_language):
+        self.requests.append(list(texts))
+        return [{"detectedSourceLanguage": "es", "translatedText": text.upper()} for text in texts]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(translator_module.translate.Client, "from_service_account_json", staticmethod(lambda service_account: client))
+    return client
+
+
+@pytest.mark.parametrize("text", [
+    "no a la guerra en Ucrania",
+    "siamo in guerra a Kiev oggi",
+    "ataque a Kharkiv no centro da cidade",
+    "the war in Ukraine",
+    "#війна",
+])
+def test_text_with_words_needs_translation(client, text):
+    assert Translator("sa.json").needs_translation(text)
+
+
+@pytest.mark.parametrize("text", ["", "   ", None, "https://t.me/channel/123 @someone", "12:30 25/02/2022 !!"])
+def test_text_without_words_does_not(client, text):
+    assert not Translator("sa.json").needs_translation(text)
+
+
+def test_romance_text_is_sent_to_the_api(client):
+    texts = ["no a la guerra en Ucrania", "siamo in guerra a Kiev oggi", "ataque a Kharkiv no centro da cidade"]
+    assert Translator("sa.json").translate_many(texts) == [("es", text.upper()) for text in texts]
+    assert client.requests == [texts]
+
+
+def test_translate_many_deduplicates_skips_and_caches(client):
+    translator = Translator("sa.json")
+    assert translator.translate_many(["hola", "", "hola", "https://x.com"]) == [("es", "HOLA"), ("en", ""), ("es", "HOLA"), ("en", "https://x.com")]
+    assert translator.translate("hola") == ("es", "HOLA")
+    assert client.requests == [["hola"]]
+
+
+def test_sqlite_cache_survives_instances(client, tmp_path):
+    cache_file = str(tmp_path / "translations.sqlite")
+    Translator("sa.json", cache_file=cache_file).translate_many(["hola", "adiós"])
+    assert Translator("sa.json", cache_file=cache_file).translate_many(["adiós", "hola"]) == [("es", "ADIÓS"), ("es", "HOLA")]
+    assert client.requests == [["hola", "adiós"]]
+
+
+def test_batches_respect_the_request_limits(client, monkeypatch):
+    monkeypatch.setattr(Translator, "MAX_BATCH_SIZE", 3)
+    texts = [f"texto {i}" for i in range(7)]
+    assert [translated for _, translated in Translator("sa.json").translate_many(texts)] == [text.upper() for text in texts]
+    assert [len(r) for r in client.requests] == [3, 3, 1]
+
+
+def test_translate_later_shares_requests_across_items(client):
+    translator = Translator("sa.json", flush_interval=60)
+    results = {}
+    for i in range(3):
+        translator.translate_later([f"título {i}", f"texto {i}"], lambda translations, i=i: results.__setitem__(i, translations))
+    assert results == {} and client.requests == []
+    translator.flush()
+    assert client.requests == [["título 0", "texto 0", "título 1", "texto 1", "título 2", "texto 2"]]
+    assert results == {i: [("es", f"TÍTULO {i}"), ("es", f"TEXTO {i}")] for i in range(3)}
+
+
+def test_translate_later_without_api_calls_back_right_away(client):
+    translator = Translator("sa.json", flush_interval=60)
+    translator.translate("hola")
+    results = []
+    translator.translate_later(["hola", ""], results.append)
+    assert results == [[("es", "HOLA"), ("en", "")]]
+    assert translator._timer is None
+
+
+def test_translate_later_flushes_when_full_or_on_timer(client, monkeypatch):
+    monkeypatch.setattr(Translator, "MAX_BATCH_SIZE", 4)
+    translator = Translator("sa.json", flush_interval=60)
+    results = []
+    translator.translate_later(["uno", "dos"], results.append)
+    translator.translate_later(["tres", "cuatro"], results.append)
+    assert len(results) == 2 and client.requests == [["uno", "dos", "tres", "cuatro"]]
+
+    translator.flush_interval = 0.01
+    translator.translate_later(["cinco"], results.append)
+    deadline = time.monotonic() + 5
+    while len(results) < 3 and time.monotonic() < deadline: time.sleep(0.01)
+    assert results[-1] == [("es", "CINCO")]
+
+
+def test_callback_errors_do_not_lose_other_items(client):
+    translator = Translator("sa.json", flush_interval=60)
+    results = []
+    translator.translate_later(["uno"], lambda translations: 1 / 0)
+    translator.translate_later(["dos"], results.append)
+    translator.flush()
+    assert results == [[("es", "DOS")]]
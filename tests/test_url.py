@@ -0,0 +1,34 @@
+import pytest
+
+from auto_archiver.utils import UrlUtil
+
+
+@pytest.mark.parametrize("url, normalized", [
+    ("https://WWW.Example.com/post/?utm_source=x&b=2&a=1#top", "https://example.com/post?a=1&b=2"),
+    ("http://example.com", "https://example.com/"),
+    ("  https://m.facebook.com/story.php?story_fbid=1&id=2&fbclid=abc  ", "https://facebook.com/story.php?id=2&story_fbid=1"),
+    ("https://mobile.twitter.com/user/status/1?s=20", "https://twitter.com/user/status/1?s=20"),
+    ("https://youtu.be/abc?si=tracking&t=10", "https://youtu.be/abc?t=10"),
+    ("https://www.instagram.com/p/xyz/?igsh=1&img_index=2", "https://instagram.com/p/xyz?img_index=2"),
+    ("https://example.com/search?q=", "https://example.com/search?q="),
+    # only leading prefixes are removed
+    ("https://team.example.com/www.page", "https://team.example.com/www.page"),
+])
+def test_normalize(url, normalized):
+    assert UrlUtil.normalize(url) == normalized
+
+
+def test_normalize_recognises_the_same_link():
+    assert UrlUtil.normalize("https://www.youtube.com/watch?v=1&feature=share") == UrlUtil.normalize("http://youtube.com/watch/?v=1")
+    assert UrlUtil.normalize("https://youtube.com/watch?v=1") != UrlUtil.normalize("https://youtube.com/watch?v=2")
+    assert UrlUtil.normalize("https://example.com/a") != UrlUtil.normalize("https://example.com/A")
+
+
+@pytest.mark.parametrize("text, prefix, expected", [
+    ("www.example.com", "www.", "example.com"),
+    ("example.com", "www.", "example.com"),
+    ("m.m.example.com", "m.", "m.example.com"),
+    ("example.com", "", "example.com"),
+])
+def test_remove_prefix(text, prefix, expected):
+    assert UrlUtil.remove_prefix(text, prefix) == expected
@@ -0,0 +1,80 @@
+import io, os
+from zipfile import ZipFile
+
+import pytest
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+from auto_archiver.core import ItemContext, Metadata
+from auto_archiver.enrichers import WaczArchiverEnricher
+
+
+def warc(records: list) -> bytes:
+    """gzipped WARC with (type, url, content type, body) records, responses get HTTP headers"""
+    out = io.BytesIO()
+    writer = WARCWriter(out, gzip=True)
+    for rec_type, url, content_type, body in records:
+        if rec_type == "response":
+            http_headers = StatusAndHeaders("200 OK", [("Content-Type", content_type)], protocol="HTTP/1.1")
+            record = writer.create_warc_record(url, rec_type, payload=io.BytesIO(body), http_headers=http_headers)
+        else:
+            record = writer.create_warc_record(url, rec_type, payload=io.BytesIO(body), warc_content_type=content_type)
+        writer.write_record(record)
+    return out.getvalue()
+
+
+@pytest.fixture
+def wacz(tmp_path):
+    # browsertrix splits big crawls into numbered WARCs, the zip order is not the crawl order
+    filename = str(tmp_path / "crawl.wacz")
+    with ZipFile(filename, "w") as z:
+        z.writestr("archive/data-1.warc.gz", warc([
+            ("response", "https://example.com/b.jpg", "image/jpeg", b"jpeg-b"),
+            ("response", "https://example.com/a.jpg", "image/jpeg", b"jpeg-a again"),
+            ("response", "https://example.com/favicon.png", "image/png", b"icon"),
+        ]))
+        z.writestr("archive/data-0.warc.gz", warc([
+            ("response", "https://example.com/", "text/html", b"<html></html>"),
+            ("response", "https://example.com/a.jpg", "image/jpeg", b"jpeg-a"),
+            ("resource", "urn:view:https://example.com/", "image/png", b"png-screenshot"),
+        ]))
+        z.writestr("pages/pages.jsonl", "{}")
+        z.writestr("archive/notes.txt", "not a warc")
+    return filename
+
+
+def test_iter_wacz_records_streams_every_warc_in_order(wacz):
+    records = [(r.rec_type, r.rec_headers.get_header("WARC-Target-URI"), r.content_stream().read()) for r in WaczArchiverEnricher.iter_wacz_records(wacz)]
+    assert records == [
+        ("response", "https://example.com/", b"<html></html>"),
+        ("response", "https://example.com/a.jpg", b"jpeg-a"),
+        ("resource", "urn:view:https://example.com/", b"png-screenshot"),
+        ("response", "https://example.com/b.jpg", b"jpeg-b"),
+        ("response", "https://example.com/a.jpg", b"jpeg-a again"),
+        ("response", "https://example.com/favicon.png", b"icon"),
+    ]
+
+
+def test_iter_wacz_records_without_warcs(tmp_path):
+    filename = str(tmp_path / "empty.wacz")
+    with ZipFile(filename, "w") as z: z.writestr("pages/pages.jsonl", "{}")
+    assert list(WaczArchiverEnricher.iter_wacz_records(filename)) == []
+
+
+@pytest.mark.parametrize("extract_media, extract_screenshot, expected", [
+    (True, True, [("warc-file-0.jpg", b"jpeg-a"), ("warc-file-1.png", b"png-screenshot"), ("warc-file-2.jpg", b"jpeg-b")]),
+    (True, False, [("warc-file-0.jpg", b"jpeg-a"), ("warc-file-1.jpg", b"jpeg-b")]),
+    (False, True, [("warc-file-0.png", b"png-screenshot")]),
+])
+def test_extract_media_from_wacz(wacz, tmp_path, extract_media, extract_screenshot, expected):
+    enricher = object.__new__(WaczArchiverEnricher)
+    enricher.extract_media, enricher.extract_screenshot = extract_media, extract_screenshot
+    result = Metadata().set_url("https://example.com/")
+    tmp_dir = tmp_path / "item"
+    tmp_dir.mkdir()
+    with ItemContext({"tmp_dir": str(tmp_dir)}).activate():
+        enricher.extract_media_from_wacz(result, wacz)
+    extracted = []
+    for m in result.media:
+        with open(m.filename, "rb") as f: extracted.append((os.path.basename(m.filename), f.read()))
+    assert extracted == expected
@@ -0,0 +1,140 @@
+import json, os, sys, threading, time
+
+import pytest
+
+from auto_archiver.core import ItemContext, Metadata
+from auto_archiver.enrichers import WaczArchiverEnricher
+from auto_archiver.enrichers.wacz_enricher import BrowsertrixPool, BrowsertrixPoolError
+
+STUB = os.path.join(os.path.dirname(__file__), "stub_docker.py")
+
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch):
+    """puts tests/stub_docker.py first in PATH as `docker`, returns its state folder"""
+    state, bin_dir = tmp_path / "docker", tmp_path / "bin"
+    state.mkdir()
+    bin_dir.mkdir()
+    (bin_dir / "docker").write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUB}" "$@"\n')
+    (bin_dir / "docker").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("STUB_DOCKER_DIR", str(state))
+    for var in ["WACZ_ENABLE_DOCKER", "RUNNING_IN_DOCKER", "BROWSERTRIX_HOME_HOST", "BROWSERTRIX_HOME_CONTAINER"]: monkeypatch.delenv(var, raising=False)
+    return state
+
+
+def docker_log(state) -> list:
+    if not (state / "log").exists(): return []
+    return [line.split()[0] for line in (state / "log").read_text().splitlines()]
+
+
+def containers(state) -> list:
+    return os.listdir(state / "containers") if (state / "containers").exists() else []
+
+
+@pytest.fixture
+def enricher(docker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {k: v["default"] for k, v in WaczArchiverEnricher.configs().items()}
+    enricher = WaczArchiverEnricher({"wacz_archiver_enricher": {**config, "warm_pool_size": 2, "extract_screenshot": False}})
+    enricher.setup()
+    yield enricher
+    enricher.cleanup()
+
+
+def enrich(enricher, tmp_path, url: str) -> Metadata:
+    item = Metadata().set_url(url)
+    tmp_dir = tmp_path / f"item_{len(os.listdir(tmp_path))}"
+    tmp_dir.mkdir()
+    with ItemContext({"tmp_dir": str(tmp_dir)}).activate():
+        item.set("enriched", enricher.enrich(item))
+    return item
+
+
+def test_crawls_reuse_the_warm_containers(enricher, docker, tmp_path):
+    for i in range(3):
+        item = enrich(enricher, tmp_path, f"https://example.com/{i}")
+        assert item.get("enriched") and item.get_title() == f"crawl of https://example.com/{i}"
+        # the crawl was moved out of the shared home into the item's tmp_dir
+        assert item.get_media_by_id("browsertrix").filename.startswith(str(tmp_path / "item_"))
+    assert docker_log(docker) == ["start", "exec", "exec", "exec"]
+    assert os.listdir(enricher.warm_pool_home) == []
+
+
+def test_failed_crawls_are_removed_from_the_shared_home(enricher, docker, tmp_path):
+    assert not enrich(enricher, tmp_path, "https://example.com/fail").get("enriched")
+    assert os.listdir(enricher.warm_pool_home) == []
+    # the container still works and is reused
+    assert enrich(enricher, tmp_path, "https://example.com/ok").get("enriched")
+    assert docker_log(docker) == ["start", "exec", "exec"]
+
+
+def test_stopped_container_falls_back_to_docker_run(enricher, docker, tmp_path):
+    enrich(enricher, tmp_path, "https://example.com/1")
+    container, = containers(docker)
+    with open(docker / "containers" / container) as f: state = json.load(f)
+    with open(docker / "containers" / container, "w") as f: json.dump({**state, "dead": True}, f)
+
+    item = enrich(enricher, tmp_path, "https://example.com/2")
+    assert item.get("enriched") and item.get_title() == "crawl of https://example.com/2"
+    assert docker_log(docker) == ["start", "exec", "rm", "run"]
+    assert enricher.warm_pool.started == 0 and os.listdir(enricher.warm_pool_home) == []
+    # the next crawl starts a new container
+    assert enrich(enricher, tmp_path, "https://example.com/3").get("enriched")
+    assert docker_log(docker)[-2:] == ["start", "exec"]
+
+
+def test_cleanup_removes_the_containers_and_home(docker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {k: v["default"] for k, v in WaczArchiverEnricher.configs().items()}
+    enricher = WaczArchiverEnricher({"wacz_archiver_enricher": {**config, "warm_pool_size": 2}})
+    enricher.setup()
+    pool = BrowsertrixPool(2, enricher.warm_pool_home, enricher.warm_pool_home, enricher.warm_pool_label)
+    pool.acquire(), pool.acquire()
+    # containers of other runs are left alone
+    BrowsertrixPool(1, str(tmp_path), str(tmp_path), "other").acquire()
+    assert len(containers(docker)) == 3
+    enricher.cleanup()
+    assert len(containers(docker)) == 1
+    assert not os.path.exists(enricher.warm_pool_home)
+
+
+def test_discard_lets_a_waiter_start_a_container(docker, tmp_path):
+    pool = BrowsertrixPool(1, str(tmp_path), str(tmp_path), "test", acquire_timeout=30)
+    first = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.2)
+    assert acquired == []
+    pool.discard(first)
+    waiter.join(30)
+    assert len(acquired) == 1 and acquired[0] != first
+    assert pool.started == 1
+
+
+def test_release_hands_the_container_to_a_waiter(docker, tmp_path):
+    pool = BrowsertrixPool(1, str(tmp_path), str(tmp_path), "test", acquire_timeout=30)
+    first = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.2)
+    pool.release(first)
+    waiter.join(30)
+    assert acquired == [first] and docker_log(docker) == ["start"]
+
+
+def test_acquire_times_out(docker, tmp_path):
+    pool = BrowsertrixPool(1, str(tmp_path), str(tmp_path), "test", acquire_timeout=0.2)
+    pool.acquire()
+    with pytest.raises(BrowsertrixPoolError):
+        pool.acquire()
+
+
+def test_failed_start_frees_the_slot(docker, tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path / "nowhere"))
+    pool = BrowsertrixPool(1, str(tmp_path), str(tmp_path), "test", acquire_timeout=0.2)
+    with pytest.raises(BrowsertrixPoolError):
+        pool.acquire()
+    assert pool.started == 0
@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from auto_archiver.utils import webdriver as webdriver_module
+from auto_archiver.utils import WebdriverPool, wait_until_ready
+
+
+class FakeFirefox:
+    """stands in for selenium's webdriver.Firefox, records the pages it loads"""
+    opened = []
+
+    def __init__(self, service=None, options=None):
+        self.pages, self.closed, self.crashed = [], False, False
+        FakeFirefox.opened.append(self)
+
+    def set_window_size(self, width, height): pass
+    def set_page_load_timeout(self, timeout): pass
+
+    @property
+    def current_window_handle(self):
+        if self.crashed or self.closed: raise WebDriverException("browser is gone")
+        return "handle"
+
+    def get(self, url):
+        if self.crashed: raise WebDriverException("browser is gone")
+        self.pages.append(url)
+
+    def find_element(self, by, value):
+        raise WebDriverException("no cookie banner")
+
+    def close(self): pass
+    def quit(self): self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_firefox(monkeypatch):
+    FakeFirefox.opened = []
+    monkeypatch.setattr(webdriver_module.webdriver, "Firefox", FakeFirefox)
+    monkeypatch.setattr(webdriver_module, "Service", lambda executable_path: None)
+    return FakeFirefox
+
+
+def visit(pool: WebdriverPool, url: str, facebook: bool = False) -> FakeFirefox:
+    with pool.session(facebook) as driver:
+        driver.get(url)
+    return driver
+
+
+def test_drivers_are_reused():
+    pool = WebdriverPool(1280, 720, 60)
+    first = visit(pool, "https://example.com/1")
+    assert visit(pool, "https://example.com/2") is first
+    assert len(FakeFirefox.opened) == 1
+    # the page is left when the driver goes back to the pool
+    assert first.pages == ["https://example.com/1", "about:blank", "https://example.com/2", "about:blank"]
+    assert not first.closed
+
+
+def test_drivers_are_recycled_after_max_pages():
+    pool = WebdriverPool(1280, 720, 60, max_pages=2)
+    drivers = [visit(pool, f"https://example.com/{i}") for i in range(5)]
+    assert drivers[0] is drivers[1] and drivers[2] is drivers[3] and drivers[1] is not drivers[2]
+    assert drivers[0].closed and drivers[2].closed and not drivers[4].closed
+
+
+def test_crashed_drivers_are_replaced():
+    pool = WebdriverPool(1280, 720, 60)
+    with pytest.raises(WebDriverException):
+        with pool.session() as driver:
+            driver.crashed = True
+            driver.get("https://example.com")
+    assert driver.closed
+    assert visit(pool, "https://example.com") is not driver
+
+    # drivers that died while idle are replaced when taken from the pool
+    idle = visit(pool, "https://example.com")
+    idle.crashed = True
+    assert visit(pool, "https://example.com") is not idle and idle.closed
+
+
+def test_timeouts_keep_the_driver():
+    pool = WebdriverPool(1280, 720, 60)
+    with pytest.raises(TimeoutException):
+        with pool.session() as driver:
+            raise TimeoutException("slow page")
+    assert not driver.closed and visit(pool, "https://example.com") is driver
+
+
+def test_facebook_cookies_are_accepted_once_per_driver():
+    pool = WebdriverPool(1280, 720, 60)
+    driver = visit(pool, "https://facebook.com/a", facebook=True)
+    visit(pool, "https://facebook.com/b", facebook=True)
+    visit(pool, "https://example.com")
+    assert driver.pages.count("http://www.facebook.com") == 1
+
+
+def test_busy_pool_opens_extra_drivers_and_closes_them():
+    pool = WebdriverPool(1280, 720, 60, size=1)
+    inside, done = threading.Barrier(3), threading.Event()
+    drivers = []
+
+    def busy():
+        with pool.session() as driver:
+            drivers.append(driver)
+            inside.wait(5)
+            done.wait(5)
+
+    threads = [threading.Thread(target=busy) for _ in range(2)]
+    for t in threads: t.start()
+    inside.wait(5)
+    # the drivers in use are not shared
+    assert len(FakeFirefox.opened) == 2 and drivers[0] is not drivers[1]
+    done.set()
+    for t in threads: t.join(5)
+    # only @size drivers are kept
+    assert [d.closed for d in drivers].count(True) == 1
+    assert pool.idle.qsize() == 1
+
+
+def test_shutdown_closes_every_driver():
+    pool = WebdriverPool(1280, 720, 60, size=2)
+    with pool.session() as busy:
+        visit(pool, "https://example.com")
+        pool.shutdown()
+    assert all(d.closed for d in FakeFirefox.opened) and len(FakeFirefox.opened) == 2
+    assert pool.idle.qsize() == 0
+
+
+class LoadingPage:
+    """answers execute_script with the readyState and finished requests of each poll"""
+    def __init__(self, states): self.states = iter(states)
+    def execute_script(self, script): return next(self.states)
+
+
+def test_wait_until_ready():
+    states = [("loading", 0), ("interactive", 3), ("complete", 5)] + [("complete", 5)] * 100
+    assert wait_until_ready(LoadingPage(states), timeout=5, network_idle=0.2)
+    # a page that keeps requesting is given up on after @timeout
+    busy = (("complete", i) for i in range(1000))
+    assert not wait_until_ready(LoadingPage(busy), timeout=0.5, network_idle=0.2)
@@ -0,0 +1,127 @@
+import copy
+
+import pytest
+import yt_dlp
+
+from auto_archiver.archivers import youtubedl_archiver
+from auto_archiver.archivers.youtubedl_archiver import YoutubeDLArchiver
+from auto_archiver.core import ItemContext, Media, Metadata
+
+URL = "https://www.youtube.com/watch?v=abc"
+
+
+class CountingYoutubeDL:
+    """extracts a video once per extract_info, the processed infos get the keys a download adds, keeps the options of the last YoutubeDL"""
+    calls = []
+    options = None
+
+    def __init__(self, options: dict) -> None:
+        CountingYoutubeDL.options = options
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        CountingYoutubeDL.calls.append(("extract_info", url))
+        return {"id": "abc", "title": "video", "uploader": "someone", "uploader_id": "@someone", "__real_download": False,
+                "formats": [{"format_id": "1", "resolution": "1920x1080", "__working": True}]}
+
+    def process_ie_result(self, info: dict, download: bool = True) -> dict:
+        CountingYoutubeDL.calls.append(("process_ie_result", copy.deepcopy(info)))
+        info["requested_downloads"] = [{"filepath": "abc.mp4"}]
+        info["filepath"] = "abc.mp4"
+        return info
+
+
+@pytest.fixture
+def archiver(monkeypatch, tmp_path):
+    monkeypatch.setattr(yt_dlp, "YoutubeDL", CountingYoutubeDL)
+    CountingYoutubeDL.calls, CountingYoutubeDL.options = [], None
+    config = {k: v["default"] for k, v in YoutubeDLArchiver.configs().items()}
+    archiver = YoutubeDLArchiver({"youtubedl_archiver": {**config, "netscape_cookies": "cookies.txt"}})
+    archiver.get_media = lambda ydl, options, info, entry: Media(str(tmp_path / f"{entry['id']}.mp4"))
+    with ItemContext({"tmp_dir": str(tmp_path)}).activate():
+        yield archiver
+
+
+def test_info_is_extracted_once(archiver):
+    credit = archiver.download(Metadata().set_url(URL), only_credit_string=True)
+    assert credit.get("credit_string") == "someone (@someone) via YouTube"
+    result = archiver.download(Metadata().set_url(URL))
+    assert result.get_title() == "video" and len(result.media) == 1
+    assert [call[0] for call in CountingYoutubeDL.calls] == ["extract_info", "process_ie_result"]
+    # the download processes the extracted info without what yt-dlp keeps for itself
+    processed = CountingYoutubeDL.calls[1][1]
+    assert "__real_download" not in processed and "__working" not in processed["formats"][0]
+
+
+def test_retries_reuse_the_info_of_previous_attempts(archiver):
+    archiver.download(Metadata().set_url(URL))
+    archiver.download(Metadata().set_url(URL))
+    assert [call[0] for call in CountingYoutubeDL.calls] == ["extract_info", "process_ie_result", "process_ie_result"]
+    # what the first download added to its info is not in the second one
+    assert "requested_downloads" not in CountingYoutubeDL.calls[2][1] and "filepath" not in CountingYoutubeDL.calls[2][1]
+
+
+def test_reusable_info_drops_processed_and_internal_keys():
+    info = {"id": "list", "__files_to_move": {}, "requested_entries": [1], "entries": [
+        {"id": "a", "_filename": "a.mp4", "formats": [{"format_id": "1", "__needs_testing": True}]},
+        {"id": "b", "requested_formats": [], "filepath": "b.mp4"},
+    ]}
+    reusable = YoutubeDLArchiver.reusable_info(info)
+    assert reusable == {"id": "list", "entries": [{"id": "a", "formats": [{"format_id": "1"}]}, {"id": "b"}]}
+    # a copy, the original is untouched
+    assert info["entries"][1]["filepath"] == "b.mp4"
+
+
+def test_info_cache_evicts_the_least_recently_used(archiver):
+    archiver.INFO_CACHE_SIZE = 2
+    archiver.cache_info("a", {"id": "a"})
+    archiver.cache_info("b", {"id": "b"})
+    assert archiver.get_cached_info("a") == {"id": "a"}
+    archiver.cache_info("c", {"id": "c"})
+    assert archiver.get_cached_info("b") is None
+    assert archiver.get_cached_info("a") == {"id": "a"} and archiver.get_cached_info("c") == {"id": "c"}
+
+
+def test_cached_info_is_not_changed_by_its_users(archiver):
+    archiver.cache_info("a", {"id": "a", "formats": [{"format_id": "1"}]})
+    archiver.get_cached_info("a")["formats"].append({"format_id": "2"})
+    assert archiver.get_cached_info("a") == {"id": "a", "formats": [{"format_id": "1"}]}
+
+
+def make_archiver(**config) -> YoutubeDLArchiver:
+    return YoutubeDLArchiver({"youtubedl_archiver": {**{k: v["default"] for k, v in YoutubeDLArchiver.configs().items()}, "netscape_cookies": "cookies.txt", **config}})
+
+
+def test_default_download_options():
+    assert make_archiver().download_options() == {"concurrent_fragment_downloads": 4, "http_chunk_size": 10485760}
+
+
+def test_download_options(monkeypatch):
+    monkeypatch.setattr(youtubedl_archiver.shutil, "which", lambda program: f"/usr/bin/{program}")
+    archiver = make_archiver(concurrent_fragment_downloads="8", http_chunk_size=1048576, throttled_rate="100K", external_downloader="aria2c", external_downloader_args="-x 16 -s 16 -k '1M'")
+    assert archiver.download_options() == {
+        "concurrent_fragment_downloads": 8, "http_chunk_size": 1048576, "throttledratelimit": 102400,
+        "external_downloader": {"default": "aria2c"}, "external_downloader_args": {"default": ["-x", "16", "-s", "16", "-k", "1M"]},
+    }
+
+
+def test_empty_sizes_disable_their_option():
+    assert make_archiver(http_chunk_size="", throttled_rate=None).download_options() == {"concurrent_fragment_downloads": 4}
+
+
+@pytest.mark.parametrize("config", [{"http_chunk_size": "ten megabytes"}, {"throttled_rate": "fast"}, {"concurrent_fragment_downloads": 0}])
+def test_invalid_download_options(config):
+    with pytest.raises(AssertionError):
+        make_archiver(**config)
+
+
+def test_missing_external_downloader(monkeypatch):
+    monkeypatch.setattr(youtubedl_archiver.shutil, "which", lambda program: None)
+    with pytest.raises(AssertionError, match="aria2c not found"):
+        make_archiver(external_downloader="aria2c")
+
+
+def test_downloads_use_the_download_options(archiver):
+    archiver.throttled_rate = 102400
+    archiver.download(Metadata().set_url(URL))
+    assert CountingYoutubeDL.options["concurrent_fragment_downloads"] == 4
+    assert CountingYoutubeDL.options["http_chunk_size"] == 10485760 and CountingYoutubeDL.options["throttledratelimit"] == 102400
@@ -0,0 +1,129 @@
+import os, threading
+from types import SimpleNamespace
+
+import pytest
+import yt_dlp
+
+from auto_archiver.archivers.youtubedl_archiver import PlaylistProgress, YoutubeDLArchiver
+from auto_archiver.core import ArchivingContext, ItemContext, Media, Metadata
+
+URL = "https://www.youtube.com/playlist?list=abc"
+
+
+class FakeYoutubeDL:
+    """the playlist entries are already the processed infos"""
+
+    def __init__(self, options: dict) -> None: pass
+
+    def process_ie_result(self, entry: dict, download: bool = True) -> dict:
+        return entry
+
+
+@pytest.fixture
+def archiver(monkeypatch, tmp_path):
+    monkeypatch.setattr(yt_dlp, "YoutubeDL", FakeYoutubeDL)
+    ArchivingContext.set("state_dir", str(tmp_path / "state"), keep_on_reset=True)
+    config = {k: v["default"] for k, v in YoutubeDLArchiver.configs().items()}
+    archiver = YoutubeDLArchiver({"youtubedl_archiver": {**config, "netscape_cookies": "cookies.txt", "stream_playlist": True}})
+
+    def get_media(ydl, options, info, entry):
+        filename = str(tmp_path / f"{entry['id']}.mp4")
+        with open(filename, "wb") as f: f.write(b"video")
+        return Media(filename).set("entry", entry["id"])
+    archiver.get_media = get_media
+    return archiver
+
+
+def entries(n: int) -> dict:
+    return {"title": "playlist", "entries": [{"id": f"v{i}", "playlist_index": i} for i in range(1, n + 1)]}
+
+
+def archive(archiver, row: int, cancel_after: int = None) -> tuple:
+    """downloads the playlist as the item of @row, cancelled once @cancel_after entries are streamed, returns (success, result, streamed entries)"""
+    context = ItemContext({"gsheet": {"row": row, "worksheet": SimpleNamespace(wks=SimpleNamespace(title="sheet"))}})
+    streamed = []
+    with context.activate():
+        cancelled = context.set("archiver_cancelled", threading.Event()).get("archiver_cancelled")
+
+        def stream_media(media: Media, metadata: Metadata) -> None:
+            os.remove(media.filename)
+            media.set("streamed", True).set("row", row)
+            streamed.append(media.get("entry"))
+            if len(streamed) == cancel_after: cancelled.set()
+
+        result = Metadata().set_url(URL)
+        success = archiver.download_playlist(URL, entries(5), {}, result, stream_media)
+    return success, result, streamed
+
+
+def test_progress_file_is_in_the_state_dir(archiver, tmp_path):
+    assert archiver.playlist_progress.filename == str(tmp_path / "state" / "playlist_progress.pickle")
+
+
+def test_complete_playlist_forgets_its_progress(archiver):
+    success, result, streamed = archive(archiver, row=5)
+    assert success and streamed == ["v1", "v2", "v3", "v4", "v5"]
+    assert len(result.media) == 5
+    assert archiver.playlist_progress.playlists == {}
+
+
+def test_cancelled_playlist_keeps_the_stored_entries(archiver):
+    success, result, streamed = archive(archiver, row=5, cancel_after=2)
+    assert success and streamed == ["v1", "v2"]
+    assert [m.get("entry") for m in result.media] == ["v1", "v2"]
+    progress = PlaylistProgress(archiver.playlist_progress.filename).get((URL, "sheet", 5))
+    assert progress["done"] == [1, 2]
+
+
+def test_interrupted_playlist_resumes_for_the_same_row(archiver):
+    archive(archiver, row=5, cancel_after=2)
+    archiver.playlist_progress = PlaylistProgress(archiver.playlist_progress.filename)
+
+    success, result, streamed = archive(archiver, row=5)
+    assert success and streamed == ["v3", "v4", "v5"]
+    assert [m.get("entry") for m in result.media] == ["v1", "v2", "v3", "v4", "v5"]
+    assert {m.get("row") for m in result.media} == {5}
+    assert archiver.playlist_progress.playlists == {}
+
+
+def test_same_url_in_another_row_starts_over(archiver):
+    archive(archiver, row=5, cancel_after=2)
+    success, result, streamed = archive(archiver, row=9)
+    assert streamed == ["v1", "v2", "v3", "v4", "v5"]
+    assert {m.get("row") for m in result.media} == {9}
+    # the other row can still resume
+    assert list(archiver.playlist_progress.playlists) == [(URL, "sheet", 5)]
+
+
+class RecordingYoutubeDL(FakeYoutubeDL):
+    """extracts entries(3) and records the options of each YoutubeDL and whether it downloaded"""
+    calls = []
+
+    def __init__(self, options: dict) -> None:
+        self.options = options
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        RecordingYoutubeDL.calls.append(("extract_info", self.options.get("extract_flat"), download))
+        return entries(3)
+
+    def process_ie_result(self, entry: dict, download: bool = True) -> dict:
+        RecordingYoutubeDL.calls.append(("process_ie_result", self.options.get("extract_flat"), download))
+        return entry
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_playlists_are_only_extracted_flat_when_streamed(archiver, monkeypatch, tmp_path, stream):
+    monkeypatch.setattr(yt_dlp, "YoutubeDL", RecordingYoutubeDL)
+    RecordingYoutubeDL.calls = []
+    # process workers have no stream_media callback
+    context = ItemContext({"tmp_dir": str(tmp_path)})
+    if stream: context.set("stream_media", lambda media, metadata: media.set("streamed", True))
+    with context.activate():
+        result = archiver.download(Metadata().set_url(URL))
+    assert [m.get("entry") for m in result.media] == ["v1", "v2", "v3"]
+    if stream:
+        assert RecordingYoutubeDL.calls[0] == ("extract_info", "in_playlist", False)
+        assert RecordingYoutubeDL.calls[1:] == [("process_ie_result", None, True)] * 3
+    else:
+        # the whole playlist is extracted and downloaded
+        assert RecordingYoutubeDL.calls == [("extract_info", None, False), ("process_ie_result", None, True)]